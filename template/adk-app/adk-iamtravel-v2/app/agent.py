@@ -1 +1,8 @@
 from app.agents.router_agent import root_agent
+from app.utils.hedging import install_model_hedging
+from app.utils.model_client import install_shared_model_client
+from app.utils.model_transport import install_model_transport
+
+install_shared_model_client()  # one pooled keep-alive client for every agent, see app/utils/model_client.py
+install_model_transport()  # MODEL_TRANSPORT=record|replay, see app/utils/model_transport.py
+install_model_hedging()  # MODEL_HEDGING=True or AGENT_DEADLINES, see app/utils/hedging.py
@@ -0,0 +1,105 @@
+import asyncio
+import os
+from typing import AsyncGenerator
+
+from google.adk.agents import ParallelAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.agents.parallel_agent import _create_branch_ctx_for_sub_agent
+from google.adk.events import Event, EventActions
+from google.genai import types
+
+from app.utils import metrics
+
+# --- Parallel branches with deadlines ---
+# A ParallelAgent waits for its slowest branch, so one slow specialist holds up
+# everything after it. A DeadlineParallelAgent gives each branch a deadline:
+# AGENT_DEADLINES for that agent, otherwise BRANCH_DEADLINE_SECONDS (0 means no
+# deadline). A branch still running at its deadline is cancelled. Its output_key
+# is then set to a placeholder (`fallbacks[agent name]`, or DEADLINE_PLACEHOLDER),
+# so that later steps such as synthesis_agent still have every state key. Every
+# placeholder text in use is in PLACEHOLDERS, so a TemplateAgent can tell a
+# placeholder from a real answer and hand it to its LLM instead
+# (app/agents/template_agent.py). AGENT_DEADLINES also caps each model call of
+# the agents it names outside a DeadlineParallelAgent (HedgedLlm in
+# app/utils/hedging.py).
+#
+#   BRANCH_DEADLINE_SECONDS=20  AGENT_DEADLINES="concert_finder_agent=6,museum_finder_agent=8"
+
+BRANCH_DEADLINE_SECONDS = float(os.getenv("BRANCH_DEADLINE_SECONDS", "0"))
+DEADLINE_PLACEHOLDER = "Not available right now"
+PLACEHOLDERS = {DEADLINE_PLACEHOLDER}  # DEADLINE_PLACEHOLDER and every DeadlineParallelAgent's fallbacks
+
+
+def parse_deadlines(spec: str) -> dict:
+    """Parses "agent=seconds,agent=seconds" into a dict."""
+    pairs = (item.split("=", 1) for item in spec.split(",") if "=" in item)
+    return {name.strip(): float(seconds) for name, seconds in pairs}
+
+
+AGENT_DEADLINES = parse_deadlines(os.getenv("AGENT_DEADLINES", ""))
+
+DEADLINE_FALLBACKS = metrics.register(metrics.Counter(
+    "adk_branch_deadline_fallbacks_total", "Parallel branches cut off at their deadline.", ["agent"]))
+
+
+class DeadlineParallelAgent(ParallelAgent):
+    """A ParallelAgent that cancels branches at their deadline and fills in their output with a placeholder."""
+
+    deadline: float = BRANCH_DEADLINE_SECONDS  # per branch, unless AGENT_DEADLINES names it
+    fallbacks: dict[str, str] = {}             # branch agent name -> placeholder text
+
+    def model_post_init(self, __context):
+        super().model_post_init(__context)
+        PLACEHOLDERS.update(self.fallbacks.values())
+
+    def deadline_for(self, agent_name: str) -> float:
+        return AGENT_DEADLINES.get(agent_name, self.deadline)
+
+    def _fallback(self, ctx: InvocationContext, agent) -> Event:
+        text = self.fallbacks.get(agent.name, DEADLINE_PLACEHOLDER)
+        output_key = getattr(agent, "output_key", None)
+        DEADLINE_FALLBACKS.inc((agent.name,))
+        return Event(
+            invocation_id=ctx.invocation_id, author=agent.name, branch=ctx.branch,
+            content=types.Content(role="model", parts=[types.Part(text=text)]),
+            actions=EventActions(state_delta={output_key: text} if output_key else {}),
+            custom_metadata={"deadline_fallback": True},
+        )
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        branches = [_create_branch_ctx_for_sub_agent(self, sub_agent, ctx) for sub_agent in self.sub_agents]
+        runs = [sub_agent.run_async(branch) for sub_agent, branch in zip(self.sub_agents, branches)]
+        deadlines = [started + seconds if (seconds := self.deadline_for(sub_agent.name)) > 0 else None
+                     for sub_agent in self.sub_agents]
+        # As in ParallelAgent, a branch is only advanced once the runner has taken its last event.
+        tasks = {asyncio.ensure_future(run.__anext__()): i for i, run in enumerate(runs)}
+        try:
+            while tasks:
+                pending = [deadlines[i] for i in tasks.values() if deadlines[i] is not None]
+                timeout = max(0.0, min(pending) - loop.time()) if pending else None
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    i = tasks.pop(task)
+                    try:
+                        event = task.result()
+                    except StopAsyncIteration:
+                        continue
+                    yield event
+                    tasks[asyncio.ensure_future(runs[i].__anext__())] = i
+                now = loop.time()
+                for task, i in list(tasks.items()):
+                    if deadlines[i] is not None and now >= deadlines[i] and not task.done():
+                        del tasks[task]
+                        await self._cancel(task, runs[i])
+                        yield self._fallback(branches[i], self.sub_agents[i])
+        finally:
+            for task, i in tasks.items():
+                await self._cancel(task, runs[i])
+
+    @staticmethod
+    async def _cancel(task: asyncio.Task, run):
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await run.aclose()
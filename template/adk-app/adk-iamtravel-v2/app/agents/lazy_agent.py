@@ -0,0 +1,92 @@
+import importlib
+from typing import AsyncGenerator, Optional
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event
+from google.adk.plugins.base_plugin import BasePlugin
+from google.genai import types
+
+# --- Lazily built sub-agents ---
+# A LazyAgent stands in for a router sub-agent under the same name. The first
+# time it runs it imports the module that defines the real agent (which builds
+# that workflow's whole subtree), swaps the real agent into the parent's
+# sub_agents in its own place, and delegates. From then on the tree is the same
+# as an eagerly built one. Used by router_agent.py when LAZY_AGENT_GRAPH=True.
+#
+# A follow-up goes straight back to the router sub-agent that answered last
+# (e.g. foodie_agent), but the Runner only resumes on an LlmAgent, and a
+# placeholder is not one. That matters in a fresh process serving a persisted
+# session (SqliteSessionService): the placeholder is still unbuilt, so the
+# follow-up would go through the router again, one more model call than with an
+# eager graph. LazyResumePlugin builds the agent the session last talked to
+# before the Runner picks who answers, so both graphs resume on the same agent.
+
+
+class LazyAgent(BaseAgent):
+    """A placeholder that imports and installs the real agent on first use."""
+
+    target: str  # "package.module:attribute"
+
+    def load(self) -> BaseAgent:
+        """Imports the real agent without putting it into the tree."""
+        module, attribute = self.target.split(":")
+        return getattr(importlib.import_module(module), attribute)
+
+    def resolve(self) -> BaseAgent:
+        """Imports the real agent and puts it into the tree in place of this placeholder."""
+        parent = self.parent_agent
+        slot = next((i for i, sub in enumerate(parent.sub_agents) if sub is self), None) if parent else None
+        if parent is not None and slot is None:
+            return parent.find_sub_agent(self.name)  # already swapped in
+        agent = self.load()
+        if parent is not None:
+            parent.sub_agents[slot] = agent
+            agent.parent_agent = parent
+        return agent
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        async for event in self.resolve().run_async(ctx):
+            yield event
+
+    async def _run_live_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        async for event in self.resolve().run_live(ctx):
+            yield event
+
+
+def resolve_all(root: BaseAgent) -> int:
+    """Builds every LazyAgent under root now (pre-warm). Returns how many were built."""
+    lazy = [agent for agent in root.sub_agents if isinstance(agent, LazyAgent)]
+    for agent in lazy:
+        agent.resolve()
+    return len(lazy)
+
+
+def resolve_resumed(root: BaseAgent, events) -> Optional[BaseAgent]:
+    """Builds the placeholder a session's last answer came from, if any. Returns the real agent."""
+    # The same walk as Runner._find_agent_to_run: the latest non-user event whose author is in the tree.
+    for event in reversed(events):
+        if event.author == "user":
+            continue
+        if event.author == root.name:
+            return None
+        agent = root.find_sub_agent(event.author)
+        if agent is not None:
+            return agent.resolve() if isinstance(agent, LazyAgent) else None
+    return None
+
+
+class LazyResumePlugin(BasePlugin):
+    """Resolves the LazyAgent a session will resume on, before the Runner looks for it."""
+
+    def __init__(self):
+        super().__init__(name="lazy_resume")
+
+    async def on_user_message_callback(self, *, invocation_context, user_message: types.Content):
+        resolve_resumed(invocation_context.agent.root_agent, invocation_context.session.events)
+        return None
+
+
+def lazy_agent_plugins() -> list:
+    """The plugins every Runner should get; a no-op on an eagerly built graph."""
+    return [LazyResumePlugin()]
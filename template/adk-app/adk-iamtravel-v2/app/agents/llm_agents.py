@@ -1,6 +1,8 @@
 from google.adk.agents import Agent
 from app.tools.exit_loop_tool import exit_loop, COMPLETION_PHRASE
-from app.tools.my_google_search_tool import googlesearch_agent as search_tool
+from app.tools.my_google_search_tool import search_tool
+from app.tools.travel_time_tool import estimate_travel_time, critic_fast_path
+from app.utils.response_cache import response_cache
 
 # This foodie_agent is specifically for the sequential workflow.
 foodie_agent_for_seq = Agent(
@@ -12,7 +14,10 @@ foodie_agent_for_seq = Agent(
     When you recommend a place, you must output *only* the name of the establishment and nothing else.
     For example, if the best sushi is at 'Jin Sho', you should output only: Jin Sho
     """,
-    output_key="destination"  # ADK will save the agent's final response to state['destination']
+    output_key="destination", # ADK will save the agent's final response to state['destination']
+    # With RESPONSE_CACHE_ENABLED=True, near-identical restaurant requests reuse a cached answer (see app/utils/response_cache.py).
+    before_model_callback=response_cache.before_model_callback,
+    after_model_callback=response_cache.after_model_callback,
 )
 
 # The transportation_agent reads from the shared state.
@@ -47,13 +52,16 @@ planner_agent = Agent(
 critic_agent = Agent(
     name="critic_agent", model="gemini-2.5-flash", 
     #tools=[third_party_web_search],
+    tools=[estimate_travel_time],
     instruction="""You are a logistics expert. Your job is to critique a travel plan. The user has a strict constraint: total travel time must be short.
     Current Plan: {current_plan}
-    Use your tools to check the travel time between the two locations.
+    Use the estimate_travel_time tool to check the travel time between the two locations.
     IF the travel time is over 45 minutes, provide a critique, like: 'This plan is inefficient. Find a restaurant closer to the activity.'
     ELSE, respond with the exact phrase: 'The plan is feasible and meets all constraints.'""",
 
-    output_key="criticism"
+    output_key="criticism",
+    # When both places are in the local POI index the verdict is computed without the LLM.
+    before_model_callback=critic_fast_path,
 )
 
 # Agent 3 (in loop): Refines the plan or exits
@@ -96,7 +104,9 @@ restaurant_finder_agent_for_parallel = Agent(
     When you recommend a place, you must output *only* the name of the establishment.
     For example, if the best sushi is at 'Jin Sho', you should output only: Jin Sho
     """,
-    output_key="restaurant_result" # Set the correct output key for this workflow
+    output_key="restaurant_result", # Set the correct output key for this workflow
+    before_model_callback=response_cache.before_model_callback,
+    after_model_callback=response_cache.after_model_callback,
 )
 
 # Agent to synthesize the parallel results
@@ -125,7 +135,9 @@ foodie_agent_for_router = Agent(
     When you recommend a place, you must output *only* the name of the establishment and nothing else.
     For example, if the best sushi is at 'Jin Sho', you should output only: Jin Sho
     """,
-    description="For queries *only* about finding a single food place."
+    description="For queries *only* about finding a single food place.",
+    before_model_callback=response_cache.before_model_callback,
+    after_model_callback=response_cache.after_model_callback,
 )
 
 greeting_agent = Agent(
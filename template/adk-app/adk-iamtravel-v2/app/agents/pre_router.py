@@ -0,0 +1,229 @@
+import math
+import os
+import re
+from collections import Counter
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+
+from app.utils import metrics
+
+# --- Local pre-router for the root_agent ---
+# Obvious queries are classified in-process with keyword rules and a small TF-IDF
+# model. When the prediction is confident we hand ADK a ready-made
+# `transfer_to_agent` call, so the router_agent never pays its LLM round trip.
+# Anything below the threshold still goes to the LLM router as before. Every
+# decision (rule, classifier or LLM fallback, and the target) is counted on
+# /metrics. `python -m app.agents.pre_router` scores the rules and the classifier
+# on EVAL_SET and on HELD_OUT_SET, paraphrases the rules do not match.
+
+PRE_ROUTER_ENABLED = os.getenv("PRE_ROUTER_ENABLED", "True").lower() == "true"
+PRE_ROUTER_THRESHOLD = float(os.getenv("PRE_ROUTER_THRESHOLD", "0.35"))
+
+# Confidence reported when a keyword rule fires.
+RULE_CONFIDENCE = 0.95
+
+STOPWORDS = {
+    "a", "an", "the", "me", "i", "to", "in", "at", "of", "for", "and", "my", "is",
+    "it", "on", "can", "you", "please", "want", "some", "good", "nice", "best",
+}
+
+# Labelled seed examples for the TF-IDF classifier (the sample chat flows in app/README.md).
+TRAINING_EXAMPLES = [
+    ("Hi", "greeting_agent"),
+    ("Hello there!", "greeting_agent"),
+    ("Good morning, how are you?", "greeting_agent"),
+    ("Thanks, that was helpful", "greeting_agent"),
+    ("Find me the best Nasi Lemak restaurant in Kuala Lumpur.", "foodie_agent"),
+    ("Where is the best sushi in Palo Alto?", "foodie_agent"),
+    ("Recommend a pizza place in Chicago.", "foodie_agent"),
+    ("Where can I find good Char Kuey Teow in Penang and how do I get there from Komtar?", "find_and_navigate_agent"),
+    ("Find me the best sushi in Palo Alto and then tell me how to get there from the Caltrain station.", "find_and_navigate_agent"),
+    ("Find a ramen shop in Tokyo and give me directions from Shinjuku station.", "find_and_navigate_agent"),
+    ("Plan a trip to Kuala Lumpur. I want to visit the Petronas Twin Towers and eat at a restaurant nearby. The total travel time between the two should be short.", "iterative_planner_agent"),
+    ("Plan an afternoon in Paris with the Louvre and a bistro close by, travel time under 30 minutes.", "iterative_planner_agent"),
+    ("Plan a weekend in Kuala Lumpur. I want to visit the National Museum, see a performance at Istana Budaya, and eat at a nice restaurant.", "parallel_planner_agent"),
+    ("Find a museum, a concert and a restaurant in Berlin.", "parallel_planner_agent"),
+    ("Plan a day trip to Port Dickson from Kuala Lumpur.", "day_trip_agent"),
+    ("Suggest a day trip from Seattle.", "day_trip_agent"),
+    ("Plan a day at the lake near Denver.", "day_trip_agent"),
+]
+
+# Labelled eval set built from the example queries in app/main.py.
+EVAL_SET = [
+    ("Find me a good Italian restaurant in New York City.", "foodie_agent"),
+    ("Find me a good Italian restaurant in New York City and give me directions from Times Square.", "find_and_navigate_agent"),
+    ("Plan a trip to San Francisco. I want to visit a museum, see a concert, and eat at a nice restaurant.", "parallel_planner_agent"),
+    ("Plan a day trip to a beach near Los Angeles.", "day_trip_agent"),
+    ("Plan a trip to London. I want to visit the British Museum and eat at a restaurant nearby. The total travel time between the two should be short.", "iterative_planner_agent"),
+    ("Hello!", "greeting_agent"),
+]
+
+# Held-out paraphrases that no keyword rule matches, so they measure the TF-IDF
+# classifier and the threshold on their own (tests/test_pre_router.py keeps them unmatched).
+HELD_OUT_SET = [
+    ("Any recommendations for tapas in Barcelona?", "foodie_agent"),
+    ("Where should I grab noodles in Hanoi?", "foodie_agent"),
+    ("I'm hungry, what's a great place for dumplings in Shanghai?", "foodie_agent"),
+    ("Suggest somewhere for curry in London.", "foodie_agent"),
+    ("Find a taco spot in Austin and tell me how to reach it from the airport.", "find_and_navigate_agent"),
+    ("Best burger joint in Boston and the way there from Fenway?", "find_and_navigate_agent"),
+    ("Plan an afternoon in Rome with the Colosseum and a trattoria close by.", "iterative_planner_agent"),
+    ("Visit the Prado and have tapas close by, keep the walk short.", "iterative_planner_agent"),
+    ("Plan a weekend in Vienna: an art gallery, an opera and a good dinner.", "parallel_planner_agent"),
+    ("Get me out of the city for a day, somewhere near Boston.", "day_trip_agent"),
+    ("Suggest an excursion from Lisbon for tomorrow.", "day_trip_agent"),
+    ("Plan a day at the beach near San Diego.", "day_trip_agent"),
+    ("Hey, thanks a lot for the help earlier", "greeting_agent"),
+    ("Howdy", "greeting_agent"),
+]
+
+PRE_ROUTER_DECISIONS = metrics.register(metrics.Counter(
+    "adk_pre_router_total", "Router turns decided locally (rule, classifier) or left to the LLM.", ["source", "target"]))
+
+FOOD_WORDS = r"(restaurant|food|eat|dinner|lunch|breakfast|brunch|cafe|sushi|pizza|ramen|bistro|diner|bakery)"
+
+# Keyword rules, checked in order. The first rule that matches wins.
+KEYWORD_RULES = [
+    ("greeting_agent", re.compile(r"^(hi|hello|hey|hiya|good (morning|afternoon|evening)|thanks|thank you)\b[\s\w,!?.']{0,20}$")),
+    ("iterative_planner_agent", re.compile(r"travel time|(within|under|less than) \d+ (minutes|mins)|close to each other")),
+    ("find_and_navigate_agent", re.compile(FOOD_WORDS + r".*\b(directions|how (do|can) i get (there|to)|route)\b")),
+    ("parallel_planner_agent", re.compile(r"(?=.*\bmuseum)(?=.*\b(concert|show|performance))(?=.*\b" + FOOD_WORDS + r")")),
+    ("day_trip_agent", re.compile(r"\bday trip\b")),
+    ("foodie_agent", re.compile(r"^(?!.*\b(museum|concert|directions|trip|weekend|itinerary)\b).*\b" + FOOD_WORDS)),
+]
+
+
+def normalize_query(text: str) -> str:
+    """Lowercases the query and collapses whitespace."""
+    return " ".join(text.lower().split())
+
+
+def tokenize(text: str) -> list:
+    """Splits a query into lowercase word unigrams and bigrams, dropping stopwords."""
+    words = [w for w in re.findall(r"[a-z0-9']+", text.lower()) if w not in STOPWORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class TfidfClassifier:
+    """A tiny nearest-centroid TF-IDF classifier kept entirely in memory."""
+
+    def __init__(self, examples):
+        docs = [Counter(tokenize(text)) for text, _ in examples]
+        doc_freq = Counter(term for doc in docs for term in doc)
+        self.idf = {term: math.log((1 + len(docs)) / (1 + df)) + 1 for term, df in doc_freq.items()}
+        self.centroids = {}
+        for doc, (_, label) in zip(docs, examples):
+            centroid = self.centroids.setdefault(label, Counter())
+            for term, weight in self._vector(doc).items():
+                centroid[term] += weight
+        self.centroids = {label: self._unit(vec) for label, vec in self.centroids.items()}
+
+    def _vector(self, doc: Counter) -> dict:
+        return self._unit({term: tf * self.idf[term] for term, tf in doc.items() if term in self.idf})
+
+    @staticmethod
+    def _unit(vec: dict) -> dict:
+        norm = math.sqrt(sum(v * v for v in vec.values()))
+        return {term: v / norm for term, v in vec.items()} if norm else {}
+
+    def predict(self, text: str):
+        """Returns (label, confidence): the best cosine similarity, discounted by the runner-up's."""
+        vec = self._vector(Counter(tokenize(text)))
+        scores = {
+            label: sum(weight * centroid.get(term, 0.0) for term, weight in vec.items())
+            for label, centroid in self.centroids.items()
+        }
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True) + [(None, 0.0)]
+        (label, best), (_, runner_up) = ranked[0], ranked[1]
+        if not best:
+            return None, 0.0
+        return label, best * (1 - runner_up / best)
+
+
+class PreRouter:
+    """Routes confident queries straight to a sub-agent, skipping the router's LLM hop."""
+
+    def __init__(self, targets, threshold: float = PRE_ROUTER_THRESHOLD, examples=TRAINING_EXAMPLES, rules=KEYWORD_RULES):
+        self.targets = set(targets)
+        self.threshold = threshold
+        self.rules = [(label, pattern) for label, pattern in rules if label in self.targets]
+        self.classifier = TfidfClassifier([(text, label) for text, label in examples if label in self.targets])
+        self.stats = Counter()
+
+    def classify(self, query: str):
+        """Returns (label, confidence, source) for a user query."""
+        text = normalize_query(query)
+        for label, pattern in self.rules:
+            if pattern.search(text):
+                return label, RULE_CONFIDENCE, "rule"
+        label, confidence = self.classifier.predict(text)
+        return label, confidence, "classifier"
+
+    def route(self, query: str) -> Optional[str]:
+        """Returns the target agent name, or None when the LLM router should decide."""
+        self.stats["total"] += 1
+        label, confidence, source = self.classify(query)
+        if label is None or confidence < self.threshold:
+            self.stats["llm_fallback"] += 1
+            PRE_ROUTER_DECISIONS.inc(("llm", ""))
+            return None
+        self.stats["hops_skipped"] += 1
+        self.stats[f"{source}_hits"] += 1
+        self.stats[f"routed_to:{label}"] += 1
+        PRE_ROUTER_DECISIONS.inc((source, label))
+        return label
+
+    def before_model_callback(self, callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+        """ADK before_model_callback: answers the router's LLM call with a local transfer when confident."""
+        # Only route the fresh user turn; transfers back to the router still go to the LLM.
+        last = llm_request.contents[-1] if llm_request.contents else None
+        if not last or last.role != "user" or not last.parts or not last.parts[0].text:
+            return None
+        target = self.route(last.parts[0].text)
+        if not target:
+            return None
+        print(f"  [Pre-Router] {callback_context.agent_name} -> {target} (LLM hop skipped)")
+        return LlmResponse(
+            content=types.Content(
+                role="model",
+                parts=[types.Part(function_call=types.FunctionCall(name="transfer_to_agent", args={"agent_name": target}))],
+            )
+        )
+
+    def evaluate(self, examples=EVAL_SET, threshold: Optional[float] = None) -> dict:
+        """Scores the pre-router on a labelled set without touching the live counters: overall, and for the
+        queries the classifier routed at `threshold` (default: the live one)."""
+        threshold = self.threshold if threshold is None else threshold
+        routed, correct = Counter(), Counter()
+        for query, expected in examples:
+            label, confidence, source = self.classify(query)
+            if label is not None and confidence >= threshold:
+                routed[source] += 1
+                correct[source] += label == expected
+        total = sum(routed.values())
+        return {
+            "examples": len(examples),
+            "coverage": total / len(examples) if examples else 0.0,
+            "precision": sum(correct.values()) / total if total else 0.0,
+            "classifier_routed": routed["classifier"],
+            "classifier_precision": correct["classifier"] / routed["classifier"] if routed["classifier"] else 0.0,
+        }
+
+
+if __name__ == "__main__":
+    # python -m app.agents.pre_router
+    router = PreRouter(targets={label for _, label in TRAINING_EXAMPLES})
+    for name, examples in (("EVAL_SET", EVAL_SET), ("HELD_OUT_SET", HELD_OUT_SET)):
+        print(f"\n{name}")
+        for query, expected in examples:
+            label, confidence, source = router.classify(query)
+            print(f"{expected:<25} {str(label):<25} {confidence:.2f} ({source})  {query}")
+        print(router.evaluate(examples))
+    print("\nHELD_OUT_SET by threshold (classifier only)")
+    for threshold in (0.1, 0.2, router.threshold, 0.5):
+        scores = router.evaluate(HELD_OUT_SET, threshold)
+        print(f"  threshold {threshold:.2f}: routed {scores['classifier_routed']:2d}/{len(HELD_OUT_SET)}, "
+              f"precision {scores['classifier_precision']:.2f}")
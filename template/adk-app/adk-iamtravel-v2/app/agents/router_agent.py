@@ -1,6 +1,40 @@
+import os
 from google.adk.agents import Agent
-from app.agents.llm_agents import day_trip_agent, foodie_agent_for_router, greeting_agent
-from app.agents.workflow_agents import find_and_navigate_agent, iterative_planner_agent, parallel_planner_agent
+from app.agents.lazy_agent import LazyAgent
+from app.agents.pre_router import PreRouter, PRE_ROUTER_ENABLED
+
+# With LAZY_AGENT_GRAPH=True each sub-agent below is imported and built the first
+# time a request is routed to it, instead of all of them at import time.
+LAZY_AGENT_GRAPH = os.getenv("LAZY_AGENT_GRAPH", "False").lower() == "true"
+
+# name -> (where the agent is defined, what it handles)
+ROUTER_TARGETS = {
+    "greeting_agent": ("app.agents.llm_agents:greeting_agent", "For general greetings and simple conversational queries."),
+    "day_trip_agent": ("app.agents.llm_agents:day_trip_agent", "A general planner for any other simple day trip requests."),
+    "foodie_agent": ("app.agents.llm_agents:foodie_agent_for_router", "For queries *only* about finding a single food place."),
+    "find_and_navigate_agent": ("app.agents.workflow_agents:find_and_navigate_agent", "A workflow that first finds a location and then provides directions to it."),
+    "iterative_planner_agent": ("app.agents.workflow_agents:iterative_planner_agent", "A workflow that iteratively plans and refines a trip to meet constraints."),
+    "parallel_planner_agent": ("app.agents.workflow_agents:parallel_planner_agent", "A workflow that finds multiple things in parallel and then summarizes the results."),
+}
+
+if LAZY_AGENT_GRAPH:
+    router_sub_agents = [LazyAgent(name=name, target=target, description=description)
+                         for name, (target, description) in ROUTER_TARGETS.items()]
+else:
+    from app.agents.llm_agents import day_trip_agent, foodie_agent_for_router, greeting_agent
+    from app.agents.workflow_agents import find_and_navigate_agent, iterative_planner_agent, parallel_planner_agent
+
+    router_sub_agents = [
+        greeting_agent,
+        day_trip_agent,
+        foodie_agent_for_router,
+        find_and_navigate_agent,
+        iterative_planner_agent,
+        parallel_planner_agent,
+    ]
+
+# Obvious queries are routed locally; everything else falls through to the LLM below.
+pre_router = PreRouter(targets=[agent.name for agent in router_sub_agents])
 
 root_agent = Agent(
     name="router_agent",
@@ -19,12 +53,6 @@ root_agent = Agent(
 
     Delegate to the single, most appropriate option.
     """,
-    sub_agents=[
-        greeting_agent,
-        day_trip_agent,
-        foodie_agent_for_router,
-        find_and_navigate_agent,
-        iterative_planner_agent,
-        parallel_planner_agent,
-    ]
-)
\ No newline at end of file
+    sub_agents=router_sub_agents,
+    before_model_callback=pre_router.before_model_callback if PRE_ROUTER_ENABLED else None,
+)
@@ -0,0 +1,143 @@
+import os
+import string
+from collections import Counter
+from typing import AsyncGenerator, Callable, Optional
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.genai import types
+
+from app.agents.deadline_agent import PLACEHOLDERS
+from app.utils import metrics
+
+# --- Template stages ---
+# Some workflows end with an LLM call that only formats state the earlier steps
+# produced. synthesis_agent is one: it turns {museum_result}, {concert_result}
+# and {restaurant_result} into a bulleted list. A TemplateAgent renders such a
+# `template` straight from state when every key it uses is present and passes
+# its validator (by default: one short line of text that is not a deadline
+# placeholder such as "Not available right now"). Otherwise it runs its
+# only sub-agent, the LLM agent that did the formatting before. Either way its
+# output is stored under `output_key`, if set. Counts of fast-path and fallback
+# runs per stage are in `template_stats` and in /metrics.
+#
+#   TEMPLATE_FAST_PATH=False   always use the LLM sub-agent
+
+TEMPLATE_FAST_PATH = os.getenv("TEMPLATE_FAST_PATH", "True").lower() == "true"
+TEMPLATE_MAX_VALUE_CHARS = int(os.getenv("TEMPLATE_MAX_VALUE_CHARS", "200"))
+
+TEMPLATE_RUNS = metrics.register(metrics.Counter(
+    "adk_template_stage_total", "Template stage runs, rendered locally (fast_path) or by the LLM (fallback).",
+    ["stage", "path"]))
+template_stats = Counter()  # (stage name, "fast_path" | "fallback") -> runs
+
+
+def is_short_value(value) -> bool:
+    """One non-empty line of plain text, the shape a name-only finder should return, and not the placeholder
+    of a branch cut off at its deadline."""
+    if not isinstance(value, str):
+        return False
+    value = value.strip()
+    return (0 < len(value) <= TEMPLATE_MAX_VALUE_CHARS and "\n" not in value and "{" not in value
+            and value not in PLACEHOLDERS)
+
+
+def template_keys(template: str) -> list:
+    return [field for _, field, _, _ in string.Formatter().parse(template) if field]
+
+
+class TemplateAgent(BaseAgent):
+    """Renders `template` from state, or runs its LLM sub-agent when the inputs do not validate."""
+
+    template: str
+    output_key: Optional[str] = None
+    validators: dict[str, Callable] = {}  # state key -> check; is_short_value for keys not listed
+    fast_path: bool = TEMPLATE_FAST_PATH
+
+    def render(self, state) -> Optional[str]:
+        """The rendered template, or None if a value is missing or malformed."""
+        values = {}
+        for key in template_keys(self.template):
+            value = state.get(key)
+            if value is None or not self.validators.get(key, is_short_value)(value):
+                return None
+            values[key] = value.strip() if isinstance(value, str) else value
+        return self.template.format(**values)
+
+    def _count(self, path: str):
+        template_stats[(self.name, path)] += 1
+        TEMPLATE_RUNS.inc((self.name, path))
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        text = self.render(ctx.session.state) if self.fast_path else None
+        if text is None:
+            if self.fast_path:
+                self._count("fallback")
+            async for event in self.sub_agents[0].run_async(ctx):
+                yield event
+            return
+        self._count("fast_path")
+        yield Event(
+            invocation_id=ctx.invocation_id, author=self.name, branch=ctx.branch,
+            content=types.Content(role="model", parts=[types.Part(text=text)]),
+            actions=EventActions(state_delta={self.output_key: text} if self.output_key else {}),
+        )
+
+    async def _run_live_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        async for event in self.sub_agents[0].run_live(ctx):
+            yield event
+
+
+if __name__ == "__main__":
+    # python -m app.agents.template_agent
+    # parallel_planner_agent on a fake model: latency and model calls per request
+    # with the LLM synthesis and with the template stage, for clean finder answers
+    # and for finders that ramble 30% of the time, so the inputs fail validation.
+    import asyncio
+    import statistics
+    import time
+
+    from google.adk.sessions import InMemorySessionService
+
+    from app.utils.fake_llm import FakeLlm, install_fake_llm
+
+    install_fake_llm(latency=0.1)
+    from app.agents.router_agent import root_agent
+    from app.agents.template_agent import template_stats  # the counters the stage updates, not this __main__ copy
+    from app.agents.workflow_agents import synthesis_stage
+    from app.utils.runner_registry import RunnerRegistry
+    from app.utils.search_cache import search_cache
+
+    FakeLlm.config["route"] = "parallel_planner_agent"
+    runner = RunnerRegistry().get(root_agent, "template", InMemorySessionService())
+    query = "Plan a trip to San Francisco. I want to visit a museum, see a concert, and eat at a nice restaurant."
+
+    async def bench(label, fast_path, quality, requests=30):
+        synthesis_stage.fast_path = fast_path
+        FakeLlm.config["quality"] = {"gemini-2.5-flash": quality}
+        FakeLlm.calls.clear()
+        template_stats.clear()
+        latencies, answer = [], ""
+        for i in range(requests):
+            search_cache.entries.clear()
+            session = await runner.session_service.create_session(app_name="template", user_id="u")
+            started = time.perf_counter()
+            async for event in runner.run_async(user_id="u", session_id=session.id, new_message=types.Content(
+                    role="user", parts=[types.Part(text=f"{query} #{i}")])):
+                if event.is_final_response() and event.content and event.content.parts:
+                    answer = event.content.parts[0].text
+            latencies.append(time.perf_counter() - started)
+        paths = {path: runs for (_, path), runs in template_stats.items()}
+        print(f"{label:<32} mean {statistics.mean(latencies) * 1e3:5.0f}ms  "
+              f"model calls/request {sum(FakeLlm.calls.values()) / requests:4.2f}  {paths}")
+        return answer
+
+    async def main():
+        await bench("LLM synthesis, clean inputs", False, 1.0)
+        answer = await bench("template stage, clean inputs", True, 1.0)
+        await bench("LLM synthesis, 30% rambling", False, 0.7)
+        await bench("template stage, 30% rambling", True, 0.7)
+        print("\n" + answer)
+
+    asyncio.run(main())
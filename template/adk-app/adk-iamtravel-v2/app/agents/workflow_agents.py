@@ -1,4 +1,6 @@
-from google.adk.agents import SequentialAgent, LoopAgent, ParallelAgent
+from google.adk.agents import SequentialAgent, LoopAgent
+from app.agents.deadline_agent import DeadlineParallelAgent
+from app.agents.template_agent import TemplateAgent
 from app.agents.llm_agents import foodie_agent_for_seq, transportation_agent, planner_agent, critic_agent, refiner_agent, museum_finder_agent, concert_finder_agent, restaurant_finder_agent_for_parallel, synthesis_agent
 
 # The SequentialAgent to manage the find-and-navigate workflow.
@@ -22,15 +24,24 @@ iterative_planner_agent = SequentialAgent(
     description="A workflow that iteratively plans and refines a trip to meet constraints."
 )
 
-# The ParallelAgent runs all three specialists at once
-parallel_research_agent = ParallelAgent(
+# The ParallelAgent runs all three specialists at once; a branch that misses its
+# deadline gets a placeholder result so synthesis still runs (see deadline_agent.py)
+parallel_research_agent = DeadlineParallelAgent(
     name="parallel_research_agent",
     sub_agents=[museum_finder_agent, concert_finder_agent, restaurant_finder_agent_for_parallel]
 )
 
+# The synthesis only formats the three results: rendered from state when they are
+# clean one-liners, by synthesis_agent otherwise (see template_agent.py)
+synthesis_stage = TemplateAgent(
+    name="synthesis_stage",
+    template="Here is your plan:\n- Museum: {museum_result}\n- Concert: {concert_result}\n- Restaurant: {restaurant_result}",
+    sub_agents=[synthesis_agent],
+)
+
 # The SequentialAgent runs the parallel search, then the synthesis
 parallel_planner_agent = SequentialAgent(
     name="parallel_planner_agent",
-    sub_agents=[parallel_research_agent, synthesis_agent],
+    sub_agents=[parallel_research_agent, synthesis_stage],
     description="A workflow that finds multiple things in parallel and then summarizes the results."
 )
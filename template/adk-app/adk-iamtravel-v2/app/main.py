@@ -1,7 +1,15 @@
 import asyncio
 from app.agents.router_agent import root_agent
+from app.utils.hedging import install_model_hedging
+from app.utils.model_client import install_shared_model_client
+from app.utils.model_transport import install_model_transport
 from app.utils.session_manager import run_agent_query, session_service, my_user_id
 
+# MODEL_TRANSPORT=record once, then MODEL_TRANSPORT=replay for deterministic offline runs.
+install_shared_model_client()  # one pooled keep-alive client for every agent, see app/utils/model_client.py
+install_model_transport()
+install_model_hedging()  # MODEL_HEDGING=True duplicates unusually slow model calls; AGENT_DEADLINES caps them
+
 async def main():
     # Example usage of the router agent
     session = await session_service.create_session(app_name="my_travel_app", user_id=my_user_id)
@@ -0,0 +1,55 @@
+import os
+
+from google.adk.tools import FunctionTool, ToolContext
+
+from app.tools.third_party_search_tool import fetch_results
+from app.utils.search_cache import SearchCache, search_cache, search_memo
+
+# --- Direct search mode ---
+# By default each search is a nested googlesearch_agent run (my_google_search_tool.py):
+# the calling agent asks it a question, it makes its own model call with Google
+# search grounding, and the calling agent reads its prose answer. That is two
+# model round trips per search. With SEARCH_MODE=direct the agents get
+# `web_search` instead: a function tool that returns the top results, trimmed to
+# title, snippet and link, for the agent to read itself. One round trip.
+# Identical searches are served once per request (search_memo) and shared across
+# requests for SEARCH_CACHE_TTL (search_cache).
+#
+#   SEARCH_MODE=direct python benchmark.py     # compare with plain `python benchmark.py`
+
+SEARCH_MODE = os.getenv("SEARCH_MODE", "agent").lower()  # "agent" or "direct"
+DIRECT_SEARCH_RESULTS = int(os.getenv("DIRECT_SEARCH_RESULTS", "5"))
+DIRECT_SEARCH_SNIPPET_CHARS = int(os.getenv("DIRECT_SEARCH_SNIPPET_CHARS", "300"))
+
+# Where results come from: async (query, num) -> [{title, snippet, link}].
+# SerpApi by default; install_fake_llm() replaces it with a local stand-in.
+search_backend = fetch_results
+
+
+def trim(results, num: int = DIRECT_SEARCH_RESULTS, snippet_chars: int = DIRECT_SEARCH_SNIPPET_CHARS) -> list:
+    """Keeps the first `num` results with their snippets cut to `snippet_chars`."""
+    return [{"title": result.get("title", ""), "snippet": (result.get("snippet") or "")[:snippet_chars],
+             "link": result.get("link", "")} for result in results[:num]]
+
+
+async def _fetch(query: str) -> dict:
+    return {"results": trim(await search_backend(query, DIRECT_SEARCH_RESULTS))}
+
+
+async def web_search(query: str, tool_context: ToolContext) -> dict:
+    """Searches the web and returns the top results, each with a title, a snippet and a link.
+
+    Args:
+        query: A short search query, e.g. "modern art museums in San Francisco".
+    """
+    engine = f"direct:{DIRECT_SEARCH_RESULTS}"
+    try:
+        return await search_memo.get_or_fetch(
+            tool_context.invocation_id, SearchCache.make_key(query, engine),
+            lambda: search_cache.get_or_fetch(query, engine, lambda: _fetch(query),
+                                              should_cache=lambda value: bool(value["results"])))
+    except Exception as e:
+        return {"error": f"Search failed: {e}"}
+
+
+web_search_tool = FunctionTool(web_search)
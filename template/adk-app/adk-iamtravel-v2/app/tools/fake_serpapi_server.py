@@ -0,0 +1,90 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# --- A local stand-in for SerpApi ---
+# Serves canned organic_results after a fixed delay, so the search tool can be
+# exercised offline. The first `failures` requests get a 503 instead, to exercise
+# retries. `server.requests` counts requests and `server.max_in_flight` is the
+# most that were ever served at once. Point the tool at it with
+# SERPAPI_URL=http://127.0.0.1:<port>/search.
+
+
+def start_fake_serpapi(delay: float = 0.5, port: int = 0, failures: int = 0):
+    """Starts the fake server on a background thread and returns (server, url)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like the real API.
+
+        def do_GET(self):
+            params = parse_qs(urlparse(self.path).query)
+            query = params.get("q", [""])[0]
+            num = int(params.get("num", ["10"])[0])
+            with server.lock:
+                server.requests += 1
+                failing = server.requests <= failures
+                server.in_flight += 1
+                server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            try:
+                time.sleep(delay)
+            finally:
+                with server.lock:
+                    server.in_flight -= 1
+            if failing:
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = json.dumps({
+                "organic_results": [
+                    {"title": f"{query} result {i}", "snippet": f"Snippet {i} for {query}", "link": f"https://example.com/{i}"}
+                    for i in range(num)
+                ]
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    server.lock, server.requests, server.in_flight, server.max_in_flight = threading.Lock(), 0, 0, 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/search"
+
+
+if __name__ == "__main__":
+    # python -m app.tools.fake_serpapi_server
+    # Shows that N concurrent searches finish in roughly the time of one.
+    import asyncio
+    import os
+
+    delay, sessions = 0.5, 8
+    server, url = start_fake_serpapi(delay=delay)
+    os.environ.setdefault("SERPAPI_API_KEY", "fake-key")
+    os.environ["SERPAPI_URL"] = url
+    from app.tools import third_party_search_tool as search
+
+    async def run():
+        start = time.perf_counter()
+        await search.third_party_web_search("museums San Francisco")
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*[
+            search.third_party_web_search(f"query {i}") for i in range(sessions)
+        ])
+        concurrent = time.perf_counter() - start
+        await search.close_search_client()
+
+        assert all(r.startswith("Title:") for r in results), results
+        print(f"1 search: {single:.2f}s, {sessions} concurrent searches: {concurrent:.2f}s (server delay {delay}s)")
+
+    asyncio.run(run())
+    server.shutdown()
@@ -1,5 +1,11 @@
 from google.adk.agents import Agent
 from google.adk.tools import google_search
+from google.adk.tools.agent_tool import AgentTool
+from app.tools.direct_search_tool import SEARCH_MODE, web_search_tool
+from app.utils import budgets
+from app.utils.metrics import agent_tool_metrics
+from app.utils.model_tiers import MODEL_TIERING_ENABLED, tier_policy
+from app.utils.search_cache import SearchCache, search_cache, search_memo
 
 googlesearch_agent = Agent(
     name="google_search",
@@ -20,5 +26,43 @@ googlesearch_agent = Agent(
 
     RETURN the answers in MARKDOWN FORMAT with systematic bullet points and and concise answers.
     """,
-    tools=[google_search]
-)
\ No newline at end of file
+    tools=[google_search],
+    # AgentTool runs this agent on its own Runner, which has no plugins, so the
+    # request budget, the tier policy and the metrics are attached here. Metrics
+    # go last, so they time the call once the budget and tier have let it
+    # through and also record a retry the tier policy made.
+    before_model_callback=[callback for enabled, callback in (
+        (budgets.BUDGETS_ENABLED, budgets.before_model_callback),
+        (MODEL_TIERING_ENABLED, tier_policy.before_model_callback)) if enabled]
+        + agent_tool_metrics.before_model_callbacks(),
+    after_model_callback=[callback for enabled, callback in (
+        (budgets.BUDGETS_ENABLED, budgets.after_model_callback),
+        (MODEL_TIERING_ENABLED, tier_policy.after_model_callback)) if enabled]
+        + agent_tool_metrics.after_model_callbacks(),
+)
+
+class CachedAgentTool(AgentTool):
+    """An AgentTool whose results go through the shared search cache.
+
+    Repeated (or concurrent) identical requests reuse one nested agent run instead
+    of paying for another LLM call plus Google search; within one request they
+    always do (search_memo), whatever the result.
+    """
+
+    async def run_async(self, *, args, tool_context):
+        request = args.get("request", "")
+        return await search_memo.get_or_fetch(
+            tool_context.invocation_id,
+            SearchCache.make_key(request, self.name),
+            lambda: search_cache.get_or_fetch(
+                request,
+                self.name,
+                lambda: super(CachedAgentTool, self).run_async(args=args, tool_context=tool_context),
+                should_cache=bool,
+            ),
+        )
+
+
+# The agents use this tool; wrapping the agent in an AgentTool is what ADK expects in `tools=[...]`.
+# SEARCH_MODE=direct hands them raw, trimmed results instead (see direct_search_tool.py).
+search_tool = web_search_tool if SEARCH_MODE == "direct" else CachedAgentTool(agent=googlesearch_agent)
@@ -1,42 +1,119 @@
+import asyncio
 import os
-import requests
+import random
+import httpx
+from app.utils.loop_local import LoopLocal
+from app.utils.search_cache import search_cache
 
 # Load environment variables from .env file
 # This is handled by the main app, but good practice for standalone testing
 # from dotenv import load_dotenv; load_dotenv()
 
 SERPAPI_API_KEY = os.environ.get("SERPAPI_API_KEY")
+SERPAPI_URL = os.environ.get("SERPAPI_URL", "https://serpapi.com/search")
 
-def third_party_web_search(query: str):
-    """Performs a web search using SerpApi for the given query."""
+# Connection pool, timeout and retry settings for the shared SerpApi client.
+SERPAPI_CONNECT_TIMEOUT = float(os.environ.get("SERPAPI_CONNECT_TIMEOUT", "3"))
+SERPAPI_READ_TIMEOUT = float(os.environ.get("SERPAPI_READ_TIMEOUT", "10"))
+SERPAPI_MAX_RETRIES = int(os.environ.get("SERPAPI_MAX_RETRIES", "2"))
+SERPAPI_BACKOFF_SECONDS = float(os.environ.get("SERPAPI_BACKOFF_SECONDS", "0.5"))
+SERPAPI_MAX_CONCURRENCY = int(os.environ.get("SERPAPI_MAX_CONCURRENCY", "8"))
+SERPAPI_NUM_RESULTS = int(os.environ.get("SERPAPI_NUM_RESULTS", "5"))
+
+# Only ask SerpApi for the fields we format, instead of the full payload.
+RESULT_FIELDS = ("title", "snippet", "link")
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def _new_client():
+    client = httpx.AsyncClient(
+        timeout=httpx.Timeout(SERPAPI_READ_TIMEOUT, connect=SERPAPI_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=SERPAPI_MAX_CONCURRENCY,
+            max_keepalive_connections=SERPAPI_MAX_CONCURRENCY,
+        ),
+    )
+    return client, asyncio.Semaphore(SERPAPI_MAX_CONCURRENCY)
+
+
+# One keep-alive client and concurrency cap per event loop, created on first use
+# and closed with its loop (see app/utils/loop_local.py).
+_clients = LoopLocal(_new_client, close=lambda pair: pair[0].aclose())
+
+
+def _get_client():
+    """Returns the shared AsyncClient and semaphore for the running event loop."""
+    return _clients.get()
+
+
+async def close_search_client():
+    """Closes this event loop's client now, e.g. from the FastAPI shutdown hook."""
+    await _clients.close()
+
+
+async def _get_with_retries(client, params):
+    """GETs SerpApi, retrying timeouts, connection errors and 429/5xx with jittered backoff."""
+    for attempt in range(SERPAPI_MAX_RETRIES + 1):
+        try:
+            response = await client.get(SERPAPI_URL, params=params)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == SERPAPI_MAX_RETRIES:
+                response.raise_for_status()
+                return response.json()
+        except httpx.TransportError:
+            if attempt == SERPAPI_MAX_RETRIES:
+                raise
+        # Full jitter: sleep a random slice of the exponential backoff window.
+        await asyncio.sleep(random.uniform(0, SERPAPI_BACKOFF_SECONDS * 2 ** attempt))
+
+
+async def third_party_web_search(query: str, num: int = SERPAPI_NUM_RESULTS):
+    """Performs a web search using SerpApi for the given query, returning up to `num` results."""
     if not SERPAPI_API_KEY:
         return "Error: SERPAPI_API_KEY not set. Cannot perform web search."
 
-    url = "https://serpapi.com/search"
+    # Identical searches are served from the shared cache, and concurrent ones share one request.
+    return await search_cache.get_or_fetch(
+        query, f"serpapi:google:{num}", lambda: _search(query, num), should_cache=_is_result
+    )
+
+
+def _is_result(value: str) -> bool:
+    return not value.startswith(("Error", "An unexpected error"))
+
+
+async def fetch_results(query: str, num: int = SERPAPI_NUM_RESULTS) -> list:
+    """Calls SerpApi and returns up to `num` organic results as {title, snippet, link} dicts (uncached)."""
+    if not SERPAPI_API_KEY:
+        raise RuntimeError("SERPAPI_API_KEY not set. Cannot perform web search.")
     params = {
         "api_key": SERPAPI_API_KEY,
         "q": query,
         "engine": "google", # You can change this to other engines like "bing", "duckduckgo"
+        "num": num,
+        "json_restrictor": "organic_results[].{" + ",".join(RESULT_FIELDS) + "}",
     }
+    client, semaphore = _get_client()
+    async with semaphore:
+        search_results = await _get_with_retries(client, params)
+    return [{field: result.get(field, "N/A") for field in RESULT_FIELDS}
+            for result in search_results.get("organic_results", [])[:num]]
+
 
+async def _search(query: str, num: int):
+    """Calls SerpApi and formats the organic results (uncached)."""
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status() # Raise an exception for HTTP errors
-        search_results = response.json()
+        results = await fetch_results(query, num)
 
         # Extract relevant information (e.g., organic results titles and snippets)
-        if "organic_results" in search_results:
+        if results:
             formatted_results = []
-            for result in search_results["organic_results"]:
-                title = result.get("title", "N/A")
-                snippet = result.get("snippet", "N/A")
-                link = result.get("link", "N/A")
-                formatted_results.append(f"Title: {title}\nSnippet: {snippet}\nLink: {link}\n")
+            for result in results:
+                formatted_results.append(f"Title: {result['title']}\nSnippet: {result['snippet']}\nLink: {result['link']}\n")
             return "\n".join(formatted_results)
         else:
             return "No organic search results found."
 
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         return f"Error performing web search: {e}"
     except Exception as e:
-        return f"An unexpected error occurred: {e}"
\ No newline at end of file
+        return f"An unexpected error occurred: {e}"
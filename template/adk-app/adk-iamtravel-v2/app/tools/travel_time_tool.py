@@ -0,0 +1,179 @@
+import csv
+import hashlib
+import json
+import os
+import re
+import tempfile
+from collections import Counter, defaultdict
+from typing import Optional
+
+import numpy as np
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+
+from app.tools.exit_loop_tool import COMPLETION_PHRASE
+
+# --- Local travel-time estimation for critic_agent ---
+# Places are resolved against an on-disk POI index: coordinates in a .npy file
+# opened with mmap_mode="r", names in a JSON file, and a coarse lat/lon grid for
+# "what is near here" lookups. Travel time is a vectorized haversine distance,
+# scaled by a detour factor and a per-mode speed. When both places in the plan
+# resolve, critic_agent's verdict is computed locally and the LLM is skipped.
+# The index is built once per version of the seed CSV: it lives in a
+# subdirectory named after the CSV's hash, and each file is written to a
+# temporary name and moved into place, so a reader never sees a partial index.
+
+POI_SEED_CSV = os.path.join(os.path.dirname(__file__), "..", "data", "poi_seed.csv")
+POI_INDEX_DIR = os.getenv("POI_INDEX_DIR", os.path.join(tempfile.gettempdir(), "iamtravel_poi_index"))
+TRAVEL_FAST_PATH = os.getenv("TRAVEL_FAST_PATH", "True").lower() == "true"
+
+MAX_TRAVEL_MINUTES = 45  # The constraint critic_agent checks.
+EARTH_RADIUS_KM = 6371.0
+DETOUR_FACTOR = 1.3  # Street distance vs. straight line.
+GRID_CELL_DEGREES = 0.05  # ~5 km cells.
+MODE_SPEED_KMH = {"walk": 4.8, "transit": 20.0, "drive": 25.0}
+MODE_OVERHEAD_MINUTES = {"walk": 0.0, "transit": 8.0, "drive": 5.0}  # waiting, parking
+
+
+def normalize_name(name: str) -> str:
+    name = re.sub(r"[^\w\s]", " ", name.lower())
+    return " ".join(w for w in name.split() if w not in {"the", "a"})
+
+
+def index_path(csv_path: str = POI_SEED_CSV, index_dir: str = POI_INDEX_DIR) -> str:
+    """The directory holding the index built from the CSV's current contents."""
+    with open(csv_path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:16]
+    return os.path.join(index_dir, digest)
+
+
+def _write_atomic(path: str, write):
+    """Calls write(file) on a temporary file next to path, then moves it into place."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def build_index(csv_path: str = POI_SEED_CSV, out_dir: str = POI_INDEX_DIR):
+    """Writes poi_coords.npy (N x 2 float64 lat/lon) and poi_meta.json from a CSV; poi_meta.json goes last."""
+    with open(csv_path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    os.makedirs(out_dir, exist_ok=True)
+    coords = np.array([[float(r["lat"]), float(r["lon"])] for r in rows], dtype=np.float64)
+    _write_atomic(os.path.join(out_dir, "poi_coords.npy"), lambda f: np.save(f, coords))
+    meta = [{"name": r["name"], "city": r["city"], "kind": r["kind"]} for r in rows]
+    _write_atomic(os.path.join(out_dir, "poi_meta.json"), lambda f: f.write(json.dumps(meta).encode()))
+
+
+def haversine_km(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise great-circle distances between (N, 2) and (M, 2) lat/lon arrays, as (N, M)."""
+    a, b = np.radians(a)[:, None, :], np.radians(b)[None, :, :]
+    dlat, dlon = b[..., 0] - a[..., 0], b[..., 1] - a[..., 1]
+    h = np.sin(dlat / 2) ** 2 + np.cos(a[..., 0]) * np.cos(b[..., 0]) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(h))
+
+
+def travel_minutes(a: np.ndarray, b: np.ndarray, mode: str = "transit") -> np.ndarray:
+    """Estimated door-to-door minutes for every origin/destination pair."""
+    distance = haversine_km(a, b) * DETOUR_FACTOR
+    return distance / MODE_SPEED_KMH[mode] * 60 + MODE_OVERHEAD_MINUTES[mode]
+
+
+class PoiIndex:
+    """Memory-mapped POI coordinates with name lookup and a spatial grid."""
+
+    def __init__(self, csv_path: str = POI_SEED_CSV, index_dir: str = POI_INDEX_DIR):
+        index_dir = index_path(csv_path, index_dir)
+        if not os.path.exists(os.path.join(index_dir, "poi_meta.json")):
+            build_index(csv_path, index_dir)
+        self.coords = np.load(os.path.join(index_dir, "poi_coords.npy"), mmap_mode="r")
+        with open(os.path.join(index_dir, "poi_meta.json")) as f:
+            self.meta = json.load(f)
+        self.by_name = {normalize_name(m["name"]): i for i, m in enumerate(self.meta)}
+        self.grid = defaultdict(list)
+        for i, (lat, lon) in enumerate(self.coords):
+            self.grid[self._cell(lat, lon)].append(i)
+
+    @staticmethod
+    def _cell(lat: float, lon: float):
+        return int(lat // GRID_CELL_DEGREES), int(lon // GRID_CELL_DEGREES)
+
+    def resolve(self, name: str) -> Optional[int]:
+        """Finds a POI by exact normalized name, else by the longest known name inside the text."""
+        key = normalize_name(name)
+        if key in self.by_name:
+            return self.by_name[key]
+        matches = [known for known in self.by_name if known and re.search(rf"\b{re.escape(known)}\b", key)]
+        return self.by_name[max(matches, key=len)] if matches else None
+
+    def nearby(self, row: int, kind: str, limit: int = 3):
+        """POIs of a kind in the 3x3 grid cells around a POI, nearest first."""
+        lat, lon = self.coords[row]
+        cy, cx = self._cell(lat, lon)
+        candidates = [i for dy in (-1, 0, 1) for dx in (-1, 0, 1) for i in self.grid.get((cy + dy, cx + dx), [])
+                      if i != row and self.meta[i]["kind"] == kind]
+        if not candidates:
+            return []
+        minutes = travel_minutes(np.asarray(self.coords[[row]]), np.asarray(self.coords[candidates]))[0]
+        order = np.argsort(minutes)[:limit]
+        return [(self.meta[candidates[i]]["name"], float(minutes[i])) for i in order]
+
+
+_index = None
+stats = Counter()
+
+
+def get_index() -> PoiIndex:
+    global _index
+    if _index is None:
+        _index = PoiIndex()
+    return _index
+
+
+def estimate_travel_time(origin: str, destination: str, mode: str = "transit") -> dict:
+    """Estimates travel time in minutes between two named places (mode: walk, transit or drive)."""
+    index = get_index()
+    a, b = index.resolve(origin), index.resolve(destination)
+    if a is None or b is None:
+        missing = [name for name, row in ((origin, a), (destination, b)) if row is None]
+        return {"status": "unknown_place", "unresolved": missing}
+    mode = mode if mode in MODE_SPEED_KMH else "transit"
+    minutes = travel_minutes(np.asarray(index.coords[[a]]), np.asarray(index.coords[[b]]), mode)[0, 0]
+    return {"status": "ok", "origin": index.meta[a]["name"], "destination": index.meta[b]["name"],
+            "mode": mode, "minutes": round(float(minutes), 1)}
+
+
+def parse_plan(plan: str):
+    """Splits 'Activity: X, Restaurant: Y' into (X, Y), or returns None."""
+    match = re.search(r"Activity:\s*(.+?),\s*Restaurant:\s*(.+)", plan or "", re.IGNORECASE)
+    return (match.group(1).strip(" '\"."), match.group(2).strip(" '\".")) if match else None
+
+
+def critic_fast_path(callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+    """before_model_callback for critic_agent: judges the plan locally when both places resolve."""
+    if not TRAVEL_FAST_PATH:
+        return None
+    places = parse_plan(str(callback_context.state.get("current_plan", "")))
+    if not places:
+        stats["llm_fallback"] += 1
+        return None
+    result = estimate_travel_time(*places)
+    if result["status"] != "ok":
+        stats["llm_fallback"] += 1
+        return None
+    stats["fast_path"] += 1
+    if result["minutes"] <= MAX_TRAVEL_MINUTES:
+        verdict = COMPLETION_PHRASE
+    else:
+        index = get_index()
+        closer = index.nearby(index.resolve(places[0]), "restaurant")
+        hint = f" Restaurants near {result['origin']}: " + ", ".join(name for name, _ in closer) + "." if closer else ""
+        verdict = (f"This plan is inefficient: about {result['minutes']:.0f} minutes by transit between "
+                   f"{result['origin']} and {result['destination']}. Find a restaurant closer to the activity.{hint}")
+    return LlmResponse(content=types.Content(role="model", parts=[types.Part(text=verdict)]))
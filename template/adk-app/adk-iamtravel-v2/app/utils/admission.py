@@ -0,0 +1,308 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import math
+import os
+import time
+import weakref
+from collections import Counter
+from contextlib import contextmanager
+from typing import Optional
+
+from google.adk.plugins.base_plugin import BasePlugin
+
+from app.utils import metrics
+from app.utils.model_tiers import tier_policy
+
+# --- Admission control and a process-wide LLM/tool scheduler ---
+# Every model call and every outbound tool call (search) made through the shared
+# Runners first takes a slot from one scheduler: a bounded number of calls run at
+# once, the rest wait in a priority queue (interactive before batch, FIFO within
+# a class), and a per-model token bucket caps the request rate. /run checks the
+# backlog (calls queued, or requests admitted beyond the concurrency limit, which
+# covers a burst that arrives before anything has queued) before starting a
+# request and answers 429 with Retry-After when it is full, so a spike is shed at
+# the door instead of timing out inside the graph. Scheduler.track() takes over
+# an admitted request: it frees the slots the request still holds when it ends,
+# including when it is cancelled in the middle of a call (ADK does not run
+# after_run_callback then), and counts it out, even if its events are never read.
+#
+#   LLM_MAX_CONCURRENCY=16   LLM_MAX_QUEUE=64
+#   LLM_RATE_LIMITS="gemini-2.5-flash=10,gemini-2.5-pro=2"   # requests/second per model
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "True").lower() == "true"
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "64"))
+BATCH_QUEUE_SHARE = 0.5  # batch requests are turned away once the queue is half full
+
+PRIORITIES = {"interactive": 0, "batch": 1}
+GATED_TOOLS = {"google_search", "web_search", "third_party_web_search"}  # tools that call out of the process
+
+# The priority of the request being handled; set by fastapi_server.py per request.
+request_priority = contextvars.ContextVar("request_priority", default="interactive")
+# The slots held by the request being handled, as (plugin, key) pairs; set by Scheduler.track().
+request_slots = contextvars.ContextVar("request_slots", default=None)
+
+
+@contextmanager
+def priority(name: str):
+    """Runs the enclosed agent calls at a priority class, e.g. `with priority("batch"):`."""
+    token = request_priority.set(name if name in PRIORITIES else "interactive")
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+def parse_rates(spec: str) -> dict:
+    """Parses "model=rps,model=rps" into a dict."""
+    pairs = (item.split("=", 1) for item in spec.split(",") if "=" in item)
+    return {name.strip(): float(rate) for name, rate in pairs if float(rate) > 0}
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second with bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """Takes one token, going into debt if needed; returns how long to wait before using it."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+
+QUEUE_WAIT = metrics.register(metrics.Histogram(
+    "adk_scheduler_queue_wait_seconds", "Time a model or tool call waited for a slot and its rate limit.",
+    ["kind", "priority"], (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)))
+REJECTED = metrics.register(metrics.Counter("adk_admission_rejected_total", "Requests answered with 429.", ["priority"]))
+
+
+class Scheduler:
+    """A priority queue in front of a concurrency limit, plus per-resource token buckets."""
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, max_queue: int = LLM_MAX_QUEUE, rates=None):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.buckets = {name: TokenBucket(rate) for name, rate in (rates or {}).items()}
+        self.active = 0
+        self.requests = 0  # admitted requests still streaming
+        self.waiters = []  # heap of (priority rank, sequence, future)
+        self.sequence = itertools.count()
+        self.hold_seconds = 1.0  # moving average of how long a slot is held, for Retry-After
+        self.stats = Counter()
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for *_, future in self.waiters if not future.done())
+
+    @property
+    def backlog(self) -> int:
+        return max(self.queue_depth, self.requests - self.max_concurrency)
+
+    def admit(self, priority_name: str) -> bool:
+        """Counts a new request in, or returns False when this class should be turned away."""
+        limit = self.max_queue * (BATCH_QUEUE_SHARE if priority_name == "batch" else 1)
+        if self.backlog >= limit:
+            self.stats[f"rejected_{priority_name}"] += 1
+            REJECTED.inc((priority_name,))
+            return False
+        self.requests += 1
+        return True
+
+    def track(self, events) -> "TrackedRequest":
+        """Takes over an admitted request's events; call it right after admit() succeeds."""
+        return TrackedRequest(self, events)
+
+    def _count_out(self):
+        self.requests -= 1
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained, for the Retry-After header."""
+        waves = (self.backlog + 1) / self.max_concurrency
+        return max(1, min(60, math.ceil(waves * self.hold_seconds)))
+
+    async def acquire(self, resource: str, kind: str = "model"):
+        """Waits for a slot, then for the resource's rate limit. Returns the time of admission."""
+        priority_name = request_priority.get()
+        started = time.perf_counter()
+        if self.active < self.max_concurrency and not self.queue_depth:
+            self.active += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self.waiters, (PRIORITIES.get(priority_name, 0), next(self.sequence), future))
+            try:
+                await future  # release() hands its slot over directly
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self.release()
+                raise
+        bucket = self.buckets.get(resource)
+        delay = bucket.reserve() if bucket else 0.0
+        if delay:
+            self.stats["rate_limited"] += 1
+            await asyncio.sleep(delay)
+        admitted = time.perf_counter()
+        QUEUE_WAIT.observe((kind, priority_name), admitted - started)
+        return admitted
+
+    def release(self, admitted: Optional[float] = None):
+        if admitted is not None:
+            self.hold_seconds = 0.9 * self.hold_seconds + 0.1 * (time.perf_counter() - admitted)
+        while self.waiters:
+            _, _, future = heapq.heappop(self.waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+
+class TrackedRequest:
+    """An admitted request's events. Iterating passes them through; when they end, however
+    they end, the slots the request still holds are freed. The request is counted out once:
+    when its events end, or when it is dropped without having been read."""
+
+    def __init__(self, scheduler: Scheduler, events):
+        self.events = events
+        self.count_out = weakref.finalize(self, scheduler._count_out)  # runs at most once
+
+    async def __aiter__(self):
+        slots = set()
+        request_slots.set(slots)
+        try:
+            async for event in self.events:
+                yield event
+        finally:
+            for plugin, key in list(slots):
+                plugin._release(key)
+            self.count_out()
+
+
+class AdmissionPlugin(BasePlugin):
+    """Holds a scheduler slot for the duration of each model call and outbound tool call."""
+
+    def __init__(self, scheduler: Scheduler):
+        super().__init__(name="admission")
+        self.scheduler = scheduler
+        self.held = {}  # (invocation id, agent name or function call id) -> admission time
+
+    async def _acquire(self, key, resource: str, kind: str):
+        self.held[key] = await self.scheduler.acquire(resource, kind)
+        slots = request_slots.get()
+        if slots is not None:
+            slots.add((self, key))
+
+    def _release(self, key):
+        slots = request_slots.get()
+        if slots is not None:
+            slots.discard((self, key))
+        admitted = self.held.pop(key, None)
+        if admitted is not None:
+            self.scheduler.release(admitted)
+
+    async def before_model_callback(self, *, callback_context, llm_request):
+        invocation_id, agent_name = callback_context.invocation_id, callback_context.agent_name
+        await self._acquire((invocation_id, agent_name), llm_request.model or "", "model")
+        tier_policy.restart_clock(invocation_id, agent_name)  # tier latency stats exclude queueing
+        return None
+
+    async def after_model_callback(self, *, callback_context, llm_response):
+        if not llm_response.partial:
+            self._release((callback_context.invocation_id, callback_context.agent_name))
+        return None
+
+    async def on_model_error_callback(self, *, callback_context, llm_request, error):
+        self._release((callback_context.invocation_id, callback_context.agent_name))
+        return None
+
+    async def on_event_callback(self, *, invocation_context, event):
+        # A reply produced by an agent's own before_model_callback never reaches
+        # after_model_callback; its event is the first point the slot can be freed.
+        if not event.partial:
+            self._release((invocation_context.invocation_id, event.author))
+        return None
+
+    async def before_tool_callback(self, *, tool, tool_args, tool_context):
+        if tool.name in GATED_TOOLS:
+            await self._acquire((tool_context.invocation_id, tool_context.function_call_id), f"tool:{tool.name}", "tool")
+        return None
+
+    async def after_tool_callback(self, *, tool, tool_args, tool_context, result):
+        self._release((tool_context.invocation_id, tool_context.function_call_id))
+        return None
+
+    async def on_tool_error_callback(self, *, tool, tool_args, tool_context, error):
+        self._release((tool_context.invocation_id, tool_context.function_call_id))
+        return None
+
+    async def after_run_callback(self, *, invocation_context):
+        for key in [k for k in self.held if k[0] == invocation_context.invocation_id]:
+            self._release(key)
+
+
+scheduler = Scheduler(rates=parse_rates(os.getenv("LLM_RATE_LIMITS", "")))
+metrics.register(metrics.Gauge("adk_scheduler_queue_depth", "Calls waiting for a scheduler slot.", lambda: scheduler.queue_depth))
+metrics.register(metrics.Gauge("adk_scheduler_active", "Calls holding a scheduler slot.", lambda: scheduler.active))
+metrics.register(metrics.Gauge("adk_admitted_requests", "Requests admitted by /run and still running.", lambda: scheduler.requests))
+
+
+def admission_plugins() -> list:
+    """The plugins every Runner should get: none at all when admission control is disabled."""
+    return [AdmissionPlugin(scheduler)] if ADMISSION_ENABLED else []
+
+
+if __name__ == "__main__":
+    # python -m app.utils.admission
+    # A burst of interactive and batch requests against a small fake quota.
+    import statistics
+
+    from google.adk.sessions import InMemorySessionService
+    from google.genai.types import Content, Part
+
+    from app.utils.fake_llm import FakeLlm, install_fake_llm
+
+    install_fake_llm(latency=0.05)
+    from app.agents.router_agent import root_agent
+    from app.utils.runner_registry import RunnerRegistry
+
+    message = Content(role="user", parts=[Part(text="Plan a day trip to a beach near Los Angeles.")])
+    FakeLlm.config["route"] = "day_trip_agent"
+
+    async def burst(label, plugins, requests=60):
+        session_service = InMemorySessionService()
+        runner = RunnerRegistry(plugins=plugins).get(root_agent, "admission", session_service)
+        latencies = {"interactive": [], "batch": []}
+
+        async def one(i):
+            klass = "batch" if i % 2 else "interactive"
+            session = await session_service.create_session(app_name="admission", user_id="u")
+            with priority(klass):
+                start = time.perf_counter()
+                async for _ in runner.run_async(user_id="u", session_id=session.id, new_message=Content(
+                        role="user", parts=[Part(text=f"{message.parts[0].text} #{i}")])):
+                    pass
+                latencies[klass].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[one(i) for i in range(requests)])
+        print(f"{label:<34} total {time.perf_counter() - start:5.2f}s  "
+              + "  ".join(f"{k} p50 {statistics.median(v) * 1e3:6.0f} ms" for k, v in latencies.items()))
+
+    async def main():
+        await burst("no scheduler", [])
+        await burst("8 slots, priority classes", [AdmissionPlugin(Scheduler(max_concurrency=8))])
+        await burst("8 slots, 20 rps on the model", [AdmissionPlugin(Scheduler(
+            max_concurrency=8, rates={"gemini-2.5-flash": 20}))])
+        full = Scheduler(max_concurrency=2, max_queue=4)
+        admitted = Counter(klass for klass in ["interactive", "batch"] * 10 if full.admit(klass))
+        print(f"burst of 10 interactive + 10 batch at 2 slots / queue 4: admitted {dict(admitted)}, "
+              f"Retry-After {full.retry_after()}s")
+
+    asyncio.run(main())
@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+
+from google.adk.agents import BaseAgent
+from google.adk.sessions import BaseSessionService
+from google.genai.types import Content, Part
+
+from app.utils.admission import priority
+from app.utils.event_stream import DeltaProjector, dumps
+from app.utils.runner_registry import runner_registry
+
+# --- Batch runs ---
+# run_batch() takes many {"id", "query"} items and runs each distinct query once,
+# in its own throwaway session, with at most `concurrency` in flight. Results come
+# back in completion order, one dict per input id:
+#   {"id", "status": "ok" | "error" | "skipped", "text", "author", "elapsed_ms",
+#    "budget"?, "duplicate_of"?, "error"?}
+# Items whose id is in `skip_ids` are not run again, which is how an interrupted
+# batch resumes: pass the ids already completed, or use run_batch_file(), which
+# reads them back from its own NDJSON output. Model calls run at "batch"
+# priority, so interactive /run traffic goes first (see app/utils/admission.py).
+#
+#   python -m app.utils.batch_runner queries.txt results.ndjson
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_APP_NAME = "batch"
+BATCH_USER_ID = "batch"
+
+
+def query_key(query: str) -> str:
+    """Identical queries up to case and whitespace share one run."""
+    return " ".join(query.lower().split())
+
+
+def item_id(query: str) -> str:
+    return hashlib.sha1(query_key(query).encode()).hexdigest()[:12]
+
+
+def normalize_items(items) -> list:
+    """Accepts strings or {"id", "query"} dicts; missing ids are derived from the query.
+
+    Raises ValueError for anything else, and for an id given twice with different queries.
+    """
+    if not isinstance(items, list):
+        raise ValueError("items must be a list")
+    out, queries = [], {}
+    for position, item in enumerate(items):
+        if isinstance(item, str):
+            item = {"query": item}
+        if not isinstance(item, dict) or not isinstance(item.get("query", ""), str):
+            raise ValueError(f"item {position}: expected a query string or an {{\"id\", \"query\"}} object")
+        query = item.get("query", "").strip()
+        item = {"id": str(item.get("id") or item_id(query)), "query": query}
+        if queries.setdefault(item["id"], query_key(query)) != query_key(query):
+            raise ValueError(f"item {position}: duplicate id {item['id']!r} with a different query")
+        out.append(item)
+    return out
+
+
+async def run_query(agent: BaseAgent, query: str, session_service: BaseSessionService) -> dict:
+    """Runs one query in a fresh session and returns its final answer."""
+    session = await session_service.create_session(
+        app_name=BATCH_APP_NAME, user_id=BATCH_USER_ID, session_id=f"batch-{uuid.uuid4().hex}")
+    runner = runner_registry.get(agent, BATCH_APP_NAME, session_service)
+    projector = DeltaProjector()
+    try:
+        async for event in runner.run_async(user_id=BATCH_USER_ID, session_id=session.id,
+                                            new_message=Content(role="user", parts=[Part(text=query)])):
+            projector.project(event)
+    finally:
+        await session_service.delete_session(app_name=BATCH_APP_NAME, user_id=BATCH_USER_ID, session_id=session.id)
+    return projector.final or {"author": None, "text": ""}
+
+
+async def run_batch(items, agent: BaseAgent, session_service: BaseSessionService,
+                    concurrency: int = BATCH_CONCURRENCY, skip_ids=()):
+    """Yields one result dict per item, in completion order."""
+    items, skip_ids = normalize_items(items), set(skip_ids)
+    groups = {}  # query key -> ids sharing that query, first one is the one that runs
+    seen = set()
+    for item in items:
+        if item["id"] in seen:
+            continue  # the same id and query twice (e.g. a repeated query without an id) is one item
+        seen.add(item["id"])
+        if item["id"] in skip_ids:
+            yield {"id": item["id"], "status": "skipped"}
+            continue
+        if not item["query"]:
+            yield {"id": item["id"], "status": "error", "error": "empty query"}
+            continue
+        groups.setdefault(query_key(item["query"]), (item["query"], []))[1].append(item["id"])
+
+    pending = asyncio.Queue()
+    for query, ids in groups.values():
+        pending.put_nowait((query, ids))
+    done = asyncio.Queue()
+
+    async def worker():
+        with priority("batch"):
+            while not pending.empty():
+                query, ids = pending.get_nowait()
+                started = time.perf_counter()
+                try:
+                    result = {"status": "ok", **await run_query(agent, query, session_service)}
+                except Exception as e:
+                    result = {"status": "error", "error": str(e)}
+                result["elapsed_ms"] = round((time.perf_counter() - started) * 1e3, 1)
+                await done.put((ids, result))
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(groups)))]
+    try:
+        for _ in range(len(groups)):
+            ids, result = await done.get()
+            yield {"id": ids[0], **result}
+            for duplicate in ids[1:]:
+                yield {"id": duplicate, **result, "duplicate_of": ids[0]}
+    finally:
+        for task in workers:
+            task.cancel()
+
+
+def completed_ids(path: str) -> set:
+    """Ids with status "ok" in an NDJSON results file (a partial last line is ignored)."""
+    ids = set()
+    if not os.path.exists(path):
+        return ids
+    with open(path) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            if result.get("status") == "ok":
+                ids.add(result["id"])
+    return ids
+
+
+async def run_batch_file(items, output_path: str, agent: BaseAgent, session_service: BaseSessionService,
+                         concurrency: int = BATCH_CONCURRENCY) -> dict:
+    """Appends results to an NDJSON file, skipping ids it already holds; returns status counts."""
+    counts = {}
+    with open(output_path, "a") as out:
+        async for result in run_batch(items, agent, session_service, concurrency, completed_ids(output_path)):
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+            if result["status"] != "skipped":
+                out.write(dumps(result) + "\n")
+                out.flush()
+    return counts
+
+
+if __name__ == "__main__":
+    # python -m app.utils.batch_runner queries.txt results.ndjson [--fake]
+    # queries.txt holds one query per line, or NDJSON {"id", "query"} objects.
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run many queries through root_agent.")
+    parser.add_argument("queries")
+    parser.add_argument("output")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--fake", action="store_true", help="Use the local fake model (app/utils/fake_llm.py).")
+    args = parser.parse_args()
+
+    if args.fake:
+        from app.utils.fake_llm import install_fake_llm, lognormal_latency
+        install_fake_llm(latency=lognormal_latency(0.05))
+    from app.agents.router_agent import root_agent
+    from app.utils.sqlite_session_service import create_session_service
+
+    with open(args.queries) as f:
+        lines = [line.strip() for line in f if line.strip()]
+    items = [json.loads(line) if line.startswith("{") else line for line in lines]
+
+    async def main():
+        started = time.perf_counter()
+        counts = await run_batch_file(items, args.output, root_agent, create_session_service(), args.concurrency)
+        print(f"{counts} in {time.perf_counter() - started:.2f}s -> {args.output}")
+
+    asyncio.run(main())
@@ -0,0 +1,329 @@
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from google.adk.agents import LoopAgent
+from google.adk.models import LlmResponse
+from google.adk.plugins.base_plugin import BasePlugin
+from google.genai import types
+
+from app.utils import metrics
+
+# --- Per-request budgets ---
+# Every run gets a Budget: at most `max_tokens` tokens and `max_model_calls` model
+# calls, and an answer within `deadline_seconds`. Any limit can be 0, which means
+# no limit. Every model call counts, including nested search agents (AgentTool
+# runs them on a Runner without plugins, so googlesearch_agent charges the budget
+# through its own callbacks) and calls made by parallel branches. The budget is
+# checked before each agent and each model call. Once it is spent:
+#   - a model call that is about to start is skipped. Its agent answers with the
+#     value it already holds under its output_key, if any, or the best state so far
+#   - the next agent to start answers with the best state so far: current_plan or
+#     whatever the finders have found. Every agent after it is skipped.
+#   - every later event escalates (set by the plugin's on_event_callback, before
+#     the enclosing LoopAgent looks at it), so refinement_loop stops without
+#     waiting for exit_loop
+# A LoopAgent also stops early when the last pass cost more than the budget has
+# left. Usage goes into custom_metadata["budget"] on final-response events and
+# into the "final" frame of /run?format=sse-delta.
+#
+#   REQUEST_MAX_TOKENS=20000  REQUEST_MAX_MODEL_CALLS=12  REQUEST_DEADLINE_SECONDS=30
+#   /run body: {..., "budget": {"max_tokens": 8000, "max_model_calls": 6, "deadline_seconds": 10}}
+
+BUDGETS_ENABLED = os.getenv("BUDGETS_ENABLED", "True").lower() == "true"
+REQUEST_MAX_TOKENS = int(os.getenv("REQUEST_MAX_TOKENS", "0"))
+REQUEST_MAX_MODEL_CALLS = int(os.getenv("REQUEST_MAX_MODEL_CALLS", "0"))
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "0"))
+
+# State the workflows build up, in the order they are worth reporting.
+BEST_STATE_KEYS = {
+    "destination": "Destination",
+    "museum_result": "Museum",
+    "concert_result": "Concert",
+    "restaurant_result": "Restaurant",
+}
+
+BUDGET_STOPS = metrics.register(metrics.Counter(
+    "adk_budget_stops_total", "Requests stopped early by their budget.", ["reason"]))
+
+# The budget of the request being handled; set by fastapi_server.py per request.
+current_budget = contextvars.ContextVar("current_budget", default=None)
+
+
+class Budget:
+    """Limits and usage for one request. A limit of 0 means unlimited."""
+
+    def __init__(self, max_tokens: int = REQUEST_MAX_TOKENS, max_model_calls: int = REQUEST_MAX_MODEL_CALLS,
+                 deadline_seconds: float = REQUEST_DEADLINE_SECONDS):
+        self.max_tokens = max_tokens
+        self.max_model_calls = max_model_calls
+        self.deadline_seconds = deadline_seconds
+        self.started = time.monotonic()  # restarted when the run starts
+        self.model_calls = 0
+        self.tokens = 0
+        self.exhausted = None    # why the budget stopped the request, once it has
+        self.answered = False    # the best-state answer has been given
+        self.invocation_id = None
+        self.loop_marks = {}     # loop name -> (calls, tokens, time) when its current pass started
+
+    @classmethod
+    def from_request(cls, spec: Optional[dict]) -> "Budget":
+        """A budget from a /run body's "budget" field; missing limits use the defaults.
+
+        Raises ValueError unless spec is None or an object whose limits are non-negative numbers.
+        """
+        if spec is None:
+            spec = {}
+        if not isinstance(spec, dict):
+            raise ValueError("budget must be an object")
+        limits = {}
+        for name, parse, default in (("max_tokens", int, REQUEST_MAX_TOKENS),
+                                     ("max_model_calls", int, REQUEST_MAX_MODEL_CALLS),
+                                     ("deadline_seconds", float, REQUEST_DEADLINE_SECONDS)):
+            value = spec.get(name, default)
+            if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+                raise ValueError(f"budget.{name} must be a number")
+            try:
+                limits[name] = parse(float(value)) if parse is int else parse(value)
+            except (ValueError, OverflowError):
+                raise ValueError(f"budget.{name} must be a number") from None
+            if not limits[name] >= 0:  # also rejects NaN
+                raise ValueError(f"budget.{name} must not be negative")
+        return cls(**limits)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def charge(self, usage_metadata):
+        self.model_calls += 1
+        if usage_metadata:
+            self.tokens += usage_metadata.total_token_count or (
+                (usage_metadata.prompt_token_count or 0) + (usage_metadata.candidates_token_count or 0))
+
+    def check(self) -> Optional[str]:
+        """The reason the budget is spent, or None while there is some left."""
+        if self.exhausted is None:
+            if self.max_tokens and self.tokens >= self.max_tokens:
+                self._stop("tokens")
+            elif self.max_model_calls and self.model_calls >= self.max_model_calls:
+                self._stop("model_calls")
+            elif self.deadline_seconds and self.elapsed() >= self.deadline_seconds:
+                self._stop("deadline")
+        return self.exhausted
+
+    def check_pass(self, loop: str) -> Optional[str]:
+        """Called as a loop pass starts: stops the loop if another pass like the last one would not fit."""
+        now = (self.model_calls, self.tokens, time.monotonic())
+        last = self.loop_marks.get(loop)
+        self.loop_marks[loop] = now
+        if last is None or self.check():
+            return self.exhausted
+        calls, tokens, seconds = (now[i] - last[i] for i in range(3))
+        if ((self.max_model_calls and self.model_calls + calls > self.max_model_calls)
+                or (self.max_tokens and self.tokens + tokens > self.max_tokens)
+                or (self.deadline_seconds and self.elapsed() + seconds > self.deadline_seconds)):
+            self._stop("loop_forecast")
+        return self.exhausted
+
+    def _stop(self, reason: str):
+        self.exhausted = reason
+        BUDGET_STOPS.inc((reason,))
+
+    def usage(self) -> dict:
+        return {
+            "model_calls": self.model_calls,
+            "tokens": self.tokens,
+            "elapsed_s": round(self.elapsed(), 3),
+            "limits": {"max_tokens": self.max_tokens, "max_model_calls": self.max_model_calls,
+                       "deadline_seconds": self.deadline_seconds},
+            "exhausted": self.exhausted,
+        }
+
+
+@contextmanager
+def budget_scope(budget: Budget):
+    """Runs the enclosed agent calls under a budget, e.g. `with budget_scope(Budget(max_model_calls=5)):`."""
+    token = current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        current_budget.reset(token)
+
+
+def best_so_far(state) -> str:
+    """The most useful answer the state holds: the current plan, or whatever has been found."""
+    if state.get("current_plan"):
+        return state["current_plan"]
+    found = [f"- {label}: {state[key]}" for key, label in BEST_STATE_KEYS.items() if state.get(key)]
+    if found:
+        return "I had to stop early to stay within this request's budget. Here is what I found so far:\n" + "\n".join(found)
+    return "I had to stop before answering to stay within this request's budget. Please try again or narrow it down."
+
+
+def _reply(text: str) -> types.Content:
+    return types.Content(role="model", parts=[types.Part(text=text)] if text else [])
+
+
+def allows_extra_call(in_flight: int = 0) -> bool:
+    """Whether the request's budget has room for a model call the agent did not ask for (a retry or a
+    hedge), on top of `in_flight` calls that are running and not charged yet."""
+    budget = current_budget.get()
+    if budget is None:
+        return True
+    if budget.check():
+        return False
+    return not budget.max_model_calls or budget.model_calls + in_flight < budget.max_model_calls
+
+
+def charge_extra_call(usage_metadata=None):
+    """Charges a model call made on the agent's behalf to the request's budget."""
+    budget = current_budget.get()
+    if budget is not None:
+        budget.charge(usage_metadata)
+
+
+def before_model_callback(callback_context, llm_request, agent=None) -> Optional[LlmResponse]:
+    """Skips the model call once the request's budget is spent; usable as an agent callback.
+    The answer is the value under `agent`'s output_key, if given and set, else the best state so far."""
+    budget = current_budget.get()
+    if budget is None or not budget.check():
+        return None
+    output_key = getattr(agent, "output_key", None)
+    if output_key:
+        text = callback_context.state.get(output_key) or "Not found within this request's budget."
+    else:
+        text = best_so_far(callback_context.state)
+    return LlmResponse(content=_reply(text))
+
+
+def after_model_callback(callback_context, llm_response) -> Optional[LlmResponse]:
+    """Charges a finished model call to the request's budget; usable as an agent callback."""
+    budget = current_budget.get()
+    if budget is not None and not llm_response.partial:
+        budget.charge(llm_response.usage_metadata)
+    return None
+
+
+class BudgetPlugin(BasePlugin):
+    """Gives every run a budget, enforces it before each agent and model call, and reports usage."""
+
+    def __init__(self):
+        super().__init__(name="budgets")
+        self.budgets = {}  # invocation id -> Budget
+        self.roots = {}    # invocation id -> root of the agent tree, to look agents up by name
+
+    async def before_run_callback(self, *, invocation_context):
+        budget = current_budget.get()
+        if budget is None or budget.invocation_id not in (None, invocation_context.invocation_id):
+            budget = Budget()  # none given, or one left behind by a run that never finished
+            current_budget.set(budget)
+        if budget.invocation_id is None:
+            budget.invocation_id, budget.started = invocation_context.invocation_id, time.monotonic()
+        self.budgets[invocation_context.invocation_id] = budget
+        self.roots[invocation_context.invocation_id] = invocation_context.agent.root_agent
+        return None
+
+    async def before_agent_callback(self, *, agent, callback_context):
+        budget = self.budgets.get(callback_context.invocation_id)
+        if budget is None:
+            return None
+        parent = agent.parent_agent
+        if isinstance(parent, LoopAgent) and parent.sub_agents[0] is agent:
+            budget.check_pass(parent.name)
+        if not budget.check():
+            return None
+        if budget.answered:
+            return _reply("")  # skipped without a word; the best-state answer has been given
+        budget.answered = True
+        return _reply(best_so_far(callback_context.state))
+
+    async def before_model_callback(self, *, callback_context, llm_request):
+        root = self.roots.get(callback_context.invocation_id)
+        agent = root.find_agent(callback_context.agent_name) if root else None
+        return before_model_callback(callback_context, llm_request, agent)
+
+    async def after_model_callback(self, *, callback_context, llm_response):
+        return after_model_callback(callback_context, llm_response)
+
+    async def on_event_callback(self, *, invocation_context, event):
+        # Annotated in place: returning an event would hide it from the plugins after this one.
+        budget = self.budgets.get(invocation_context.invocation_id)
+        if budget is None or event.partial:
+            return None
+        if budget.check():
+            event.actions.escalate = True  # ends the enclosing loop, if any
+        if event.is_final_response():
+            event.custom_metadata = {**(event.custom_metadata or {}), "budget": budget.usage()}
+        return None
+
+    async def after_run_callback(self, *, invocation_context):
+        budget = self.budgets.pop(invocation_context.invocation_id, None)
+        self.roots.pop(invocation_context.invocation_id, None)
+        if budget is not None and current_budget.get() is budget:
+            current_budget.set(None)
+
+
+def budget_plugins() -> list:
+    """The plugins every Runner should get: none at all when budgets are disabled."""
+    return [BudgetPlugin()] if BUDGETS_ENABLED else []
+
+
+if __name__ == "__main__":
+    # python -m app.utils.budgets
+    # The fake model behind three workflows, unbounded and then under a budget:
+    # what the request costs, when it stops and what it answers with.
+    import asyncio
+
+    from google.adk.sessions import InMemorySessionService
+
+    from app.utils.fake_llm import FakeLlm, install_fake_llm
+    # The module the agents' own callbacks use, not this __main__ copy with its own current_budget.
+    from app.utils.budgets import Budget, BudgetPlugin, budget_scope
+
+    install_fake_llm(latency=0.1, search_latency=0.2)
+    from app.agents.router_agent import root_agent
+    from app.utils.response_cache import response_cache
+    from app.utils.runner_registry import RunnerRegistry
+    from app.utils.search_cache import search_cache
+
+    runner = RunnerRegistry(plugins=[BudgetPlugin()]).get(root_agent, "budgets", InMemorySessionService())
+    cases = [
+        ("iterative_planner_agent", "Plan a trip to London. I want to visit the British Museum and eat at a restaurant "
+                                    "nearby. The total travel time between the two should be short.", {"loop_passes": 3},
+         Budget(max_model_calls=3)),
+        ("iterative_planner_agent", "Plan a trip to London near the British Museum.", {"loop_passes": 3},
+         Budget(max_tokens=150)),
+        ("parallel_planner_agent", "Plan a trip to San Francisco. I want to visit a museum, see a concert, and eat "
+                                   "at a nice restaurant.", {}, Budget(deadline_seconds=0.5)),
+        ("find_and_navigate_agent", "Find me a good Italian restaurant in New York City and give me directions "
+                                    "from Times Square.", {}, Budget(max_model_calls=2)),
+    ]
+
+    async def run(route, query, config, budget):
+        FakeLlm.config.update({"route": route, "loop_passes": 2, **config})
+        FakeLlm.calls.clear()
+        search_cache.entries.clear()  # both runs pay for every call
+        response_cache.indexes.clear()
+        session = await runner.session_service.create_session(app_name="budgets", user_id="u")
+        answer, usage = "", {}
+        with budget_scope(budget):
+            async for event in runner.run_async(user_id="u", session_id=session.id,
+                                                new_message=types.Content(role="user", parts=[types.Part(text=query)])):
+                if event.is_final_response() and event.content and event.content.parts:
+                    answer = f"{event.author}: {event.content.parts[0].text}"
+                if event.custom_metadata and "budget" in event.custom_metadata:
+                    usage = event.custom_metadata["budget"]
+        limits = ", ".join(f"{k}={v}" for k, v in usage["limits"].items() if v) or "none"
+        print(f"  limits {limits:<22} calls {usage['model_calls']:2d} (model saw {sum(FakeLlm.calls.values()):2d})  "
+              f"tokens {usage['tokens']:5d}  {usage['elapsed_s']:5.2f}s  stopped: {usage['exhausted']}")
+        print("    " + answer.replace("\n", "\n    "))
+
+    async def main():
+        for route, query, config, budget in cases:
+            print(f"\n{route}")
+            await run(route, query, config, Budget(0, 0, 0))
+            await run(route, query, config, budget)
+
+    asyncio.run(main())
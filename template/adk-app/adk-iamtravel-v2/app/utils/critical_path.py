@@ -0,0 +1,350 @@
+import os
+import re
+from typing import Optional
+
+from google.adk.agents import BaseAgent, LlmAgent, LoopAgent, ParallelAgent
+from google.adk.tools.agent_tool import AgentTool
+from google.adk.tools.google_search_tool import GoogleSearchTool
+
+from app.agents.deadline_agent import DeadlineParallelAgent
+from app.agents.lazy_agent import LazyAgent
+from app.agents.template_agent import TemplateAgent
+from app.utils import metrics
+
+# --- Critical-path cost model of the agent graph ---
+# Builds a cost model for each route of root_agent and shows which chain of
+# model and tool calls sets its latency:
+#   - the steps of a SequentialAgent add up
+#   - a ParallelAgent costs as much as its slowest branch, and no branch of a
+#     DeadlineParallelAgent costs more than its deadline
+#   - a LoopAgent runs its steps once per pass
+#   - an LlmAgent costs its model calls plus its tool calls, and a nested
+#     AgentTool run (googlesearch_agent) is modelled as an agent of its own
+#   - a TemplateAgent only costs its LLM sub-agent on the runs that fall back to it
+#   - a LazyAgent is replaced by the agent it stands in for
+# With no measurements every model call takes CRITICAL_PATH_MODEL_SECONDS and
+# every function tool takes CRITICAL_PATH_TOOL_SECONDS. Loops run max_iterations
+# passes, and tool-using agents make two model calls with one call per tool.
+# Timings measured by MetricsPlugin replace these guesses where they exist: mean
+# call latency, calls per agent run, loop passes and template fallback share.
+# They come from this process, or from a /metrics scrape of a real or replayed
+# (MODEL_TRANSPORT=replay) run. The report prints each route's critical path as
+# text. It can also write folded stacks (one "a;b;c milliseconds" line per step
+# on the critical path) for flamegraph.pl or speedscope. Off-path parallel
+# branches are left out, since a flame graph adds up widths.
+#
+#   python -m app.utils.critical_path [--metrics http://localhost:8000/metrics] [--folded out.folded]
+
+CRITICAL_PATH_MODEL_SECONDS = float(os.getenv("CRITICAL_PATH_MODEL_SECONDS", "1.5"))
+CRITICAL_PATH_TOOL_SECONDS = float(os.getenv("CRITICAL_PATH_TOOL_SECONDS", "0.2"))
+CRITICAL_PATH_LOOP_PASSES = 3  # for a LoopAgent without max_iterations
+
+_SAMPLE = re.compile(r'^(\w+)\{(.*)\} (\S+)$')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+class Timings:
+    """Measured sums and counts from MetricsPlugin's histograms and counters."""
+
+    def __init__(self):
+        self.series = {}  # (metric, workflow, agent, tool or path) -> [sum, count]
+
+    def add(self, metric: str, labels: dict, total: float, count: float):
+        key = (metric, labels.get("workflow", ""), labels.get("agent") or labels.get("stage", ""),
+               labels.get("tool") or labels.get("path", ""))
+        series = self.series.setdefault(key, [0.0, 0.0])
+        series[0] += total
+        series[1] += count
+
+    def total(self, metric: str, agent: str, sub: str = "", workflow: Optional[str] = None):
+        """(sum, count) over every workflow, or just `workflow`."""
+        total = count = 0.0
+        for (name, flow, who, what), (s, c) in self.series.items():
+            if name == metric and who == agent and what == sub and workflow in (None, flow):
+                total, count = total + s, count + c
+        return total, count
+
+    def mean(self, metric: str, agent: str, sub: str = "", workflow: Optional[str] = None) -> Optional[float]:
+        total, count = self.total(metric, agent, sub, workflow)
+        return total / count if count else None
+
+    def per_run(self, metric: str, agent: str, sub: str = "") -> Optional[float]:
+        """Calls per run of `agent`, or None if the agent was never seen to run."""
+        runs = self.total(metrics.AGENT_SECONDS.name, agent)[1]
+        return self.total(metric, agent, sub)[1] / runs if runs else None
+
+    def fallback_share(self, stage: str) -> Optional[float]:
+        """Share of a TemplateAgent's runs that went to its LLM sub-agent."""
+        fallback = self.total("adk_template_stage_total", stage, "fallback")[0]
+        fast = self.total("adk_template_stage_total", stage, "fast_path")[0]
+        return fallback / (fallback + fast) if fallback + fast else None
+
+    @classmethod
+    def from_registry(cls, registry=None) -> "Timings":
+        """What this process's MetricsPlugin has recorded so far."""
+        timings = cls()
+        for metric in metrics.REGISTRY if registry is None else registry:
+            if isinstance(metric, (metrics.Histogram, metrics.Counter)):
+                with metric.lock:
+                    items = list(metric.series.items())
+                for labels, value in items:
+                    labels = dict(zip(metric.labelnames, labels))
+                    if isinstance(metric, metrics.Histogram):
+                        timings.add(metric.name, labels, value[-2], value[-1])
+                    else:
+                        timings.add(metric.name, labels, value, 1)
+        return timings
+
+    @classmethod
+    def from_exposition(cls, text: str) -> "Timings":
+        """Parses /metrics output (Prometheus text format)."""
+        timings = cls()
+        for line in text.splitlines():
+            match = _SAMPLE.match(line.strip())
+            if not match or match.group(1).endswith("_bucket"):
+                continue
+            name, labels, value = match.group(1), dict(_LABEL.findall(match.group(2))), float(match.group(3))
+            if name.endswith("_sum"):
+                timings.add(name[:-4], labels, value, 0)
+            elif name.endswith("_count"):
+                timings.add(name[:-6], labels, 0, value)
+            else:
+                timings.add(name, labels, value, 1)
+        return timings
+
+
+class Node:
+    """One step of the cost model: seconds per run, and runs per run of its parent."""
+
+    def __init__(self, name: str, kind: str, children=(), seconds: float = 0.0, repeat: float = 1.0,
+                 measured: bool = False):
+        self.name, self.kind, self.children = name, kind, list(children)
+        self.repeat, self.measured, self.note = repeat, measured, ""
+        self.seconds = seconds if not self.children else self._combine()
+
+    def _combine(self) -> float:
+        totals = [child.total for child in self.children]
+        return max(totals, default=0.0) if self.kind == "parallel" else sum(totals)
+
+    @property
+    def total(self) -> float:
+        return self.seconds * self.repeat
+
+    def scale(self, factor: float):
+        """Stretches or shrinks the whole subtree, e.g. to match a measured time."""
+        self.seconds *= factor
+        for child in self.children:
+            child.scale(factor)
+
+    def fit(self, seconds: float):
+        if self.seconds > 0:
+            self.scale(seconds / self.seconds)
+        else:
+            self.seconds = seconds
+
+    def critical(self) -> list:
+        """The children on the critical path: the slowest branch of a parallel step, every step otherwise."""
+        if self.kind == "parallel":
+            return [max(self.children, key=lambda child: child.total)] if self.children else []
+        return self.children
+
+    def walk(self, weight: float = 1.0, stack: tuple = ()):
+        """(node, seconds it adds to the route, depth, stack of names) along the critical path."""
+        stack = stack + (self.name,)
+        weight *= self.repeat
+        yield self, self.seconds * weight, len(stack) - 1, stack
+        for child in self.critical():
+            yield from child.walk(weight, stack)
+
+
+def _tool_name(tool) -> str:
+    return getattr(tool, "name", None) or getattr(tool, "__name__", type(tool).__name__)
+
+
+def build(agent: BaseAgent, timings: Timings) -> Node:
+    """The cost model of one agent's run."""
+    if isinstance(agent, LazyAgent):
+        agent = agent.load()
+    if isinstance(agent, TemplateAgent):
+        sub = build(agent.sub_agents[0], timings)
+        share = timings.fallback_share(agent.name)
+        sub.repeat = share if share is not None else 0.0 if agent.fast_path else 1.0
+        sub.measured = share is not None
+        return Node(agent.name, "template", [sub])
+    if isinstance(agent, LoopAgent):
+        passes = timings.mean(metrics.LOOP_ITERATIONS.name, agent.name)
+        children = [build(sub, timings) for sub in agent.sub_agents]
+        for child in children:
+            child.repeat *= passes if passes is not None else agent.max_iterations or CRITICAL_PATH_LOOP_PASSES
+        node = Node(agent.name, "loop", children)
+        node.measured = passes is not None
+        return node
+    if isinstance(agent, ParallelAgent):
+        children = [build(sub, timings) for sub in agent.sub_agents]
+        if isinstance(agent, DeadlineParallelAgent):
+            for child in children:
+                deadline = agent.deadline_for(child.name)
+                if deadline > 0 and child.total > deadline:
+                    child.fit(deadline / child.repeat)
+                    child.note = f"cut at {deadline:g}s deadline"
+        return Node(agent.name, "parallel", children)
+    if not isinstance(agent, LlmAgent):
+        return Node(agent.name, "sequential", [build(sub, timings) for sub in agent.sub_agents])
+
+    function_tools = [tool for tool in agent.tools if not isinstance(tool, GoogleSearchTool)]
+    mean = timings.mean(metrics.MODEL_SECONDS.name, agent.name)
+    calls = timings.per_run(metrics.MODEL_SECONDS.name, agent.name)
+    children = [Node("model", "model", seconds=mean if mean is not None else CRITICAL_PATH_MODEL_SECONDS,
+                     repeat=calls if calls is not None else 2 if function_tools else 1, measured=calls is not None)]
+    for tool in function_tools:
+        name = _tool_name(tool)
+        mean = timings.mean(metrics.TOOL_SECONDS.name, agent.name, name)
+        calls = timings.per_run(metrics.TOOL_SECONDS.name, agent.name, name)
+        if isinstance(tool, AgentTool):  # AgentTool's own Runner has no plugins, so only the whole call is timed
+            node = Node(name, "tool", [build(tool.agent, timings)])
+            if mean is not None:
+                node.fit(mean)
+        else:
+            node = Node(name, "tool", seconds=mean if mean is not None else CRITICAL_PATH_TOOL_SECONDS)
+        node.repeat, node.measured = calls if calls is not None else 1, calls is not None
+        children.append(node)
+    return Node(agent.name, "agent", children)
+
+
+def routes(root: BaseAgent, timings: Optional[Timings] = None) -> dict:
+    """route name -> cost model of a request the router sends there: its own model call, then the route."""
+    timings = timings if timings is not None else Timings()
+    out = {}
+    for sub in root.sub_agents:
+        router = build(root, timings) if isinstance(root, LlmAgent) else Node(root.name, "agent")
+        router.children = [child for child in router.children if child.kind == "model"]
+        router.seconds = router._combine()
+        route = build(sub, timings)
+        # The router's call comes first; a route whose steps add up takes it as one more step.
+        steps = [router, route] if route.kind == "parallel" else [router] + route.children
+        out[route.name] = Node(route.name, route.kind, steps, repeat=route.repeat)
+    return out
+
+
+def measured_route_seconds(root: BaseAgent, route: str, timings: Timings):
+    """(mean seconds, runs) for a route as MetricsPlugin timed it end to end, or (None, 0)."""
+    seconds, runs = timings.total(metrics.AGENT_SECONDS.name, route, workflow=route)
+    if not runs:
+        return None, 0
+    router = timings.total(metrics.MODEL_SECONDS.name, root.name, workflow=root.name)[0]
+    router_runs = timings.total(metrics.AGENT_SECONDS.name, root.name, workflow=root.name)[1]
+    return seconds / runs + (router / router_runs if router_runs else 0.0), int(runs)
+
+
+def _label(node: Node) -> str:
+    details = []
+    if node.repeat != 1:
+        details.append(f"x{node.repeat:.2f}".rstrip("0").rstrip("."))
+    if node.kind == "parallel":
+        details.append(f"slowest of {len(node.children)} branches")
+    if node.kind in ("model", "tool", "loop") or node.note:
+        details.append(node.note or ("measured" if node.measured else "estimate"))
+    elif node.kind == "agent" and node.children and node.children[0].kind == "model" and node.measured:
+        details.append("measured")
+    return node.name + (f"  ({', '.join(details)})" if details else "")
+
+
+def report(root: BaseAgent, timings: Optional[Timings] = None, only: Optional[str] = None, top: int = 3) -> str:
+    """Each route's critical path as an indented tree, with the steps that cost the most."""
+    timings = timings if timings is not None else Timings()
+    lines = []
+    for name, tree in routes(root, timings).items():
+        if only and name != only:
+            continue
+        measured, runs = measured_route_seconds(root, name, timings)
+        header = f"== {name}: {tree.total:.2f}s on the critical path"
+        lines.append(header + (f" (measured end to end: {measured:.2f}s over {runs} runs)" if measured else ""))
+        steps = list(tree.walk())
+        for node, seconds, depth, _ in steps:
+            share = seconds / tree.total if tree.total else 0.0
+            lines.append(f"  {seconds:7.2f}s {share:4.0%}  {'  ' * depth}{_label(node)}")
+        leaves = sorted(((seconds, stack) for node, seconds, _, stack in steps if not node.children), reverse=True)
+        lines.append("  biggest steps: " + "; ".join(f"{' > '.join(stack[1:])} {seconds:.2f}s"
+                                                      for seconds, stack in leaves[:top]))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def folded(root: BaseAgent, timings: Optional[Timings] = None, only: Optional[str] = None) -> str:
+    """Folded stacks in milliseconds, one line per step on each route's critical path."""
+    lines = []
+    for name, tree in routes(root, timings).items():
+        if only and name != only:
+            continue
+        for node, seconds, _, stack in tree.walk():
+            self_seconds = seconds - sum(child.total * seconds / node.seconds
+                                         for child in node.critical()) if node.seconds else 0.0
+            if round(self_seconds * 1e3) > 0:
+                lines.append(f"{';'.join(stack)} {round(self_seconds * 1e3)}")
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    # python -m app.utils.critical_path                   static cost model
+    # python -m app.utils.critical_path --fake            overlays timings from runs on the fake model
+    # python -m app.utils.critical_path --metrics URL|FILE   overlays timings from a /metrics scrape
+    import argparse
+    import asyncio
+    import urllib.request
+
+    parser = argparse.ArgumentParser(description="Critical path of each route of root_agent.")
+    parser.add_argument("--metrics", help="A /metrics URL or a saved scrape to take timings from.")
+    parser.add_argument("--fake", action="store_true",
+                        help="Run every route on the local fake model first and use those timings.")
+    parser.add_argument("--route", help="Only this route.")
+    parser.add_argument("--folded", help="Also write folded stacks here ('-' for stdout).")
+    args = parser.parse_args()
+
+    if args.fake:
+        from app.utils.fake_llm import FakeLlm, install_fake_llm, lognormal_latency
+        install_fake_llm(latency=lognormal_latency(0.1, 0.3))
+    from app.agents.router_agent import root_agent
+    from app.utils.critical_path import Timings, folded, report  # reads the registry the plugins write to
+
+    timings = Timings()
+    if args.metrics:
+        if args.metrics.startswith(("http://", "https://")):
+            with urllib.request.urlopen(args.metrics) as response:
+                timings = Timings.from_exposition(response.read().decode())
+        else:
+            with open(args.metrics) as f:
+                timings = Timings.from_exposition(f.read())
+    elif args.fake:
+        from google.adk.sessions import InMemorySessionService
+        from google.genai.types import Content, Part
+
+        from app.utils.runner_registry import runner_registry  # the shared plugins, MetricsPlugin included
+
+        queries = {
+            "foodie_agent": "Find me a good Italian restaurant in New York City.",
+            "find_and_navigate_agent": "Find me a good Italian restaurant in New York City and give me directions from Times Square.",
+            "parallel_planner_agent": "Plan a trip to San Francisco. I want to visit a museum, see a concert, and eat at a nice restaurant.",
+            "day_trip_agent": "Plan a day trip to a beach near Los Angeles.",
+            "iterative_planner_agent": "Plan a trip to London. I want to visit the British Museum and eat at a restaurant nearby. The total travel time between the two should be short.",
+            "greeting_agent": "Hello there!",
+        }
+
+        async def run_all(repeats=5):
+            runner = runner_registry.get(root_agent, "critical_path", InMemorySessionService())
+            for route, query in queries.items():
+                FakeLlm.config["route"] = route
+                for i in range(repeats):
+                    session = await runner.session_service.create_session(app_name="critical_path", user_id="u")
+                    async for _ in runner.run_async(user_id="u", session_id=session.id, new_message=Content(
+                            role="user", parts=[Part(text=f"{query} #{i}")])):
+                        pass
+
+        asyncio.run(run_all())
+        timings = Timings.from_registry()
+
+    print(report(root_agent, timings, args.route))
+    if args.folded == "-":
+        print(folded(root_agent, timings, args.route), end="")
+    elif args.folded:
+        with open(args.folded, "w") as f:
+            f.write(folded(root_agent, timings, args.route))
@@ -0,0 +1,117 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder is the fallback.
+    orjson = None
+
+# --- Output formats for the /run endpoint ---
+# "json" (default) streams every ADK event as a full Pydantic dump, one per line.
+# "sse-delta" streams Server-Sent Events with only what a chat client renders:
+#   event: delta     {"author", "text"}   text as it is produced; with "replace": true the
+#                                         text replaces what was streamed for that author
+#                                         (the final reply differed from its chunks, e.g. after
+#                                         a model tier escalation)
+#   event: transfer  {"from", "to"}       an agent handed the request to another
+#   event: final     {"author", "text"}   the answer, sent once at the end, with "budget"
+#                                         (usage against the request budget) when it is known
+
+
+def dumps(payload) -> str:
+    """Compact JSON, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(payload).decode()
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
+
+def encode_full(event) -> str:
+    """The original format: the whole event as one JSON line."""
+    return json.dumps(event.model_dump(mode="json")) + "\n"
+
+
+def encode_sse(event_type: str, payload: dict) -> str:
+    return f"event: {event_type}\ndata: {dumps(payload)}\n\n"
+
+
+def _text(event) -> str:
+    if not event.content or not event.content.parts:
+        return ""
+    return "".join(part.text for part in event.content.parts if part.text and not part.thought)
+
+
+class DeltaProjector:
+    """Projects ADK events onto the few fields the sse-delta format sends."""
+
+    def __init__(self):
+        self.streamed = {}  # author -> text already sent as partial chunks
+        self.final = None
+
+    def project(self, event) -> list:
+        """Returns the (event type, payload) pairs to send for one ADK event."""
+        out = []
+        text = _text(event)
+        if text:
+            if event.partial:
+                self.streamed[event.author] = self.streamed.get(event.author, "") + text
+                out.append(("delta", {"author": event.author, "text": text}))
+            elif event.author in self.streamed:
+                # The aggregated copy of chunks the client already has, unless a callback rewrote it.
+                if self.streamed.pop(event.author) != text:
+                    out.append(("delta", {"author": event.author, "text": text, "replace": True}))
+            else:
+                out.append(("delta", {"author": event.author, "text": text}))
+        if event.actions and event.actions.transfer_to_agent:
+            out.append(("transfer", {"from": event.author, "to": event.actions.transfer_to_agent}))
+        if text and not event.partial and event.is_final_response():
+            self.final = {"author": event.author, "text": text}
+        if self.final and not event.partial and event.custom_metadata and "budget" in event.custom_metadata:
+            self.final["budget"] = event.custom_metadata["budget"]
+        return out
+
+    def finish(self) -> list:
+        return [("final", self.final or {"author": None, "text": ""})]
+
+
+async def sse_delta_stream(events):
+    """Wraps an async iterator of ADK events into sse-delta frames."""
+    projector = DeltaProjector()
+    async for event in events:
+        for event_type, payload in projector.project(event):
+            yield encode_sse(event_type, payload)
+    for event_type, payload in projector.finish():
+        yield encode_sse(event_type, payload)
+
+
+if __name__ == "__main__":
+    # python -m app.utils.event_stream
+    # Per-event serialization cost and bytes on the wire for a typical routed request.
+    import timeit
+
+    from google.adk.events import Event, EventActions
+    from google.genai import types
+
+    events = [
+        Event(author="router_agent", invocation_id="inv", content=types.Content(role="model", parts=[
+            types.Part(function_call=types.FunctionCall(id="c1", name="transfer_to_agent", args={"agent_name": "find_and_navigate_agent"}))])),
+        Event(author="router_agent", invocation_id="inv", actions=EventActions(transfer_to_agent="find_and_navigate_agent"),
+              content=types.Content(role="user", parts=[
+                  types.Part(function_response=types.FunctionResponse(id="c1", name="transfer_to_agent", response={"result": None}))])),
+        Event(author="foodie_agent_for_seq", invocation_id="inv", actions=EventActions(state_delta={"destination": "Carbone"}),
+              content=types.Content(role="model", parts=[types.Part(text="Carbone")])),
+        Event(author="transportation_agent", invocation_id="inv", content=types.Content(role="model", parts=[
+            types.Part(text="Walk south on 7th Ave, take the 1 train to Houston St, then walk two blocks east to Carbone.")])),
+    ]
+
+    def full():
+        return "".join(encode_full(e) for e in events)
+
+    def delta():
+        projector = DeltaProjector()
+        frames = [encode_sse(t, p) for e in events for t, p in projector.project(e)]
+        return "".join(frames + [encode_sse(t, p) for t, p in projector.finish()])
+
+    runs = 2000
+    for name, fn in (("json (full events)", full), ("sse-delta", delta)):
+        seconds = timeit.timeit(fn, number=runs) / (runs * len(events))
+        print(f"{name:<20} {seconds * 1e6:7.1f} us/event  {len(fn().encode()):6d} bytes for {len(events)} events")
+    print(f"encoder: {'orjson' if orjson else 'json'}")
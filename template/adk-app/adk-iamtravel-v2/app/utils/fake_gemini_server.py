@@ -0,0 +1,59 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- A local stand-in for the Gemini API ---
+# Answers generateContent, streamGenerateContent (SSE) and models.get with a
+# canned reply after `delay` seconds. Each new connection waits `connect_delay`
+# seconds before it is served, which stands in for the TCP and TLS handshake, and
+# is counted in `server.connections`. Point the shared model client at it with
+# MODEL_BASE_URL=http://127.0.0.1:<port>/ (see app/utils/model_client.py).
+
+REPLY = {
+    "candidates": [{"content": {"role": "model", "parts": [{"text": "Exploratorium"}]}, "finishReason": "STOP"}],
+    "usageMetadata": {"promptTokenCount": 12, "candidatesTokenCount": 3, "totalTokenCount": 15},
+}
+
+
+def start_fake_gemini(delay: float = 0.05, connect_delay: float = 0.1, port: int = 0):
+    """Starts the fake API on a background thread and returns (server, base url)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like the real API.
+
+        def setup(self):
+            time.sleep(connect_delay)
+            with server.lock:
+                server.connections += 1
+            super().setup()
+
+        def _send(self, body: bytes, content_type: str = "application/json"):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):  # models.get, used for warm-up and keep-alive pings
+            model = self.path.split("?")[0].rsplit("/", 1)[-1]
+            self._send(json.dumps({"name": f"models/{model}", "displayName": model}).encode())
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(delay)
+            with server.lock:
+                server.requests += 1
+            if ":streamGenerateContent" in self.path:
+                self._send(f"data: {json.dumps(REPLY)}\r\n\r\n".encode(), "text/event-stream")
+            else:
+                self._send(json.dumps(REPLY).encode())
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    server.lock, server.connections, server.requests = threading.Lock(), 0, 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/"
@@ -0,0 +1,162 @@
+import asyncio
+import random
+from collections import Counter
+from typing import ClassVar
+
+from google.adk.models import LlmResponse
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.registry import LLMRegistry
+from google.genai import types
+
+from app.tools.exit_loop_tool import COMPLETION_PHRASE
+from app.utils.hedging import agent_name
+
+# --- A local stand-in for Gemini ---
+# install_fake_llm() registers FakeLlm for every "gemini-*" model name, so the real
+# agent graph runs unchanged but never leaves the process. Latency is drawn from
+# a configurable distribution and outputs are scripted per agent, including the
+# function calls the real model would make (router transfers, the nested
+# google_search tool or the direct web_search tool, exit_loop). Latency and answer
+# quality can be set per model name, so model tiers (app/utils/model_tiers.py) can
+# be exercised. Searches take `search_latency`: inside the nested google_search
+# agent's model call (grounding), or in the fake web_search backend. Text replies
+# come out in `chunk_chars` pieces `chunk_latency` apart: as partial responses
+# when ADK asks for a stream (StreamingMode.SSE), all at once after the last
+# chunk otherwise. Used by the benchmarks.
+
+# Canned answers, so downstream state like {destination} and {current_plan} is realistic.
+CANNED_TEXT = {
+    "foodie_agent": "Carbone",
+    "foodie_agent_for_seq": "Carbone",
+    "restaurant_finder_agent_for_parallel": "La Mar",
+    "museum_finder_agent": "Exploratorium",
+    "concert_finder_agent": "The Killers at the Chase Center",
+    "planner_agent": "Activity: British Museum, Restaurant: Dishoom",
+    "critic_agent": COMPLETION_PHRASE,
+    "refiner_agent": "Activity: British Museum, Restaurant: Hakkasan",
+    "google_search": "- Result one\n- Result two\n- Result three",
+}
+
+# Agents that search (nested google_search agent, or web_search) before answering.
+SEARCHING_AGENTS = {
+    "transportation_agent", "weekend_guide_agent", "museum_finder_agent",
+    "concert_finder_agent", "day_trip_agent",
+}
+
+
+def fixed_latency(seconds: float):
+    return lambda: seconds
+
+
+def lognormal_latency(median: float, sigma: float = 0.5):
+    """Heavy-ish tailed latency around a median, like real model calls."""
+    return lambda: random.lognormvariate(0, sigma) * median
+
+
+def user_text(llm_request) -> str:
+    for content in llm_request.contents:
+        if content.role == "user" and content.parts and content.parts[0].text:
+            return content.parts[0].text
+    return ""
+
+
+def text_part(text: str):
+    return types.Part(text=text)
+
+
+def call_part(name: str, **args):
+    return types.Part(function_call=types.FunctionCall(name=name, args=args))
+
+
+def default_script(agent: str, llm_request, config: dict):
+    """Decides the fake model's reply: a text part or a function call part."""
+    last = llm_request.contents[-1] if llm_request.contents else None
+    answered_tool = bool(last and last.parts and last.parts[0].function_response)
+    if agent == "router_agent" and not answered_tool:
+        return call_part("transfer_to_agent", agent_name=config["route"])
+    if agent == "refiner_agent":
+        # Exit after `loop_passes` critique/refine passes.
+        own_replies = sum(1 for c in llm_request.contents if c.role == "model")
+        if own_replies + 1 >= config["loop_passes"] and not answered_tool:
+            return call_part("exit_loop")
+    if agent in SEARCHING_AGENTS and config["use_search"] and not answered_tool:
+        if "web_search" in llm_request.tools_dict:
+            return call_part("web_search", query=user_text(llm_request))
+        return call_part("google_search", request=user_text(llm_request))
+    return text_part(CANNED_TEXT.get(agent, f"{agent} answer for: {user_text(llm_request)[:60]}"))
+
+
+class FakeLlm(BaseLlm):
+    """Scripted replies after a sampled delay; counts calls per agent."""
+
+    config: ClassVar[dict] = {
+        "latency": fixed_latency(0.0),
+        "model_latency": {},  # model name -> latency callable, overrides "latency"
+        "quality": {},        # model name -> probability that a text answer is on-format
+        "route": "greeting_agent",
+        "loop_passes": 2,
+        "use_search": True,
+        "search_latency": fixed_latency(0.0),
+        "chunk_chars": 24,      # size of each streamed text chunk
+        "chunk_latency": 0.0,   # seconds between chunks, after the first
+        "script": default_script,
+    }
+    calls: ClassVar[Counter] = Counter()
+    models: ClassVar[Counter] = Counter()
+
+    @classmethod
+    def supported_models(cls) -> list:
+        return [r"gemini-.*"]
+
+    async def generate_content_async(self, llm_request, stream: bool = False):
+        agent = agent_name(llm_request)
+        model = llm_request.model or self.model
+        FakeLlm.calls[agent] += 1
+        FakeLlm.models[model] += 1
+        delay = self.config["model_latency"].get(model, self.config["latency"])()
+        if agent == "google_search":
+            delay += self.config["search_latency"]()
+        if delay:
+            await asyncio.sleep(delay)
+        part = self.config["script"](agent, llm_request, self.config)
+        if part.text and random.random() > self.config["quality"].get(model, 1.0):
+            part = text_part(f"Sure! Here is what I found:\n{part.text}\nLet me know if you need anything else.")
+        size = self.config["chunk_chars"]
+        chunks = [part.text[i:i + size] for i in range(0, len(part.text), size)] if part.text else []
+        for i, chunk in enumerate(chunks):
+            if i and self.config["chunk_latency"]:
+                await asyncio.sleep(self.config["chunk_latency"])
+            if stream:
+                yield LlmResponse(content=types.Content(role="model", parts=[text_part(chunk)]), partial=True)
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[part]),
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=sum(len(str(c.parts[0].text or "")) // 4 for c in llm_request.contents if c.parts),
+                candidates_token_count=len(part.text or "") // 4,
+            ),
+        )
+
+
+async def fake_search(query: str, num: int) -> list:
+    """Stands in for SerpApi behind the direct web_search tool."""
+    delay = FakeLlm.config["search_latency"]()
+    if delay:
+        await asyncio.sleep(delay)
+    return [{"title": f"Result {i} for {query[:40]}", "snippet": f"Snippet {i} " * 40, "link": f"https://example.com/{i}"}
+            for i in range(1, num + 1)]
+
+
+def install_fake_llm(**config):
+    """Routes all gemini-* models to FakeLlm, e.g. install_fake_llm(latency=lognormal_latency(0.3))."""
+    from app.tools import direct_search_tool
+
+    for key in ("latency", "search_latency"):
+        if key in config and not callable(config[key]):
+            config[key] = fixed_latency(config[key])
+    if "model_latency" in config:
+        config["model_latency"] = {model: latency if callable(latency) else fixed_latency(latency)
+                                   for model, latency in config["model_latency"].items()}
+    FakeLlm.config = {**FakeLlm.config, **config}
+    direct_search_tool.search_backend = fake_search
+    LLMRegistry.register(FakeLlm)
+    LLMRegistry.resolve.cache_clear()
@@ -0,0 +1,288 @@
+import asyncio
+import os
+import re
+import time
+from collections import Counter, deque
+from typing import ClassVar, Optional
+
+from google.adk.models import LlmResponse
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.registry import LLMRegistry
+
+from google.genai import types
+
+from app.agents.deadline_agent import AGENT_DEADLINES, DEADLINE_PLACEHOLDER
+from app.utils import budgets, metrics
+
+# --- Hedged model calls ---
+# A few slow model calls set the p99. install_model_hedging() puts HedgedLlm in
+# front of whatever serves "gemini-*". HedgedLlm times every call until its first
+# response (the whole reply, or the first chunk when streaming), per agent and
+# model. Once it has HEDGE_MIN_SAMPLES timings, it starts a duplicate call if a
+# call is still waiting after the HEDGE_PERCENTILE latency. The first attempt to
+# answer wins and the other is cancelled. A hedge costs one extra model call, so
+# hedging is off by default, and HEDGE_AGENTS limits it to the agents that matter.
+# That call is charged to the request's budget (a spent budget is never hedged),
+# and the losing attempt is recorded in the model-call metrics for as long as it ran.
+# Branches that are still too slow are cut off by DeadlineParallelAgent
+# (app/agents/deadline_agent.py).
+#
+# HedgedLlm also applies AGENT_DEADLINES to each model call of the agents it
+# names, wherever they run (a leaf such as day_trip_agent, or a step of a
+# SequentialAgent such as synthesis_agent), so it is installed whenever
+# AGENT_DEADLINES is set, even with hedging off. A call still running at its
+# agent's deadline is cancelled (hedge included), and the agent answers
+# DEADLINE_PLACEHOLDER instead. In a DeadlineParallelAgent the same deadline
+# also bounds the whole branch, tool calls included.
+#
+#   MODEL_HEDGING=True  HEDGE_PERCENTILE=0.95  HEDGE_AGENTS="museum_finder_agent,concert_finder_agent"
+
+MODEL_HEDGING = os.getenv("MODEL_HEDGING", "False").lower() == "true"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_WINDOW = int(os.getenv("HEDGE_WINDOW", "200"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.05"))  # never hedge sooner than this
+HEDGE_AGENTS = {name.strip() for name in os.getenv("HEDGE_AGENTS", "").split(",") if name.strip()}  # empty: all
+
+HEDGES = metrics.register(metrics.Counter(
+    "adk_model_hedges_total", "Model calls that started a duplicate, by which attempt answered first.",
+    ["agent", "winner"]))
+MODEL_CALL_DEADLINES = metrics.register(metrics.Counter(
+    "adk_model_call_deadline_fallbacks_total", "Model calls cut off at their agent's deadline.", ["agent"]))
+
+
+def agent_name(llm_request) -> str:
+    """Recovers the calling agent from the identity line ADK adds to the system instruction."""
+    instruction = str(llm_request.config.system_instruction or "") if llm_request.config else ""
+    match = re.search(r'internal name is "([^"]+)"', instruction)
+    return match.group(1) if match else ""
+
+
+class HedgePolicy:
+    """Rolling first-response latencies per (agent, model), and the delay before hedging a call."""
+
+    def __init__(self, percentile: float = HEDGE_PERCENTILE, min_samples: int = HEDGE_MIN_SAMPLES,
+                 window: int = HEDGE_WINDOW, min_delay: float = HEDGE_MIN_DELAY, agents=None):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.window = window
+        self.min_delay = min_delay
+        self.agents = HEDGE_AGENTS if agents is None else set(agents)
+        self.samples = {}  # (agent, model) -> deque of seconds to first response
+        self.stats = Counter()
+
+    def delay(self, agent: str, model: str) -> Optional[float]:
+        """Seconds to wait before hedging, or None if this call is not hedged."""
+        if self.agents and agent not in self.agents:
+            return None
+        window = self.samples.get((agent, model))
+        if not window or len(window) < self.min_samples:
+            return None
+        latencies = sorted(window)
+        return max(self.min_delay, latencies[min(len(latencies) - 1, int(self.percentile * len(latencies)))])
+
+    def record(self, agent: str, model: str, seconds: float):
+        self.samples.setdefault((agent, model), deque(maxlen=self.window)).append(seconds)
+
+
+async def _first(responses):
+    """The first response of an attempt, or None if it had none."""
+    try:
+        return await responses.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+async def _cancel(task: asyncio.Task, responses):
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await responses.aclose()
+
+
+class HedgedLlm(BaseLlm):
+    """Calls the real model class, and a second time if the first attempt is slower than usual."""
+
+    backend: ClassVar[Optional[type]] = None  # the class that served gemini-* before install
+    policy: ClassVar[HedgePolicy] = HedgePolicy()
+    hedging: ClassVar[bool] = True                # False: deadlines only
+    deadlines: ClassVar[dict] = AGENT_DEADLINES   # agent name -> seconds per model call
+
+    @classmethod
+    def supported_models(cls) -> list:
+        return [r"gemini-.*"]
+
+    def _attempt(self, llm_request, stream: bool):
+        responses = self.backend(model=self.model).generate_content_async(llm_request, stream=stream)
+        return asyncio.ensure_future(_first(responses)), responses
+
+    @staticmethod
+    def _timed_out(agent: str) -> LlmResponse:
+        MODEL_CALL_DEADLINES.inc((agent,))
+        return LlmResponse(content=types.Content(role="model", parts=[types.Part(text=DEADLINE_PLACEHOLDER)]),
+                           custom_metadata={"deadline_fallback": True})
+
+    async def generate_content_async(self, llm_request, stream: bool = False):
+        agent, model = agent_name(llm_request), llm_request.model or self.model
+        delay = self.policy.delay(agent, model) if self.hedging else None
+        started = time.perf_counter()
+        ends = started + self.deadlines[agent] if self.deadlines.get(agent, 0) > 0 else None
+        left = lambda: None if ends is None else max(0.0, ends - time.perf_counter())
+        # A copy for the primary, since the backend may edit the request and a hedge needs it intact.
+        task, responses = self._attempt(llm_request.model_copy(deep=True) if delay is not None else llm_request, stream)
+        attempts = {task: (responses, "primary", started)}
+        hedged, timed_out, winner, error = False, False, None, None
+        ran = {}  # attempt label -> seconds it ran
+        try:
+            if delay is not None:
+                await asyncio.wait([task], timeout=delay if ends is None else min(delay, left()))
+                if task.done() or left() == 0:  # answered, or out of time: no hedge
+                    pass
+                elif not budgets.allows_extra_call(in_flight=1):
+                    self.policy.stats["over_budget"] += 1
+                else:
+                    hedge, hedge_responses = self._attempt(llm_request, stream)
+                    attempts[hedge] = (hedge_responses, "hedge", time.perf_counter())
+                    hedged = True
+                    budgets.charge_extra_call()
+            while attempts and winner is None:
+                done, _ = await asyncio.wait(attempts, timeout=left(), return_when=asyncio.FIRST_COMPLETED)
+                if not done:  # the agent's deadline
+                    timed_out = True
+                    break
+                for finished in done:
+                    responses, label, attempt_started = attempts.pop(finished)
+                    ran[label] = time.perf_counter() - attempt_started
+                    if finished.exception() is None:
+                        winner = (finished.result(), responses, label)
+                        break
+                    error = finished.exception()
+        finally:
+            for loser, (loser_responses, label, loser_started) in attempts.items():
+                await _cancel(loser, loser_responses)
+                ran[label] = time.perf_counter() - loser_started
+            if hedged:  # one call more than the agent made: the attempt that did not answer
+                metrics.record_extra_model_call(ran["primary" if winner and winner[2] == "hedge" else "hedge"])
+        if timed_out:
+            self.policy.record(agent, model, time.perf_counter() - started)  # a lower bound, as below
+            yield self._timed_out(agent)
+            return
+        if winner is None:
+            raise error
+        first, responses, label = winner
+        # When the hedge wins this is a lower bound on the primary's latency, which is what the percentile needs.
+        self.policy.record(agent, model, time.perf_counter() - started)
+        if hedged:
+            self.policy.stats[f"{label}_won"] += 1
+            HEDGES.inc((agent, label))
+        if first is None:
+            return
+        yield first
+        while True:
+            try:
+                response = await asyncio.wait_for(responses.__anext__(), left())
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:  # mid-stream: the partial text so far is replaced by the placeholder
+                await responses.aclose()
+                yield self._timed_out(agent)
+                return
+            yield response
+
+
+def install_model_hedging(enabled: bool = MODEL_HEDGING, policy: Optional[HedgePolicy] = None,
+                          deadlines: Optional[dict] = None) -> bool:
+    """Routes gemini-* through HedgedLlm; does nothing unless hedging is enabled or some agent has a deadline."""
+    deadlines = AGENT_DEADLINES if deadlines is None else deadlines
+    if not enabled and not deadlines:
+        return False
+    HedgedLlm.hedging, HedgedLlm.deadlines = enabled, deadlines
+    current = LLMRegistry.resolve("gemini-2.5-flash")
+    if current is not HedgedLlm:
+        HedgedLlm.backend = current
+    if policy is not None:
+        HedgedLlm.policy = policy
+    LLMRegistry.register(HedgedLlm)
+    LLMRegistry.resolve.cache_clear()
+    return True
+
+
+if __name__ == "__main__":
+    # python -m app.utils.hedging
+    # parallel_planner_agent against a fake model with a heavy tail (1 call in 20
+    # takes 15x longer): latency percentiles and model calls per request for plain
+    # calls, hedged calls, branch deadlines and both. Each run checks that synthesis
+    # answered every request and that a cut-off branch left its placeholder.
+    import random
+    import statistics
+
+    from google.adk.sessions import InMemorySessionService
+    from google.genai.types import Content, Part
+
+    from app.utils.fake_llm import FakeLlm, install_fake_llm
+    # The module the installed model class comes from, not this __main__ copy.
+    from app.utils.hedging import HedgedLlm, HedgePolicy, install_model_hedging
+
+    def heavy_tail():
+        return random.lognormvariate(0, 0.3) * 0.08 * (15 if random.random() < 0.05 else 1)
+
+    install_fake_llm(latency=heavy_tail)
+    from app.agents.deadline_agent import DEADLINE_PLACEHOLDER
+    from app.agents.router_agent import root_agent
+    from app.agents.workflow_agents import parallel_research_agent
+    from app.utils.response_cache import response_cache
+    from app.utils.runner_registry import RunnerRegistry
+    from app.utils.search_cache import search_cache
+
+    FakeLlm.config["route"] = "parallel_planner_agent"
+    session_service = InMemorySessionService()
+    runner = RunnerRegistry().get(root_agent, "hedging", session_service)
+    query = "Plan a trip to San Francisco. I want to visit a museum, see a concert, and eat at a nice restaurant."
+
+    async def one(i):
+        search_cache.entries.clear()
+        session = await session_service.create_session(app_name="hedging", user_id="u")
+        started, author = time.perf_counter(), None
+        async for event in runner.run_async(user_id="u", session_id=session.id, new_message=Content(
+                role="user", parts=[Part(text=f"{query} #{i}")])):
+            if event.is_final_response() and event.content and event.content.parts:
+                author = event.author
+        elapsed = time.perf_counter() - started
+        state = (await session_service.get_session(app_name="hedging", user_id="u", session_id=session.id)).state
+        await session_service.delete_session(app_name="hedging", user_id="u", session_id=session.id)
+        assert author in ("synthesis_stage", "synthesis_agent"), f"request {i} ended with {author}"
+        assert all(state.get(key) for key in ("museum_result", "concert_result", "restaurant_result"))
+        return elapsed, sum(state[key] == DEADLINE_PLACEHOLDER for key in ("museum_result", "concert_result"))
+
+    async def bench(label, hedging, deadline, requests=200, concurrency=8):
+        if hedging:
+            install_model_hedging(True, HedgePolicy(percentile=0.9, min_samples=20))
+        else:
+            LLMRegistry.register(FakeLlm)
+            LLMRegistry.resolve.cache_clear()
+        parallel_research_agent.deadline = deadline
+        response_cache.indexes.clear()  # keeps later runs from paying for a bigger cache
+        for i in range(30):  # warm-up: fills the hedge policy's latency windows
+            await one(i)
+        FakeLlm.calls.clear()
+        queue = list(range(requests))
+        results = []
+
+        async def worker():
+            while queue:
+                results.append(await one(queue.pop()))
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        latencies = sorted(seconds for seconds, _ in results)
+        pct = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1e3
+        print(f"{label:<22} p50 {pct(0.5):5.0f}ms  p95 {pct(0.95):5.0f}ms  p99 {pct(0.99):5.0f}ms  "
+              f"mean {statistics.mean(latencies) * 1e3:5.0f}ms  model calls/request {sum(FakeLlm.calls.values()) / requests:4.2f}  "
+              f"placeholders {sum(p for _, p in results):3d}"
+              + (f"  {dict(HedgedLlm.policy.stats)}" if hedging else ""))
+
+    async def main():
+        await bench("plain", False, 0)
+        await bench("hedged (p90)", True, 0)
+        await bench("branch deadline 0.5s", False, 0.5)
+        await bench("hedged + deadline", True, 0.5)
+
+    asyncio.run(main())
@@ -0,0 +1,258 @@
+import os
+from collections import Counter, OrderedDict
+from typing import Optional
+
+from google.adk.plugins.base_plugin import BasePlugin
+from google.genai import types
+
+from app.utils import metrics
+
+# --- Session history compaction ---
+# ADK sends every agent the whole session history: earlier user turns, every
+# intermediate workflow event (re-worded as "For context: [agent] said ...") and
+# every tool call and payload. On a long session that grows each turn. This
+# plugin rewrites llm_request.contents before each model call, per agent policy:
+#   * the current turn is kept (optionally without other agents' intermediate events),
+#   * the last `keep_turns` earlier turns are kept as user message + final answer,
+#   * older turns are dropped, or folded into a short summary cached per session.
+# Agents whose instruction pulls what they need from state (synthesis_agent,
+# critic_agent, the finders) need no history at all beyond the current query.
+# The agents the router hands a conversation to (greeting_agent, day_trip_agent,
+# foodie_agent) keep the default policy: a follow-up like "something cheaper?"
+# only makes sense with the earlier turns.
+
+HISTORY_COMPACTION_ENABLED = os.getenv("HISTORY_COMPACTION_ENABLED", "True").lower() == "true"
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "2"))
+SUMMARY_CHARS = 160  # per side of each folded turn
+CONTEXT_MARKER = "For context:"  # how ADK prefixes other agents' events
+
+
+class CompactionPolicy:
+    """How much history one agent gets."""
+
+    def __init__(self, keep_turns: int = HISTORY_KEEP_TURNS, current_context: bool = True, summarize: bool = True):
+        self.keep_turns = keep_turns            # earlier turns kept as user message + final answer
+        self.current_context = current_context  # keep other agents' events from the current turn
+        self.summarize = summarize              # fold turns older than keep_turns into a summary
+
+
+DEFAULT_POLICY = CompactionPolicy()
+QUERY_ONLY = CompactionPolicy(keep_turns=0, current_context=False, summarize=False)
+
+AGENT_POLICIES = {
+    # Work from the current query and state only.
+    "synthesis_agent": QUERY_ONLY,
+    "planner_agent": QUERY_ONLY,
+    "critic_agent": QUERY_ONLY,
+    "refiner_agent": QUERY_ONLY,  # its own earlier loop passes are kept: they are part of the current turn
+    "museum_finder_agent": QUERY_ONLY,
+    "concert_finder_agent": QUERY_ONLY,
+    "restaurant_finder_agent_for_parallel": QUERY_ONLY,
+    "foodie_agent_for_seq": QUERY_ONLY,
+    # Needs the foodie agent's answer from this turn, but nothing older.
+    "transportation_agent": CompactionPolicy(keep_turns=0, current_context=True, summarize=False),
+}
+
+PROMPT_TOKENS_BEFORE = metrics.register(metrics.Histogram(
+    "adk_history_tokens_before_compaction", "Estimated history tokens per model call before compaction.",
+    ["agent"], metrics.TOKEN_BUCKETS))
+PROMPT_TOKENS_AFTER = metrics.register(metrics.Histogram(
+    "adk_history_tokens_after_compaction", "Estimated history tokens per model call after compaction.",
+    ["agent"], metrics.TOKEN_BUCKETS))
+
+
+def _part_text(part: types.Part) -> str:
+    if part.text:
+        return part.text
+    if part.function_call:
+        return f"{part.function_call.name}{part.function_call.args}"
+    if part.function_response:
+        return f"{part.function_response.name}{part.function_response.response}"
+    return ""
+
+
+def estimate_tokens(contents) -> int:
+    """~4 characters per token, the same estimate the fake model reports."""
+    return sum(len(_part_text(part)) for content in contents for part in content.parts or []) // 4
+
+
+def is_foreign(content: types.Content) -> bool:
+    """Another agent's event, as ADK re-words it for the current agent."""
+    return bool(content.role == "user" and content.parts and content.parts[0].text == CONTEXT_MARKER)
+
+
+def is_user_message(content: types.Content) -> bool:
+    """A message typed by the user, which starts a turn."""
+    return bool(content.role == "user" and content.parts and content.parts[0].text
+                and not is_foreign(content) and not any(part.function_response for part in content.parts))
+
+
+def split_turns(contents) -> tuple:
+    """Returns (contents before the first user message, [[user message, ...], ...])."""
+    preamble, turns = [], []
+    for content in contents:
+        if is_user_message(content):
+            turns.append([content])
+        elif turns:
+            turns[-1].append(content)
+        else:
+            preamble.append(content)
+    return preamble, turns
+
+
+def final_answer(turn) -> Optional[types.Content]:
+    """The last plain-text answer in a turn, from this agent or (re-worded) from another."""
+    for content in reversed(turn[1:]):
+        if content.role == "model" and content.parts and not any(p.function_call for p in content.parts):
+            text_parts = [p for p in content.parts if p.text and not p.thought]
+            if text_parts:
+                return types.Content(role="model", parts=text_parts)
+        elif is_foreign(content):
+            said = [p for p in content.parts[1:] if p.text and "] said: " in p.text]
+            if said:
+                return types.Content(role="user", parts=[types.Part(text=CONTEXT_MARKER), said[-1]])
+    return None
+
+
+def _answer_text(answer: Optional[types.Content]) -> str:
+    if answer is None:
+        return ""
+    text = answer.parts[-1].text or ""
+    return text.split("] said: ", 1)[-1]
+
+
+class HistoryCompactor:
+    """Rewrites each model request's history according to the calling agent's policy."""
+
+    def __init__(self, policies=None, default: CompactionPolicy = DEFAULT_POLICY, max_sessions: int = 1024):
+        self.policies = AGENT_POLICIES if policies is None else policies
+        self.default = default
+        self.summaries = OrderedDict()  # session id -> (turns folded so far, summary lines)
+        self.sessions = OrderedDict()   # invocation id -> session id, for runs in progress
+        self.max_sessions = max_sessions
+        self.stats = Counter()
+
+    def summary(self, session_id: str, folded) -> types.Content:
+        """One context message covering `folded` turns, extended incrementally per session."""
+        count, lines = self.summaries.pop(session_id, (0, []))
+        if count > len(folded):  # a different, shorter history under the same id
+            count, lines = 0, []
+        for turn in folded[count:]:
+            question = (turn[0].parts[0].text or "")[:SUMMARY_CHARS]
+            answer = _answer_text(final_answer(turn))[:SUMMARY_CHARS]
+            lines = lines + [f"- User: {question} / Answer: {answer}"]
+            self.stats["summarized_turns"] += 1
+        self.summaries[session_id] = (len(folded), lines)
+        if len(self.summaries) > self.max_sessions:
+            self.summaries.popitem(last=False)
+        text = "Summary of the earlier conversation:\n" + "\n".join(lines)
+        return types.Content(role="user", parts=[types.Part(text=CONTEXT_MARKER), types.Part(text=text)])
+
+    def compact(self, contents, policy: CompactionPolicy, session_id: str = "") -> list:
+        preamble, turns = split_turns(contents)
+        if not turns:
+            return list(contents)
+        *older, current = turns
+        keep = older[-policy.keep_turns:] if policy.keep_turns else []
+        folded = older[:len(older) - len(keep)]
+
+        out = list(preamble)
+        if folded and policy.summarize:
+            out.append(self.summary(session_id, folded))
+        for turn in keep:
+            answer = final_answer(turn)
+            out.extend([turn[0], answer] if answer else [turn[0]])
+        if policy.current_context:
+            out.extend(current)
+        else:
+            out.extend(content for content in current if not is_foreign(content))
+        return out
+
+    def start_run(self, invocation_id: str, session_id: str):
+        """Remembers which session a run belongs to, for the summaries."""
+        self.sessions[invocation_id] = session_id
+        if len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+
+    def end_run(self, invocation_id: str):
+        self.sessions.pop(invocation_id, None)
+
+    def before_model_callback(self, callback_context, llm_request) -> None:
+        agent = callback_context.agent_name
+        policy = self.policies.get(agent, self.default)
+        before = estimate_tokens(llm_request.contents)
+        session_id = self.sessions.get(callback_context.invocation_id, callback_context.invocation_id)
+        llm_request.contents = self.compact(llm_request.contents, policy, session_id)
+        after = estimate_tokens(llm_request.contents)
+        PROMPT_TOKENS_BEFORE.observe((agent,), before)
+        PROMPT_TOKENS_AFTER.observe((agent,), after)
+        self.stats["tokens_before"] += before
+        self.stats["tokens_after"] += after
+        return None
+
+
+class HistoryCompactionPlugin(BasePlugin):
+    """Applies a HistoryCompactor to every model call made through a Runner."""
+
+    def __init__(self, compactor: HistoryCompactor):
+        super().__init__(name="history_compaction")
+        self.compactor = compactor
+
+    async def before_run_callback(self, *, invocation_context):
+        self.compactor.start_run(invocation_context.invocation_id, invocation_context.session.id)
+        return None
+
+    async def after_run_callback(self, *, invocation_context):
+        self.compactor.end_run(invocation_context.invocation_id)
+
+    async def before_model_callback(self, *, callback_context, llm_request):
+        return self.compactor.before_model_callback(callback_context, llm_request)
+
+
+history_compactor = HistoryCompactor()
+
+
+def compaction_plugins() -> list:
+    """The plugins every Runner should get: none at all when compaction is disabled."""
+    return [HistoryCompactionPlugin(history_compactor)] if HISTORY_COMPACTION_ENABLED else []
+
+
+if __name__ == "__main__":
+    # python -m app.utils.history_compaction
+    # main.py's five queries in one session: history tokens per turn, before and after.
+    # The workflows go first: after a leaf agent answers, ADK hands it the next turn too.
+    import asyncio
+
+    from google.adk.sessions import InMemorySessionService
+
+    from app.utils.fake_llm import FakeLlm, install_fake_llm
+    from app.utils.runner_registry import RunnerRegistry
+
+    install_fake_llm(latency=0.0)
+    from app.agents.router_agent import root_agent
+
+    turns = [
+        ("Plan a trip to London. I want to visit the British Museum and eat at a restaurant nearby. The total travel time between the two should be short.", "iterative_planner_agent"),
+        ("Plan a trip to San Francisco. I want to visit a museum, see a concert, and eat at a nice restaurant.", "parallel_planner_agent"),
+        ("Find me a good Italian restaurant in New York City and give me directions from Times Square.", "find_and_navigate_agent"),
+        ("Find me a good Italian restaurant in New York City.", "foodie_agent"),
+        ("Plan a day trip to a beach near Los Angeles.", "day_trip_agent"),
+    ]
+
+    async def main():
+        compactor = HistoryCompactor()
+        session_service = InMemorySessionService()
+        runner = RunnerRegistry(plugins=[HistoryCompactionPlugin(compactor)]).get(root_agent, "compaction", session_service)
+        session = await session_service.create_session(app_name="compaction", user_id="u")
+        print(f"{'turn':<6}{'answered by':<26}{'model calls':>12}{'tokens before':>15}{'tokens after':>14}")
+        for i, (query, route) in enumerate(turns, 1):
+            FakeLlm.config["route"] = route
+            FakeLlm.calls.clear()
+            compactor.stats.clear()
+            author = ""
+            async for event in runner.run_async(user_id="u", session_id=session.id,
+                                                new_message=types.Content(role="user", parts=[types.Part(text=query)])):
+                author = event.author
+            print(f"{i:<6}{author:<26}{sum(FakeLlm.calls.values()):>12}{compactor.stats['tokens_before']:>15}{compactor.stats['tokens_after']:>14}")
+
+    asyncio.run(main())
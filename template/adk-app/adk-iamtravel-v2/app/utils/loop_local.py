@@ -0,0 +1,61 @@
+import asyncio
+import weakref
+
+# --- Per-event-loop clients ---
+# An httpx.AsyncClient's connections belong to the event loop that opened them.
+# The shared clients (the SerpApi client, the shared model client) therefore keep
+# one client per loop. LoopLocal creates a loop's client on first use there. It
+# closes the client when close() is called in that loop, or when the loop shuts
+# down: asyncio.run() and uvicorn finalize async generators before they close the
+# loop, so a client is never just dropped with its sockets still open.
+
+
+class LoopLocal:
+    """One closable resource per event loop, closed with its loop."""
+
+    def __init__(self, factory, close=lambda resource: resource.aclose()):
+        self.factory, self._close = factory, close
+        self.resources = weakref.WeakKeyDictionary()  # loop -> {resource, lifetime generator, parked}
+
+    def get(self):
+        """This loop's resource, created on first use. Must be called with a running loop."""
+        loop = asyncio.get_running_loop()
+        entry = self.resources.get(loop)
+        if entry is None:
+            entry = self.resources[loop] = {"resource": self.factory(), "parked": False}
+            entry["lifetime"] = self._lifetime(entry)
+            asyncio.ensure_future(self._park(entry["lifetime"]))
+        return entry["resource"]
+
+    def peek(self):
+        """This loop's resource, or None if there is none yet (or no running loop)."""
+        try:
+            entry = self.resources.get(asyncio.get_running_loop())
+        except RuntimeError:
+            return None
+        return entry["resource"] if entry else None
+
+    async def _lifetime(self, entry):
+        entry["parked"] = True
+        try:
+            yield
+        finally:
+            await self._close(entry["resource"])
+
+    @staticmethod
+    async def _park(lifetime):
+        """Runs the lifetime generator up to its yield, where it waits for the loop to finalize it."""
+        try:
+            await lifetime.__anext__()
+        except StopAsyncIteration:  # closed before it got here
+            pass
+
+    async def close(self):
+        """Closes this loop's resource now; the next get() creates a new one."""
+        entry = self.resources.pop(asyncio.get_running_loop(), None)
+        if entry is None:
+            return
+        parked = entry["parked"]
+        await entry["lifetime"].aclose()  # closes the resource if the generator got to its yield
+        if not parked:
+            await self._close(entry["resource"])
@@ -0,0 +1,334 @@
+import bisect
+import contextvars
+import os
+import threading
+import time
+from typing import Optional
+
+from google.adk.agents import LoopAgent
+from google.adk.plugins.base_plugin import BasePlugin
+
+# --- Per-agent / per-tool instrumentation ---
+# MetricsPlugin is registered on every Runner built by the runner registry and
+# times each agent run, model call and tool call, counts model tokens and loop
+# iterations, and tags everything with the workflow (the router sub-agent that
+# handled the request). Results are exposed in Prometheus text format by
+# fastapi_server.py's /metrics and, with METRICS_OTEL=True, as OpenTelemetry
+# spans tagged with the session. Time to first and last token is recorded per
+# agent for text replies: with token streaming (app/utils/streaming.py) the first
+# token is the first partial chunk, otherwise both are the whole call. With
+# METRICS_ENABLED=False no plugin is registered at all, so the hooks cost nothing.
+#
+# AgentTool runs its agent (googlesearch_agent) on a Runner of its own, without
+# plugins. Such an agent takes agent_tool_metrics' model callbacks instead, and
+# its calls are recorded under the workflow of the agent that called the tool.
+#
+# A model call can make further calls on the agent's behalf: a retry on a
+# stronger tier (app/utils/model_tiers.py) or a hedge (app/utils/hedging.py).
+# Those are reported with record_extra_model_call() and recorded as model calls
+# of the same agent, with their own latency and tokens, when the agent's call
+# finishes. The agent's own call is still timed end to end. Code running inside
+# the model call (HedgedLlm) finds the call in current_model_call.
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+METRICS_OTEL = os.getenv("METRICS_OTEL", "False").lower() == "true"
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+TOKEN_BUCKETS = (64, 256, 1024, 4096, 16384, 65536)
+ITERATION_BUCKETS = (1, 2, 3, 5, 10)
+
+
+class Histogram:
+    """A labelled Prometheus histogram kept in memory."""
+
+    def __init__(self, name: str, help: str, labelnames, buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames, self.buckets = name, help, tuple(labelnames), tuple(buckets)
+        self.series = {}  # label values -> [bucket counts..., sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        with self.lock:
+            series = self.series.setdefault(labels, [0] * len(self.buckets) + [0.0, 0])
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for labels, series in sorted(self.series.items()):
+                base = ",".join(f'{k}="{v}"' for k, v in zip(self.labelnames, labels))
+                sep = "," if base else ""
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {cumulative}')
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {series[-1]}')
+                lines.append(f"{self.name}_sum{{{base}}} {series[-2]}")
+                lines.append(f"{self.name}_count{{{base}}} {series[-1]}")
+        return lines
+
+
+class Counter:
+    """A labelled Prometheus counter kept in memory."""
+
+    def __init__(self, name: str, help: str, labelnames):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels: tuple, amount: float = 1):
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for labels, value in sorted(self.series.items()):
+                base = ",".join(f'{k}="{v}"' for k, v in zip(self.labelnames, labels))
+                lines.append(f"{self.name}{{{base}}} {value}")
+        return lines
+
+
+class Gauge:
+    """A Prometheus gauge whose value is read from a callable at scrape time."""
+
+    def __init__(self, name: str, help: str, read):
+        self.name, self.help, self.read = name, help, read
+
+    def render(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {self.read()}"]
+
+
+AGENT_SECONDS = Histogram("adk_agent_duration_seconds", "Agent run time, including sub-agents.", ["workflow", "agent"])
+MODEL_SECONDS = Histogram("adk_model_call_duration_seconds", "Model call latency.", ["workflow", "agent"])
+MODEL_INPUT_TOKENS = Histogram("adk_model_input_tokens", "Prompt tokens per model call.", ["workflow", "agent"], TOKEN_BUCKETS)
+MODEL_OUTPUT_TOKENS = Histogram("adk_model_output_tokens", "Output tokens per model call.", ["workflow", "agent"], TOKEN_BUCKETS)
+FIRST_TOKEN_SECONDS = Histogram("adk_model_time_to_first_token_seconds", "Model call start to the first text chunk.", ["workflow", "agent"])
+LAST_TOKEN_SECONDS = Histogram("adk_model_time_to_last_token_seconds", "Model call start to the complete text reply.", ["workflow", "agent"])
+TOOL_SECONDS = Histogram("adk_tool_duration_seconds", "Tool call latency.", ["workflow", "agent", "tool"])
+LOOP_ITERATIONS = Histogram("adk_loop_iterations", "Iterations per LoopAgent run.", ["workflow", "agent"], ITERATION_BUCKETS)
+ERRORS = Counter("adk_errors_total", "Model and tool errors.", ["workflow", "agent", "kind"])
+
+REGISTRY = [AGENT_SECONDS, MODEL_SECONDS, FIRST_TOKEN_SECONDS, LAST_TOKEN_SECONDS, MODEL_INPUT_TOKENS,
+            MODEL_OUTPUT_TOKENS, TOOL_SECONDS, LOOP_ITERATIONS, ERRORS]
+
+
+def register(metric):
+    """Adds another module's metric to the /metrics output."""
+    REGISTRY.append(metric)
+    return metric
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+def _workflows(root) -> dict:
+    """Maps every agent name under root to the root sub-agent it belongs to."""
+    mapping = {root.name: root.name}
+
+    def walk(agent, workflow):
+        mapping[agent.name] = workflow
+        for sub in agent.sub_agents:
+            walk(sub, workflow)
+
+    for sub in root.sub_agents:
+        walk(sub, sub.name)
+    return mapping
+
+
+def _has_text(llm_response) -> bool:
+    content = llm_response.content
+    return bool(content and content.parts and any(part.text and not part.thought for part in content.parts))
+
+
+# The workflow of the tool call being run; set by MetricsPlugin.before_tool_callback.
+tool_workflow = contextvars.ContextVar("tool_workflow", default=None)
+
+# The model call being made, as (invocation id, agent name); set by MetricsPlugin.before_model_callback.
+current_model_call = contextvars.ContextVar("current_model_call", default=None)
+
+# (invocation id, agent name) -> [(seconds, usage metadata)] of calls made on the agent's behalf
+_extra_calls = {}
+
+
+def record_extra_model_call(seconds: float, usage_metadata=None, call: Optional[tuple] = None):
+    """Reports a model call made on an agent's behalf during `call` (default: the current one);
+    it is recorded when that call finishes."""
+    call = call or current_model_call.get()
+    if METRICS_ENABLED and call is not None:
+        _extra_calls.setdefault(call, []).append((seconds, usage_metadata))
+
+
+def _workflow_of(agent) -> str:
+    """The root sub-agent an agent sits under, from its parent chain."""
+    while agent.parent_agent is not None and agent.parent_agent.parent_agent is not None:
+        agent = agent.parent_agent
+    return agent.name
+
+
+class MetricsPlugin(BasePlugin):
+    """Records span timings, token counts, loop iterations and tool latency."""
+
+    def __init__(self):
+        super().__init__(name="metrics")
+        self.workflows = {}    # id(root agent) -> {agent name: workflow}
+        self.invocations = {}  # invocation id -> (session id, {agent name: workflow})
+        self.spans = {}        # (invocation id, kind, name) -> (start time, otel span or None)
+        self.iterations = {}   # (invocation id, loop name) -> passes so far
+        self.first_tokens = set()  # (invocation id, "model", agent name) of calls that have streamed text
+        self.tracer = None
+        if METRICS_OTEL:
+            from opentelemetry import trace
+            self.tracer = trace.get_tracer("iamtravel")
+
+    def _tags(self, invocation_id: str, agent_name: str):
+        session_id, workflows = self.invocations.get(invocation_id, ("", {}))
+        return session_id, workflows.get(agent_name, agent_name)
+
+    def _start(self, key, invocation_id: str, agent_name: str):
+        span = None
+        if self.tracer:
+            session_id, workflow = self._tags(invocation_id, agent_name)
+            span = self.tracer.start_span(f"{key[1]} {key[2]}", attributes={
+                "session.id": session_id, "workflow": workflow, "agent": agent_name})
+        self.spans[key] = (time.perf_counter(), span)
+
+    def _stop(self, key) -> Optional[float]:
+        started = self.spans.pop(key, None)
+        if not started:
+            return None
+        if started[1] is not None:
+            started[1].end()
+        self.first_tokens.discard(key)
+        return time.perf_counter() - started[0]
+
+    async def before_run_callback(self, *, invocation_context):
+        root = invocation_context.agent.root_agent
+        workflows = self.workflows.get(id(root))
+        if workflows is None:
+            workflows = self.workflows[id(root)] = _workflows(root)
+        self.invocations[invocation_context.invocation_id] = (invocation_context.session.id, workflows)
+
+    async def after_run_callback(self, *, invocation_context):
+        invocation_id = invocation_context.invocation_id
+        # Drop spans that never closed (e.g. a model call answered by a callback).
+        for key in [k for k in self.spans if k[0] == invocation_id]:
+            self._stop(key)
+        for key in [k for k in _extra_calls if k[0] == invocation_id]:
+            del _extra_calls[key]
+        self.invocations.pop(invocation_id, None)
+
+    async def before_agent_callback(self, *, agent, callback_context):
+        invocation_id = callback_context.invocation_id
+        _, workflows = self.invocations.get(invocation_id, ("", {}))
+        if agent.name not in workflows:  # built after the tree was first walked (LAZY_AGENT_GRAPH)
+            workflows[agent.name] = _workflow_of(agent)
+        self._start((invocation_id, "agent", agent.name), invocation_id, agent.name)
+        parent = agent.parent_agent
+        if isinstance(parent, LoopAgent) and parent.sub_agents and parent.sub_agents[0] is agent:
+            key = (invocation_id, parent.name)
+            self.iterations[key] = self.iterations.get(key, 0) + 1
+
+    async def after_agent_callback(self, *, agent, callback_context):
+        invocation_id = callback_context.invocation_id
+        _, workflow = self._tags(invocation_id, agent.name)
+        elapsed = self._stop((invocation_id, "agent", agent.name))
+        if elapsed is not None:
+            AGENT_SECONDS.observe((workflow, agent.name), elapsed)
+        if isinstance(agent, LoopAgent):
+            LOOP_ITERATIONS.observe((workflow, agent.name), self.iterations.pop((invocation_id, agent.name), 0))
+
+    async def before_model_callback(self, *, callback_context, llm_request):
+        invocation_id, agent_name = callback_context.invocation_id, callback_context.agent_name
+        current_model_call.set((invocation_id, agent_name))
+        self._start((invocation_id, "model", agent_name), invocation_id, agent_name)
+
+    async def after_model_callback(self, *, callback_context, llm_response):
+        invocation_id, agent_name = callback_context.invocation_id, callback_context.agent_name
+        key = (invocation_id, "model", agent_name)
+        _, workflow = self._tags(invocation_id, agent_name)
+        if key in self.spans and key not in self.first_tokens and _has_text(llm_response):
+            self.first_tokens.add(key)
+            FIRST_TOKEN_SECONDS.observe((workflow, agent_name), time.perf_counter() - self.spans[key][0])
+        if llm_response.partial:
+            return None
+        text = key in self.first_tokens
+        elapsed = self._stop(key)
+        if elapsed is not None:
+            MODEL_SECONDS.observe((workflow, agent_name), elapsed)
+            if text:
+                LAST_TOKEN_SECONDS.observe((workflow, agent_name), elapsed)
+        self._observe_tokens(workflow, agent_name, llm_response.usage_metadata)
+        for seconds, usage in _extra_calls.pop((invocation_id, agent_name), []):
+            MODEL_SECONDS.observe((workflow, agent_name), seconds)
+            self._observe_tokens(workflow, agent_name, usage)
+        return None
+
+    @staticmethod
+    def _observe_tokens(workflow: str, agent_name: str, usage):
+        if usage:
+            MODEL_INPUT_TOKENS.observe((workflow, agent_name), usage.prompt_token_count or 0)
+            MODEL_OUTPUT_TOKENS.observe((workflow, agent_name), usage.candidates_token_count or 0)
+
+    async def on_model_error_callback(self, *, callback_context, llm_request, error):
+        invocation_id, agent_name = callback_context.invocation_id, callback_context.agent_name
+        _, workflow = self._tags(invocation_id, agent_name)
+        self._stop((invocation_id, "model", agent_name))
+        _extra_calls.pop((invocation_id, agent_name), None)
+        ERRORS.inc((workflow, agent_name, "model"))
+        return None
+
+    async def before_tool_callback(self, *, tool, tool_args, tool_context):
+        invocation_id = tool_context.invocation_id
+        tool_workflow.set(self._tags(invocation_id, tool_context.agent_name)[1])
+        self._start((invocation_id, "tool", tool_context.function_call_id), invocation_id, tool_context.agent_name)
+        return None
+
+    async def after_tool_callback(self, *, tool, tool_args, tool_context, result):
+        invocation_id = tool_context.invocation_id
+        _, workflow = self._tags(invocation_id, tool_context.agent_name)
+        elapsed = self._stop((invocation_id, "tool", tool_context.function_call_id))
+        if elapsed is not None:
+            TOOL_SECONDS.observe((workflow, tool_context.agent_name, tool.name), elapsed)
+        return None
+
+    async def on_tool_error_callback(self, *, tool, tool_args, tool_context, error):
+        invocation_id = tool_context.invocation_id
+        _, workflow = self._tags(invocation_id, tool_context.agent_name)
+        self._stop((invocation_id, "tool", tool_context.function_call_id))
+        ERRORS.inc((workflow, tool_context.agent_name, "tool"))
+        return None
+
+
+class AgentToolMetrics(MetricsPlugin):
+    """MetricsPlugin's model callbacks for an agent run by AgentTool, attached to the agent itself."""
+
+    MAX_SPANS = 1024  # a failed call is never stopped (agents have no model error callback)
+
+    def _tags(self, invocation_id: str, agent_name: str):
+        return "", tool_workflow.get() or agent_name
+
+    def _start(self, key, invocation_id: str, agent_name: str):
+        while len(self.spans) >= self.MAX_SPANS:
+            self._stop(next(iter(self.spans)))
+        super()._start(key, invocation_id, agent_name)
+
+    def before_model_callbacks(self) -> list:
+        return [self.before_model_callback] if METRICS_ENABLED else []
+
+    def after_model_callbacks(self) -> list:
+        return [self.after_model_callback] if METRICS_ENABLED else []
+
+
+# Shared by every agent that AgentTool runs.
+agent_tool_metrics = AgentToolMetrics()
+
+
+def metrics_plugins() -> list:
+    """The plugins every Runner should get: none at all when metrics are disabled."""
+    return [MetricsPlugin()] if METRICS_ENABLED else []
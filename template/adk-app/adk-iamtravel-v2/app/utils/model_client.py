@@ -0,0 +1,249 @@
+import asyncio
+import importlib.util
+import os
+import time
+import weakref
+from collections import Counter
+from typing import Optional
+
+import httpx
+from google.adk.models.google_llm import Gemini
+from google.adk.models.registry import LLMRegistry
+from google.genai import Client, types
+
+from app.utils import metrics
+from app.utils.loop_local import LoopLocal
+
+# --- One shared model client ---
+# ADK builds a new Gemini object for every model call (LlmAgent.canonical_model).
+# Each of those objects creates its own genai Client with its own connection pool.
+# As a result, every call from every agent opens a new connection and pays for a
+# TCP and TLS handshake.
+#
+# install_shared_model_client() registers SharedGemini for "gemini-*". It is
+# Gemini, except that every instance uses one process-wide Client (one per event
+# loop, see app/utils/loop_local.py, closed with its loop). That client's httpx pool keeps connections alive between calls and
+# across agents. With the h2 package (pip install "httpx[http2]"), concurrent
+# calls share one HTTP/2 connection. Without it they use HTTP/1.1 keep-alive.
+#
+# warm_up() opens the first connection before traffic arrives (fastapi_server.py's
+# lifespan), giving up after MODEL_WARMUP_TIMEOUT_SECONDS so a slow or
+# unreachable API does not hold up startup. keepalive_pings() sends a cheap request (models.get, no tokens) when
+# the pool has been idle for MODEL_KEEPALIVE_PING_SECONDS, so idle connections
+# are not dropped. MODEL_BASE_URL points the client at a stand-in server
+# (app/utils/fake_gemini_server.py).
+#
+# /metrics and `shared_model_client.stats` show:
+#   - requests by connection (new or reused) and HTTP version
+#   - open and idle pool connections
+#
+#   MODEL_CLIENT_SHARED=True  MODEL_POOL_MAX_CONNECTIONS=100  MODEL_POOL_MAX_KEEPALIVE=20
+#   MODEL_POOL_KEEPALIVE_EXPIRY=120  MODEL_KEEPALIVE_PING_SECONDS=45  MODEL_HTTP2=True
+#   MODEL_WARMUP_TIMEOUT_SECONDS=5
+
+MODEL_CLIENT_SHARED = os.getenv("MODEL_CLIENT_SHARED", "True").lower() == "true"
+MODEL_HTTP2 = os.getenv("MODEL_HTTP2", "True").lower() == "true"
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+MODEL_POOL_MAX_CONNECTIONS = int(os.getenv("MODEL_POOL_MAX_CONNECTIONS", "100"))
+MODEL_POOL_MAX_KEEPALIVE = int(os.getenv("MODEL_POOL_MAX_KEEPALIVE", "20"))
+MODEL_POOL_KEEPALIVE_EXPIRY = float(os.getenv("MODEL_POOL_KEEPALIVE_EXPIRY", "120"))  # seconds an idle connection is kept
+MODEL_KEEPALIVE_PING_SECONDS = float(os.getenv("MODEL_KEEPALIVE_PING_SECONDS", "45"))  # 0 disables the pings
+MODEL_BASE_URL = os.getenv("MODEL_BASE_URL", "")
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "True").lower() == "true"
+MODEL_WARMUP_CONNECTIONS = int(os.getenv("MODEL_WARMUP_CONNECTIONS", "1"))
+MODEL_WARMUP_MODEL = os.getenv("MODEL_WARMUP_MODEL", "gemini-2.5-flash")
+MODEL_WARMUP_TIMEOUT_SECONDS = float(os.getenv("MODEL_WARMUP_TIMEOUT_SECONDS", "5"))
+
+MODEL_HTTP_REQUESTS = metrics.register(metrics.Counter(
+    "adk_model_http_requests_total", "Requests of the shared model client, by connection (new or reused) and HTTP version.",
+    ["connection", "http_version"]))
+
+
+class SharedModelClient:
+    """The process-wide genai Client and its httpx pool, created for the running event loop on first use."""
+
+    def __init__(self, base_url: str = MODEL_BASE_URL, http2: bool = MODEL_HTTP2 and HTTP2_AVAILABLE):
+        self.base_url, self.http2 = base_url, http2
+        self.headers: Optional[dict] = None
+        self._clients = LoopLocal(self._new_client, close=lambda pair: pair[1].aclose())  # loop -> (Client, httpx client)
+        self.streams = weakref.WeakSet()  # network streams (connections) that have served a request
+        self.last_used = 0.0
+        self.stats = Counter()
+
+    def _new_client(self) -> tuple:
+        http = httpx.AsyncClient(
+            http2=self.http2,
+            limits=httpx.Limits(max_connections=MODEL_POOL_MAX_CONNECTIONS,
+                                max_keepalive_connections=MODEL_POOL_MAX_KEEPALIVE,
+                                keepalive_expiry=MODEL_POOL_KEEPALIVE_EXPIRY),
+            event_hooks={"response": [self._on_response]},
+        )
+        client = Client(http_options=types.HttpOptions(
+            headers=self.headers, base_url=self.base_url or None, httpx_async_client=http))
+        self.stats["clients"] += 1
+        return client, http
+
+    def get(self, headers: Optional[dict] = None) -> Client:
+        """The running loop's Client, created on first use there. Without a running loop, a new unpooled Client."""
+        if headers is not None:
+            self.headers = headers
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:  # nothing to tie a pool to, e.g. a sync caller
+            return Client(http_options=types.HttpOptions(headers=self.headers, base_url=self.base_url or None))
+        return self._clients.get()[0]
+
+    @property
+    def client(self) -> Optional[Client]:
+        """The running loop's Client, or None if it has none yet."""
+        pair = self._clients.peek()
+        return pair[0] if pair else None
+
+    @property
+    def http(self) -> Optional[httpx.AsyncClient]:
+        """The running loop's httpx client, or None if it has none yet."""
+        pair = self._clients.peek()
+        return pair[1] if pair else None
+
+    async def _on_response(self, response: httpx.Response):
+        stream = response.extensions.get("network_stream")
+        connection = "reused" if stream is not None and stream in self.streams else "new"
+        if stream is not None:
+            self.streams.add(stream)
+        self.stats[connection] += 1
+        self.last_used = time.monotonic()
+        MODEL_HTTP_REQUESTS.inc((connection, response.http_version))
+
+    def pool(self) -> tuple:
+        """(open, idle) connections in the pool."""
+        connections = getattr(getattr(getattr(self.http, "_transport", None), "_pool", None), "connections", [])
+        return len(connections), sum(1 for connection in connections if connection.is_idle())
+
+    async def ping(self, model: str = MODEL_WARMUP_MODEL) -> Optional[float]:
+        """Seconds for one models.get call, or None if it failed."""
+        started = time.perf_counter()
+        try:
+            await self.get().aio.models.get(model=model)
+        except Exception as e:
+            print(f"  [Model Client] ping failed: {e!r}")
+            return None
+        return time.perf_counter() - started
+
+    async def warm_up(self, connections: int = MODEL_WARMUP_CONNECTIONS,
+                      timeout: float = MODEL_WARMUP_TIMEOUT_SECONDS) -> Optional[float]:
+        """Opens `connections` pooled connections before traffic arrives; returns the slowest ping.
+        Gives up after `timeout` seconds and returns None."""
+        self.stats["warm_ups"] += 1
+        try:
+            pings = await asyncio.wait_for(asyncio.gather(*(self.ping() for _ in range(connections))), timeout)
+        except asyncio.TimeoutError:
+            self.stats["warm_up_timeouts"] += 1
+            print(f"  [Model Client] warm-up gave up after {timeout:g}s")
+            return None
+        return None if None in pings else max(pings)
+
+    async def keepalive_pings(self, interval: float = MODEL_KEEPALIVE_PING_SECONDS):
+        """Pings whenever nothing has used the pool for `interval` seconds. Runs until cancelled."""
+        while interval > 0:
+            await asyncio.sleep(max(0.0, self.last_used + interval - time.monotonic()))
+            if time.monotonic() - self.last_used >= interval:
+                if self.client is not None:
+                    self.stats["pings"] += 1
+                    await self.ping()
+                self.last_used = max(self.last_used, time.monotonic())  # a failed ping waits a full interval too
+
+    async def close(self):
+        """Closes the running loop's client; the next call creates a new one."""
+        await self._clients.close()
+
+
+# Shared by every agent in the process.
+shared_model_client = SharedModelClient()
+
+metrics.register(metrics.Gauge(
+    "adk_model_http_pool_connections", "Open connections in the shared model client's pool.",
+    lambda: shared_model_client.pool()[0]))
+metrics.register(metrics.Gauge(
+    "adk_model_http_pool_idle_connections", "Idle keep-alive connections in the shared model client's pool.",
+    lambda: shared_model_client.pool()[1]))
+
+
+class SharedGemini(Gemini):
+    """Gemini on the process-wide client instead of a new client per call."""
+
+    @property
+    def api_client(self) -> Client:
+        if self.retry_options:  # a per-agent client setting; keep ADK's own client for those
+            return super().api_client
+        return shared_model_client.get(self._tracking_headers)
+
+
+def install_shared_model_client(enabled: bool = MODEL_CLIENT_SHARED) -> bool:
+    """Routes gemini-* through SharedGemini. Call it before install_model_transport() and install_model_hedging(),
+    which wrap whatever serves gemini-* at the time. Does nothing when disabled or when gemini-* is not served by
+    Gemini (e.g. FakeLlm)."""
+    if not enabled or LLMRegistry.resolve("gemini-2.5-flash") is not Gemini:
+        return False
+    LLMRegistry.register(SharedGemini)
+    LLMRegistry.resolve.cache_clear()
+    return True
+
+
+if __name__ == "__main__":
+    # python -m app.utils.model_client
+    # Model calls the way ADK makes them (a new Gemini object per call) against a
+    # local stand-in for the API whose connections take 100ms to set up: ADK's
+    # client per call, then the shared client, warmed up and after an idle pause
+    # with keep-alive pings. Checks that the shared client reuses its connections.
+    import statistics
+
+    from google.adk.models import LlmRequest
+
+    from app.utils.fake_gemini_server import start_fake_gemini
+
+    server, url = start_fake_gemini(delay=0.05, connect_delay=0.1)
+    os.environ.update({"GOOGLE_GENAI_USE_VERTEXAI": "False", "GOOGLE_API_KEY": "fake-key", "GOOGLE_GEMINI_BASE_URL": url})
+    # The instance SharedGemini reads, not this __main__ copy's.
+    from app.utils.model_client import SharedGemini, shared_model_client
+
+    shared_model_client.base_url = url
+
+    def request():
+        return LlmRequest(model="gemini-2.5-flash", contents=[
+            types.Content(role="user", parts=[types.Part(text="Find a museum in San Francisco.")])],
+            config=types.GenerateContentConfig())
+
+    async def bench(label, model_class, calls=40, concurrency=4):
+        connections = server.connections
+        latencies, queue = [], list(range(calls))
+
+        async def worker():
+            while queue:
+                queue.pop()
+                started = time.perf_counter()
+                async for response in model_class(model="gemini-2.5-flash").generate_content_async(request()):
+                    assert response.content.parts[0].text == "Exploratorium"
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        opened = server.connections - connections
+        print(f"{label:<34} mean {statistics.mean(latencies) * 1e3:5.0f}ms  "
+              f"max {max(latencies) * 1e3:5.0f}ms  connections opened {opened:3d}")
+        return opened
+
+    async def main():
+        per_call = await bench("client per call (ADK default)", Gemini)
+        print(f"warm-up: {await shared_model_client.warm_up(connections=4) * 1e3:.0f}ms")
+        shared = await bench("shared client, warmed up", SharedGemini)
+        pings = asyncio.create_task(shared_model_client.keepalive_pings(interval=0.3))
+        await asyncio.sleep(1.0)  # idle: the pings keep the pool in use
+        after_idle = await bench("shared client, after 1s idle", SharedGemini)
+        pings.cancel()
+        print(f"stats {dict(shared_model_client.stats)}  pool (open, idle) {shared_model_client.pool()}  "
+              f"HTTP/2 {'on' if shared_model_client.http2 else 'off (pip install httpx[http2])'}")
+        assert per_call >= 40, per_call
+        assert shared == 0 and after_idle == 0, (shared, after_idle)
+        assert shared_model_client.stats["pings"] >= 1
+        await shared_model_client.close()
+
+    asyncio.run(main())
@@ -0,0 +1,328 @@
+import os
+import time
+from collections import Counter, deque
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.adk.models.registry import LLMRegistry
+from google.adk.plugins.base_plugin import BasePlugin
+
+from app.utils import budgets, metrics
+
+# --- Model tiers per agent ---
+# Every agent declares model="gemini-2.5-flash", but agents that only format or
+# extract don't need it. Each agent is mapped to a tier ("lite", "standard",
+# "pro") and the tier's model is swapped into the request just before the call.
+# When an agent has an output validator and a reply fails it, the same request is
+# retried once on the next stronger tier. Rolling per-agent latency and error
+# stats demote a tier that is too slow or failing: the agent uses the nearest
+# healthy tier (faster ones first) until a cooldown passes. A retry is a model
+# call like any other: it is charged to the request's budget (and skipped once
+# the budget is spent) and recorded in the model-call metrics.
+#
+# Tiering is off unless MODEL_TIERING_ENABLED=True; every agent then runs on the
+# model it declares.
+#
+#   MODEL_TIERS="critic_agent=pro,day_trip_agent=lite"   # override the defaults below
+#   MODEL_TIER_LITE / MODEL_TIER_STANDARD / MODEL_TIER_PRO  # the model behind each tier
+
+MODEL_TIERING_ENABLED = os.getenv("MODEL_TIERING_ENABLED", "False").lower() == "true"
+TIER_ESCALATION = os.getenv("TIER_ESCALATION", "True").lower() == "true"
+TIER_WINDOW = int(os.getenv("TIER_WINDOW", "50"))             # calls kept per (agent, tier)
+TIER_MIN_SAMPLES = int(os.getenv("TIER_MIN_SAMPLES", "10"))   # before a tier can be demoted
+TIER_MAX_ERROR_RATE = float(os.getenv("TIER_MAX_ERROR_RATE", "0.2"))
+TIER_COOLDOWN = float(os.getenv("TIER_COOLDOWN", "60"))       # seconds a demotion lasts
+
+TIERS = ["lite", "standard", "pro"]  # fastest first
+TIER_MODELS = {
+    "lite": os.getenv("MODEL_TIER_LITE", "gemini-2.5-flash-lite"),
+    "standard": os.getenv("MODEL_TIER_STANDARD", "gemini-2.5-flash"),
+    "pro": os.getenv("MODEL_TIER_PRO", "gemini-2.5-pro"),
+}
+# A tier whose rolling p95 latency goes over its budget (seconds) is demoted.
+TIER_LATENCY_BUDGET = {"lite": 4.0, "standard": 15.0, "pro": 40.0}
+
+# Agents not listed use "standard".
+AGENT_TIERS = {
+    "router_agent": "lite",
+    "greeting_agent": "lite",
+    "synthesis_agent": "lite",
+    "foodie_agent": "lite",
+    "foodie_agent_for_seq": "lite",
+    "restaurant_finder_agent_for_parallel": "lite",
+    "museum_finder_agent": "lite",
+    "concert_finder_agent": "lite",
+}
+
+
+def parse_overrides(spec: str) -> dict:
+    """Parses "agent=tier,agent=tier" into a dict."""
+    pairs = (item.split("=", 1) for item in spec.split(",") if "=" in item)
+    return {agent.strip(): tier.strip() for agent, tier in pairs if tier.strip() in TIERS}
+
+
+def name_only(text: str) -> bool:
+    """A bare name: one short line, no chatter."""
+    return bool(text) and "\n" not in text and len(text) <= 80 and not text.endswith((".", ":", "!"))
+
+
+def plan_format(text: str) -> bool:
+    from app.tools.travel_time_tool import parse_plan  # keeps numpy off the server's import path
+    return parse_plan(text) is not None
+
+
+# Replies from these agents are checked; a failing reply is retried one tier up.
+VALIDATORS = {
+    "foodie_agent": name_only,
+    "foodie_agent_for_seq": name_only,
+    "restaurant_finder_agent_for_parallel": name_only,
+    "museum_finder_agent": name_only,
+    "concert_finder_agent": name_only,
+    "planner_agent": plan_format,
+    "refiner_agent": plan_format,
+}
+
+TIER_CALLS = metrics.register(metrics.Counter("adk_model_tier_calls_total", "Model calls per agent and tier.", ["agent", "tier"]))
+TIER_ESCALATIONS = metrics.register(metrics.Counter("adk_model_tier_escalations_total", "Replies retried on a stronger tier.", ["agent", "from_tier", "to_tier"]))
+TIER_DEMOTIONS = metrics.register(metrics.Counter("adk_model_tier_demotions_total", "Tiers demoted for latency or errors.", ["agent", "tier", "reason"]))
+
+
+def _reply_text(llm_response: LlmResponse) -> Optional[str]:
+    """The text of a final reply, or None for partial chunks, tool calls and empty replies."""
+    content = llm_response.content
+    if llm_response.partial or not content or not content.parts:
+        return None
+    if any(part.function_call for part in content.parts):
+        return None
+    return "".join(part.text or "" for part in content.parts).strip() or None
+
+
+class TierPolicy:
+    """Picks each agent's model tier and keeps the rolling stats that drive demotion."""
+
+    def __init__(self, agent_tiers=None, models=None, validators=None, escalate: bool = TIER_ESCALATION):
+        self.agent_tiers = {**AGENT_TIERS, **parse_overrides(os.getenv("MODEL_TIERS", "")), **(agent_tiers or {})}
+        self.models = {**TIER_MODELS, **(models or {})}
+        self.validators = VALIDATORS if validators is None else validators
+        self.escalate = escalate
+        self.samples = {}        # (agent, tier) -> deque of (seconds, failed)
+        self.demoted_until = {}  # (agent, tier) -> monotonic time
+        self.pending = {}        # (invocation id, agent) -> (tier, start time, llm_request)
+        self.stats = Counter()
+
+    def configured_tier(self, agent: str) -> str:
+        return self.agent_tiers.get(agent, "standard")
+
+    def healthy(self, agent: str, tier: str) -> bool:
+        until = self.demoted_until.get((agent, tier))
+        if until is None:
+            return True
+        if time.monotonic() >= until:
+            # Cooldown over: start the tier again with a clean window.
+            del self.demoted_until[(agent, tier)]
+            self.samples.pop((agent, tier), None)
+            return True
+        return False
+
+    def tier_for(self, agent: str) -> str:
+        """The configured tier, or the nearest healthy one (faster first) while it is demoted."""
+        configured = self.configured_tier(agent)
+        position = TIERS.index(configured)
+        candidates = sorted(range(len(TIERS)), key=lambda i: (abs(i - position), i > position))
+        for i in candidates:
+            if self.healthy(agent, TIERS[i]):
+                return TIERS[i]
+        return configured
+
+    def stronger_tier(self, agent: str, tier: str) -> Optional[str]:
+        for candidate in TIERS[TIERS.index(tier) + 1:]:
+            if self.healthy(agent, candidate):
+                return candidate
+        return None
+
+    def record(self, agent: str, tier: str, seconds: float, failed: bool = False):
+        """Adds one call to the rolling window and demotes the tier if it is now unhealthy."""
+        window = self.samples.setdefault((agent, tier), deque(maxlen=TIER_WINDOW))
+        window.append((seconds, failed))
+        TIER_CALLS.inc((agent, tier))
+        if len(window) < TIER_MIN_SAMPLES or (agent, tier) in self.demoted_until:
+            return
+        latencies = sorted(s for s, _ in window)
+        p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+        error_rate = sum(f for _, f in window) / len(window)
+        reason = "errors" if error_rate > TIER_MAX_ERROR_RATE else "latency" if p95 > TIER_LATENCY_BUDGET[tier] else None
+        if reason:
+            self.demoted_until[(agent, tier)] = time.monotonic() + TIER_COOLDOWN
+            self.stats[f"demoted_{reason}"] += 1
+            TIER_DEMOTIONS.inc((agent, tier, reason))
+            print(f"  [Model Tiers] demoted {tier} for {agent} ({reason}: p95 {p95:.2f}s, errors {error_rate:.0%})")
+
+    def snapshot(self) -> dict:
+        """Per (agent, tier): calls in the window, p50 latency, error rate and demotion state."""
+        report = {}
+        for (agent, tier), window in self.samples.items():
+            latencies = sorted(s for s, _ in window)
+            report[f"{agent}/{tier}"] = {
+                "calls": len(window),
+                "p50_s": round(latencies[len(latencies) // 2], 3) if latencies else 0.0,
+                "error_rate": round(sum(f for _, f in window) / len(window), 3) if window else 0.0,
+                "demoted": (agent, tier) in self.demoted_until,
+            }
+        return report
+
+    def before_model_callback(self, callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+        """Swaps the agent's tier model into the request."""
+        agent = callback_context.agent_name
+        tier = self.tier_for(agent)
+        model = self.models[tier]
+        if llm_request.model and LLMRegistry.resolve(model) is not LLMRegistry.resolve(llm_request.model):
+            return None  # Different backend than the agent was built for; leave it alone.
+        llm_request.model = model
+        self.pending[(callback_context.invocation_id, agent)] = (tier, time.perf_counter(), llm_request)
+        return None
+
+    async def after_model_callback(self, callback_context: CallbackContext, llm_response: LlmResponse) -> Optional[LlmResponse]:
+        """Records the call and retries an invalid reply one tier up.
+
+        The stronger tier's reply is copied into llm_response rather than returned,
+        so later plugins and the agent's own after_model_callback still see it.
+        llm_response keeps the first call's usage; the retry is charged and
+        recorded as a call of its own.
+        """
+        agent = callback_context.agent_name
+        key = (callback_context.invocation_id, agent)
+        if llm_response.partial or key not in self.pending:
+            return None
+        tier, started, llm_request = self.pending.pop(key)
+        self.record(agent, tier, time.perf_counter() - started)
+        text = _reply_text(llm_response)
+        validator = self.validators.get(agent)
+        if not self.escalate or text is None or validator is None or validator(text):
+            return None
+        stronger = self.stronger_tier(agent, tier)
+        if stronger is None:
+            self.stats["invalid_at_top"] += 1
+            return None
+        if not budgets.allows_extra_call():
+            self.stats["escalations_over_budget"] += 1
+            return None
+        reply = await self._escalate(callback_context.invocation_id, agent, tier, stronger, llm_request)
+        if reply is not None:
+            llm_response.content = reply.content
+        return None
+
+    async def _escalate(self, invocation_id: str, agent: str, tier: str, stronger: str,
+                        llm_request: LlmRequest) -> Optional[LlmResponse]:
+        self.stats["escalations"] += 1
+        TIER_ESCALATIONS.inc((agent, tier, stronger))
+        llm_request.model = self.models[stronger]
+        started = time.perf_counter()
+        reply = None
+        try:
+            async for response in LLMRegistry.new_llm(llm_request.model).generate_content_async(llm_request):
+                if not response.partial:
+                    reply = response
+        except Exception:
+            reply = None
+        seconds = time.perf_counter() - started
+        self.record(agent, stronger, seconds, failed=reply is None)
+        usage = reply.usage_metadata if reply is not None else None
+        budgets.charge_extra_call(usage)
+        metrics.record_extra_model_call(seconds, usage, call=(invocation_id, agent))
+        return reply
+
+    def restart_clock(self, invocation_id: str, agent: str):
+        """Starts a pending call's latency clock now, e.g. after it waited for admission."""
+        pending = self.pending.get((invocation_id, agent))
+        if pending:
+            self.pending[(invocation_id, agent)] = (pending[0], time.perf_counter(), pending[2])
+
+    def on_model_error(self, callback_context: CallbackContext):
+        key = (callback_context.invocation_id, callback_context.agent_name)
+        pending = self.pending.pop(key, None)
+        if pending:
+            self.record(callback_context.agent_name, pending[0], time.perf_counter() - pending[1], failed=True)
+
+    def forget(self, invocation_id: str):
+        """Drops calls that never reached the model (answered by a callback)."""
+        for key in [k for k in self.pending if k[0] == invocation_id]:
+            del self.pending[key]
+
+
+class ModelTierPlugin(BasePlugin):
+    """Applies a TierPolicy to every model call made through a Runner."""
+
+    def __init__(self, policy: TierPolicy):
+        super().__init__(name="model_tiers")
+        self.policy = policy
+
+    async def before_model_callback(self, *, callback_context, llm_request):
+        return self.policy.before_model_callback(callback_context, llm_request)
+
+    async def after_model_callback(self, *, callback_context, llm_response):
+        return await self.policy.after_model_callback(callback_context, llm_response)
+
+    async def on_model_error_callback(self, *, callback_context, llm_request, error):
+        self.policy.on_model_error(callback_context)
+        return None
+
+    async def after_run_callback(self, *, invocation_context):
+        self.policy.forget(invocation_context.invocation_id)
+
+
+tier_policy = TierPolicy()
+
+
+def tier_plugins() -> list:
+    """The plugins every Runner should get: none at all when tiering is disabled."""
+    return [ModelTierPlugin(tier_policy)] if MODEL_TIERING_ENABLED else []
+
+
+if __name__ == "__main__":
+    # python -m app.utils.model_tiers
+    # Fake per-tier latencies: standard vs. tiered latency, then escalation and demotion.
+    import asyncio
+    import statistics
+
+    from google.adk.sessions import InMemorySessionService
+    from google.genai.types import Content, Part
+
+    from app.utils.fake_llm import FakeLlm, install_fake_llm, lognormal_latency
+
+    install_fake_llm(model_latency={
+        TIER_MODELS["lite"]: lognormal_latency(0.02, 0.3),
+        TIER_MODELS["standard"]: lognormal_latency(0.08, 0.3),
+        TIER_MODELS["pro"]: lognormal_latency(0.25, 0.3),
+    })
+    from app.agents.router_agent import root_agent
+    from app.utils.runner_registry import RunnerRegistry
+
+    message = Content(role="user", parts=[Part(text="Plan a trip to San Francisco. I want to visit a museum, see a concert, and eat at a nice restaurant.")])
+
+    async def bench(label, policy, requests=40):
+        session_service = InMemorySessionService()
+        registry = RunnerRegistry(plugins=[ModelTierPlugin(policy)] if policy else [])
+        FakeLlm.models.clear()
+        latencies = []
+        for _ in range(requests):
+            session = await session_service.create_session(app_name="tiers", user_id="u")
+            start = time.perf_counter()
+            async for _ in registry.get(root_agent, "tiers", session_service).run_async(user_id="u", session_id=session.id, new_message=message):
+                pass
+            latencies.append(time.perf_counter() - start)
+        print(f"{label:<28} mean {statistics.mean(latencies) * 1e3:6.1f} ms  models {dict(FakeLlm.models)}"
+              + (f"  {dict(policy.stats)}" if policy else ""))
+
+    async def main():
+        FakeLlm.config["route"] = "parallel_planner_agent"
+        await bench("all standard (no policy)", None)
+        await bench("tiered", TierPolicy())
+        FakeLlm.config["quality"] = {TIER_MODELS["lite"]: 0.7}  # lite rambles 30% of the time
+        await bench("tiered, sloppy lite", TierPolicy())
+        FakeLlm.config["quality"] = {}
+        FakeLlm.config["model_latency"][TIER_MODELS["lite"]] = lognormal_latency(0.15, 0.1)
+        TIER_LATENCY_BUDGET["lite"] = 0.1  # lite is now too slow for its budget
+        await bench("tiered, lite over budget", TierPolicy())
+
+    asyncio.run(main())
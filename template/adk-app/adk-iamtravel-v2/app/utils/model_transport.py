@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+from collections import Counter
+from typing import ClassVar, Optional
+
+from google.adk.models import LlmResponse
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.registry import LLMRegistry
+
+from app.utils import metrics
+
+# --- Record/replay model transport ---
+# install_model_transport() puts ReplayLlm in front of whatever serves "gemini-*"
+# (Gemini itself, or FakeLlm). That covers every model call, including nested
+# AgentTool runs. Each request is reduced to a canonical form: model, system
+# instruction, contents, tool declarations and sampling config. Per-run noise
+# such as function call ids and labels is left out. The request is keyed by a
+# hash of that form.
+#   record  every call goes to the model, and its responses (text, function calls
+#           such as transfer_to_agent and exit_loop, partial chunks) are appended
+#           to MODEL_REPLAY_PATH, one compact JSON line per request
+#   replay  calls are served from that file without touching the network. On a
+#           miss, MODEL_REPLAY_MATCH=strict raises ReplayMissError and loose calls
+#           the model and appends the answer.
+# Replay with loose matching also works as a warm cache for frequent identical
+# prompts in production. Only use it for agents whose answers may be reused.
+#
+#   MODEL_TRANSPORT=record python -m app.main      # then MODEL_TRANSPORT=replay python -m app.main
+
+MODEL_TRANSPORT = os.getenv("MODEL_TRANSPORT", "live").lower()  # "live", "record" or "replay"
+MODEL_REPLAY_PATH = os.getenv("MODEL_REPLAY_PATH", "model_replay.ndjson")
+MODEL_REPLAY_MATCH = os.getenv("MODEL_REPLAY_MATCH", "strict").lower()  # "strict" or "loose"
+SAMPLING_FIELDS = ("temperature", "top_p", "top_k", "max_output_tokens", "candidate_count", "seed",
+                   "response_mime_type", "response_schema", "stop_sequences")
+
+REPLAYS = metrics.register(metrics.Counter(
+    "adk_model_replay_total", "Model calls through the record/replay transport.", ["result"]))
+
+
+class ReplayMissError(LookupError):
+    """A replayed run asked for a model call that was never recorded (strict matching)."""
+
+
+def _strip_ids(value):
+    """Drops the per-run ids ADK puts on function calls and responses, and thought signatures."""
+    if isinstance(value, list):
+        return [_strip_ids(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    out = {}
+    for k, v in value.items():
+        if k == "thought_signature":
+            continue
+        if k in ("function_call", "function_response") and isinstance(v, dict):
+            v = {field: inner for field, inner in v.items() if field != "id"}
+        out[k] = _strip_ids(v)
+    return out
+
+
+def canonical_request(llm_request) -> dict:
+    """The parts of a request that decide the model's answer."""
+    config = llm_request.config
+    sampling = {}
+    if config:
+        dumped = config.model_dump(mode="json", exclude_none=True, include=set(SAMPLING_FIELDS))
+        sampling = {k: dumped[k] for k in sorted(dumped)}
+    return {
+        "model": llm_request.model or "",
+        "system": str(config.system_instruction or "") if config else "",
+        "contents": _strip_ids([content.model_dump(mode="json", exclude_none=True) for content in llm_request.contents]),
+        "tools": [tool.model_dump(mode="json", exclude_none=True) for tool in (config.tools or [])] if config else [],
+        "sampling": sampling,
+    }
+
+
+def request_key(llm_request) -> str:
+    canonical = json.dumps(canonical_request(llm_request), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:32]
+
+
+class ReplayStore:
+    """Recorded responses by request key, backed by an append-only NDJSON file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records = {}  # key -> [LlmResponse dicts]
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # a torn last line from an interrupted run
+                    self.records[record["k"]] = record["r"]
+        self.file = None
+
+    def get(self, key: str) -> Optional[list]:
+        return self.records.get(key)
+
+    def put(self, key: str, model: str, responses: list):
+        self.records[key] = responses
+        if self.file is None:
+            self.file = open(self.path, "a")
+        self.file.write(json.dumps({"k": key, "m": model, "r": responses}, separators=(",", ":"), ensure_ascii=False) + "\n")
+        self.file.flush()
+
+
+class ReplayLlm(BaseLlm):
+    """Serves recorded responses, or calls the real model class and records what it says."""
+
+    backend: ClassVar[Optional[type]] = None  # the class that served gemini-* before install
+    store: ClassVar[Optional[ReplayStore]] = None
+    mode: ClassVar[str] = "replay"
+    match: ClassVar[str] = "strict"
+    stats: ClassVar[Counter] = Counter()
+
+    @classmethod
+    def supported_models(cls) -> list:
+        return [r"gemini-.*"]
+
+    async def _record(self, key: str, llm_request, stream: bool):
+        responses = []
+        async for response in self.backend(model=self.model).generate_content_async(llm_request, stream=stream):
+            responses.append(_strip_ids(response.model_dump(mode="json", exclude_none=True)))
+            yield response
+        self.store.put(key, llm_request.model or self.model, responses)
+        ReplayLlm.stats["recorded"] += 1
+        REPLAYS.inc(("recorded",))
+
+    async def generate_content_async(self, llm_request, stream: bool = False):
+        key = request_key(llm_request)
+        recorded = self.store.get(key) if self.mode == "replay" else None
+        if recorded is None:
+            if self.mode == "replay":
+                ReplayLlm.stats["misses"] += 1
+                REPLAYS.inc(("miss",))
+                if self.match == "strict":
+                    raise ReplayMissError(f"No recorded model response for request {key} "
+                                          f"(model {llm_request.model or self.model}, {self.store.path}).")
+            async for response in self._record(key, llm_request, stream):
+                yield response
+            return
+        ReplayLlm.stats["hits"] += 1
+        REPLAYS.inc(("hit",))
+        for data in recorded:
+            if data.get("partial") and not stream:
+                continue
+            response = LlmResponse.model_validate(data)
+            response.custom_metadata = {**(response.custom_metadata or {}), "replayed": True}
+            yield response
+
+
+def install_model_transport(mode: str = MODEL_TRANSPORT, path: str = MODEL_REPLAY_PATH,
+                            match: str = MODEL_REPLAY_MATCH) -> bool:
+    """Routes gemini-* through ReplayLlm in "record" or "replay" mode; "live" changes nothing."""
+    if mode not in ("record", "replay"):
+        return False
+    current = LLMRegistry.resolve("gemini-2.5-flash")
+    if current is not ReplayLlm:
+        ReplayLlm.backend = current
+    ReplayLlm.store = ReplayStore(path)
+    ReplayLlm.mode, ReplayLlm.match = mode, match
+    LLMRegistry.register(ReplayLlm)
+    LLMRegistry.resolve.cache_clear()
+    return True
+
+
+if __name__ == "__main__":
+    # python -m app.utils.model_transport
+    # Records main.py's five queries against a slow fake model, replays them with
+    # the fake model's call counter watching, then shows a strict miss.
+    import asyncio
+    import tempfile
+    import time
+
+    from google.adk.sessions import InMemorySessionService
+    from google.genai.types import Content, Part
+
+    from app.utils.fake_llm import FakeLlm, install_fake_llm
+    from app.utils.runner_registry import RunnerRegistry
+
+    install_fake_llm(latency=0.1)
+    from app.agents.router_agent import root_agent
+
+    queries = [
+        ("Find me a good Italian restaurant in New York City.", "foodie_agent"),
+        ("Find me a good Italian restaurant in New York City and give me directions from Times Square.", "find_and_navigate_agent"),
+        ("Plan a trip to San Francisco. I want to visit a museum, see a concert, and eat at a nice restaurant.", "parallel_planner_agent"),
+        ("Plan a day trip to a beach near Los Angeles.", "day_trip_agent"),
+        ("Plan a trip to London. I want to visit the British Museum and eat at a restaurant nearby. The total travel time between the two should be short.", "iterative_planner_agent"),
+    ]
+
+    async def run_all(label):
+        runner = RunnerRegistry().get(root_agent, "replay", InMemorySessionService())
+        FakeLlm.calls.clear()
+        ReplayLlm.stats.clear()
+        answers, started = [], time.perf_counter()
+        for query, route in queries:
+            FakeLlm.config["route"] = route
+            session = await runner.session_service.create_session(app_name="replay", user_id="u")
+            answer = ""
+            async for event in runner.run_async(user_id="u", session_id=session.id,
+                                                new_message=Content(role="user", parts=[Part(text=query)])):
+                if event.is_final_response() and event.content and event.content.parts:
+                    answer = event.content.parts[0].text
+            answers.append(answer)
+        print(f"{label:<8} {time.perf_counter() - started:6.2f}s  fake model calls {sum(FakeLlm.calls.values()):3d}  "
+              f"transport {dict(ReplayLlm.stats)}")
+        return answers
+
+    async def main():
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "replay.ndjson")
+            install_model_transport("record", path)
+            recorded = await run_all("record")
+            install_model_transport("replay", path, "strict")
+            replayed = await run_all("replay")
+            print(f"answers identical: {recorded == replayed}; file {os.path.getsize(path)} bytes, "
+                  f"{len(ReplayLlm.store.records)} requests")
+            FakeLlm.config["route"] = "greeting_agent"
+            runner = RunnerRegistry().get(root_agent, "replay", InMemorySessionService())
+            session = await runner.session_service.create_session(app_name="replay", user_id="u")
+            try:
+                async for _ in runner.run_async(user_id="u", session_id=session.id,
+                                                new_message=Content(role="user", parts=[Part(text="Good morning!")])):
+                    pass
+            except ReplayMissError as e:
+                print(f"strict miss: {e}")
+
+    asyncio.run(main())
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+from typing import Optional
+
+import numpy as np
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+
+from app.agents.pre_router import tokenize
+from app.utils import metrics
+from app.utils.model_transport import canonical_request
+
+# --- Semantic response cache for leaf agents ---
+# Opt in per agent by passing the two callbacks below to `Agent(...)`, then turn it
+# on with RESPONSE_CACHE_ENABLED=True (off by default). The user's query is
+# embedded with a hashed bag-of-words vector; a cached answer is reused when a
+# previous query for the same agent, resolved instruction and earlier turns is
+# similar enough *and* has the same content words. Word order, case, punctuation
+# and stopwords may differ, but "a vegan restaurant" never matches "a nice
+# restaurant". Earlier turns are part of the key, so a follow-up such as
+# "Something cheaper?" only hits for the same conversation so far. On a hit the
+# model is skipped entirely, and ADK still writes the answer to the agent's
+# `output_key`, so `{destination}` etc. keep working downstream. Hits, misses,
+# stores and evictions are on /metrics.
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "False").lower() == "true"
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.9"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+EMBEDDING_DIMS = 512
+
+RESPONSE_CACHE_EVENTS = metrics.register(metrics.Counter(
+    "adk_response_cache_total", "Response cache lookups and writes, by agent and result.", ["agent", "result"]))
+
+
+def content_words(text: str) -> frozenset:
+    """The query's words without stopwords; a hit needs the same set."""
+    return frozenset(token for token in tokenize(text) if " " not in token)
+
+
+def embed(text: str, dims: int = EMBEDDING_DIMS) -> np.ndarray:
+    """Hashes unigrams and bigrams into a unit-length vector."""
+    vec = np.zeros(dims, dtype=np.float32)
+    for token in tokenize(text):
+        digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+        vec[int.from_bytes(digest, "little") % dims] += 1.0
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+class VectorIndex:
+    """A fixed-capacity matrix of query vectors searched by brute-force cosine similarity."""
+
+    def __init__(self, capacity: int, dims: int = EMBEDDING_DIMS):
+        self.vectors = np.zeros((capacity, dims), dtype=np.float32)
+        self.expires_at = np.zeros(capacity)  # 0 marks an empty slot
+        self.answers = [None] * capacity
+        self.words = [None] * capacity
+        self.next_slot = 0
+
+    def search(self, vector: np.ndarray, now: float, threshold: float, words: frozenset):
+        """Returns (answer, similarity) for the closest live entry at or above `threshold` with the same
+        content words, or (None, best similarity seen)."""
+        scores = self.vectors @ vector
+        scores[self.expires_at <= now] = -1.0
+        order = np.argsort(-scores)
+        for slot in order[:int(np.count_nonzero(scores >= threshold))]:
+            if self.words[slot] == words:
+                return self.answers[slot], float(scores[slot])
+        return None, max(0.0, float(scores[order[0]]))
+
+    def add(self, vector: np.ndarray, words: frozenset, answer: str, expires_at: float) -> bool:
+        """Stores an entry, overwriting the oldest slot once full. Returns True if one was evicted."""
+        slot = self.next_slot
+        evicted = bool(self.expires_at[slot])
+        self.vectors[slot], self.expires_at[slot], self.answers[slot] = vector, expires_at, answer
+        self.words[slot] = words
+        self.next_slot = (slot + 1) % len(self.answers)
+        return evicted
+
+
+def _user_query(callback_context: CallbackContext) -> Optional[str]:
+    content = callback_context.user_content
+    if content and content.parts and content.parts[0].text:
+        return content.parts[0].text
+    return None
+
+
+def _is_first_call(llm_request: LlmRequest) -> bool:
+    """True when the model is about to answer the user's turn (not a tool result)."""
+    last = llm_request.contents[-1] if llm_request.contents else None
+    return bool(last and last.role == "user" and last.parts and last.parts[0].text)
+
+
+class ResponseCache:
+    """Per-agent semantic cache wired in through before/after model callbacks."""
+
+    def __init__(self, threshold: float = RESPONSE_CACHE_THRESHOLD, ttl: float = RESPONSE_CACHE_TTL,
+                 max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, enabled: bool = RESPONSE_CACHE_ENABLED):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.indexes = {}  # (agent name, instruction hash, earlier turns hash) -> VectorIndex
+        self.pending = {}  # (invocation id, agent name) -> (namespace, query vector, words) awaiting an answer
+        self.max_pending = 1024  # Calls that fail never store; drop their oldest pending entries.
+        self.stats = Counter()
+
+    def _count(self, agent_name: str, result: str):
+        self.stats[result] += 1
+        RESPONSE_CACHE_EVENTS.inc((agent_name, result))
+
+    @staticmethod
+    def _namespace(callback_context: CallbackContext, llm_request: LlmRequest):
+        # The system instruction is already resolved, so state placeholders are part of the key.
+        # So are the turns before the query (without per-run ids), so follow-ups only match their own history.
+        instruction = str(llm_request.config.system_instruction or "") if llm_request.config else ""
+        earlier = json.dumps(canonical_request(llm_request)["contents"][:-1], sort_keys=True)
+        return (callback_context.agent_name, hashlib.sha1(instruction.encode()).hexdigest(),
+                hashlib.sha1(earlier.encode()).hexdigest())
+
+    def before_model_callback(self, callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+        """Answers from the cache when a similar query was seen for this agent."""
+        query = _user_query(callback_context)
+        if not self.enabled or not query or not _is_first_call(llm_request):
+            return None
+        namespace, vector, words = self._namespace(callback_context, llm_request), embed(query), content_words(query)
+        index = self.indexes.get(namespace)
+        answer, similarity = index.search(vector, time.time(), self.threshold, words) if index else (None, 0.0)
+        if answer is None:
+            self._count(callback_context.agent_name, "misses")
+            self.pending[(callback_context.invocation_id, callback_context.agent_name)] = (namespace, vector, words)
+            if len(self.pending) > self.max_pending:
+                self.pending.pop(next(iter(self.pending)))
+            return None
+        self._count(callback_context.agent_name, "hits")
+        print(f"  [Response Cache] hit for {callback_context.agent_name} (similarity {similarity:.2f})")
+        return LlmResponse(content=types.Content(role="model", parts=[types.Part(text=answer)]))
+
+    def after_model_callback(self, callback_context: CallbackContext, llm_response: LlmResponse) -> Optional[LlmResponse]:
+        """Stores final text answers; function calls and partial chunks are never cached."""
+        key = (callback_context.invocation_id, callback_context.agent_name)
+        content = llm_response.content
+        if key not in self.pending or llm_response.partial or not content or not content.parts:
+            return None
+        if any(part.function_call for part in content.parts):
+            return None  # Wait for the answer that follows the tool call.
+        namespace, vector, words = self.pending.pop(key)
+        answer = "".join(part.text or "" for part in content.parts).strip()
+        if not answer:
+            return None
+        index = self.indexes.setdefault(namespace, VectorIndex(self.max_entries))
+        if index.add(vector, words, answer, time.time() + self.ttl):
+            self._count(callback_context.agent_name, "evictions")
+        self._count(callback_context.agent_name, "stores")
+        return None
+
+
+# Shared by the opted-in agents in app/agents/llm_agents.py.
+response_cache = ResponseCache()
@@ -0,0 +1,115 @@
+import os
+import threading
+from collections import OrderedDict
+
+from google.adk.agents import BaseAgent
+from google.adk.runners import Runner
+from google.adk.sessions import BaseSessionService
+
+from app.agents.lazy_agent import lazy_agent_plugins
+from app.utils.admission import admission_plugins
+from app.utils.budgets import budget_plugins
+from app.utils.history_compaction import compaction_plugins
+from app.utils.metrics import metrics_plugins
+from app.utils.model_tiers import tier_plugins
+from app.utils.search_cache import search_memo_plugins
+
+# --- Process-wide Runner registry ---
+# Building a Runner per request repeats agent-tree setup on the hot path. Runners
+# are stateless between calls, so one per (agent, app_name, session_service) is
+# built once and shared by every request. Agent graphs are registered by name,
+# which lets `swap()` replace a graph at runtime: new requests get a Runner for
+# the new graph while requests already in flight finish on the old one.
+#
+# app_name comes from the client, so the registry keeps at most
+# RUNNER_REGISTRY_MAX_RUNNERS runners and drops the least recently used one
+# beyond that. A dropped runner is rebuilt on its next request.
+
+RUNNER_REGISTRY_MAX_RUNNERS = int(os.getenv("RUNNER_REGISTRY_MAX_RUNNERS", "32"))
+
+
+class RunnerRegistry:
+    """Builds each Runner once and hands the same instance to every caller."""
+
+    def __init__(self, plugins=None, max_runners: int = RUNNER_REGISTRY_MAX_RUNNERS):
+        self.plugins = plugins or []  # Runner-wide hooks, e.g. app/utils/metrics.py, app/utils/admission.py
+        self.max_runners = max(1, max_runners)
+        self._agents = {}   # agent name -> agent graph currently served under that name
+        self._runners = OrderedDict()  # (agent name, app_name, id(session_service)) -> Runner, least recently used first
+        self._lock = threading.Lock()
+
+    def register(self, agent: BaseAgent) -> BaseAgent:
+        """Makes an agent graph available under its name."""
+        with self._lock:
+            self._agents.setdefault(agent.name, agent)
+        return self._agents[agent.name]
+
+    def swap(self, agent: BaseAgent):
+        """Replaces the graph served under agent.name; its cached runners are rebuilt lazily."""
+        with self._lock:
+            self._agents[agent.name] = agent
+            self._runners = OrderedDict(
+                (key, runner) for key, runner in self._runners.items() if key[0] != agent.name)
+
+    def get(self, agent: BaseAgent, app_name: str, session_service: BaseSessionService) -> Runner:
+        """Returns the shared Runner for the graph currently registered under agent.name."""
+        key = (agent.name, app_name, id(session_service))
+        with self._lock:
+            runner = self._runners.get(key)
+            if runner is not None:
+                self._runners.move_to_end(key)
+                return runner
+            current = self._agents.setdefault(agent.name, agent)
+            runner = Runner(agent=current, app_name=app_name, session_service=session_service, plugins=self.plugins)
+            self._runners[key] = runner
+            while len(self._runners) > self.max_runners:
+                self._runners.popitem(last=False)
+        return runner
+
+
+# Order matters: a spent budget skips a model call before anything else runs for it,
+# history is compacted next, the tier plugin picks the model before admission
+# rate-limits it, and metrics time the model call only once admitted. The lazy-agent
+# plugin only acts on the user message, before any of that.
+runner_registry = RunnerRegistry(
+    plugins=lazy_agent_plugins() + budget_plugins() + compaction_plugins() + tier_plugins() + admission_plugins() + metrics_plugins()
+    + search_memo_plugins())
+
+
+if __name__ == "__main__":
+    # python -m app.utils.runner_registry
+    # Per-request overhead of Runner construction vs. registry lookup, with a stubbed model.
+    import asyncio
+    import time
+
+    from google.adk.sessions import InMemorySessionService
+    from google.genai.types import Content, Part
+
+    from app.utils.fake_llm import install_fake_llm
+
+    install_fake_llm(latency=0.0)
+    from app.agents.router_agent import root_agent
+
+    requests = 300
+    message = Content(role="user", parts=[Part(text="Tell me something nice.")])
+
+    async def bench(label, get_runner):
+        session_service = InMemorySessionService()
+        sessions = [await session_service.create_session(app_name="bench", user_id="u") for _ in range(requests)]
+        start = time.perf_counter()
+        setup = 0.0
+        for session in sessions:
+            t0 = time.perf_counter()
+            runner = get_runner(session_service)
+            setup += time.perf_counter() - t0
+            async for _ in runner.run_async(user_id="u", session_id=session.id, new_message=message):
+                pass
+        total = time.perf_counter() - start
+        print(f"{label:<22} runner setup {setup / requests * 1e6:8.1f} us/request, end to end {total / requests * 1e3:6.2f} ms/request")
+
+    async def main():
+        await bench("Runner per request", lambda ss: Runner(agent=root_agent, app_name="bench", session_service=ss))
+        registry = RunnerRegistry()
+        await bench("RunnerRegistry", lambda ss: registry.get(root_agent, "bench", ss))
+
+    asyncio.run(main())
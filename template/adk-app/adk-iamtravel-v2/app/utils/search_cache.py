@@ -0,0 +1,274 @@
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from google.adk.plugins.base_plugin import BasePlugin
+
+from app.utils import metrics
+
+# --- A shared cache for search results ---
+# Keyed on (engine, normalized query). Entries expire after a TTL and the
+# in-memory tier is bounded by entry count and bytes with LRU eviction. An
+# optional SQLite file keeps results across restarts. Concurrent identical
+# lookups share a single upstream call (single-flight). SEARCH_CACHE_ENABLED=False
+# (or `search_cache.enabled = False`) sends every search upstream.
+#
+# The SQLite tier is read and written on a worker thread (asyncio.to_thread), so
+# a slow disk never blocks the event loop. Each write also deletes expired rows
+# and, beyond SEARCH_CACHE_DISK_MAX_ENTRIES, the rows closest to expiry (the
+# oldest). Hits, misses and evictions of both tiers are on /metrics.
+
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "True").lower() == "true"
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "3600"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1024"))
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH")  # e.g. /tmp/search_cache.sqlite3
+SEARCH_CACHE_DISK_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_DISK_MAX_ENTRIES", "10000"))
+SEARCH_MEMO_ENABLED = os.getenv("SEARCH_MEMO_ENABLED", "True").lower() == "true"
+
+SEARCH_CACHE_EVENTS = metrics.register(metrics.Counter(
+    "adk_search_cache_total", "Shared search cache lookups and evictions, by result.", ["result"]))
+
+
+def normalize_query(query: str) -> str:
+    """Lowercases, strips punctuation and collapses whitespace so trivial variants share a key."""
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+
+def _leader_cancelled(shared: asyncio.Future) -> bool:
+    """True when a shared fetch was cancelled with its caller (e.g. a branch cut off at its
+    deadline) while the current caller was not, which should then fetch for itself."""
+    return shared.cancelled() and not asyncio.current_task().cancelling()
+
+
+class SearchCache:
+    """TTL + LRU cache with single-flight coalescing and an optional on-disk tier."""
+
+    def __init__(self, ttl: float = SEARCH_CACHE_TTL, max_entries: int = SEARCH_CACHE_MAX_ENTRIES,
+                 max_bytes: int = SEARCH_CACHE_MAX_BYTES, path: str = SEARCH_CACHE_PATH,
+                 enabled: bool = SEARCH_CACHE_ENABLED, disk_max_entries: int = SEARCH_CACHE_DISK_MAX_ENTRIES):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_max_entries = disk_max_entries
+        self.entries = OrderedDict()  # key -> (expires_at, value, size)
+        self.bytes = 0
+        self.inflight = {}  # key -> asyncio.Future
+        self.stats = Counter()
+        self.db = None
+        self.db_lock = threading.Lock()  # one worker thread at a time on the connection
+        if path:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS search_cache (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS search_cache_expires_at ON search_cache (expires_at)")
+            self.db.commit()
+
+    def _count(self, result: str, amount: int = 1):
+        self.stats[result] += amount
+        SEARCH_CACHE_EVENTS.inc((result,), amount)
+
+    @staticmethod
+    def make_key(query: str, engine: str) -> str:
+        return f"{engine}:{normalize_query(query)}"
+
+    def get(self, key: str):
+        """Returns the value cached in memory or None, promoting hits to most recently used."""
+        entry = self.entries.get(key)
+        if entry:
+            if entry[0] > time.time():
+                self.entries.move_to_end(key)
+                self._count("hits")
+                return entry[1]
+            self._drop(key)
+            self._count("expired")
+        return None
+
+    async def load(self, key: str):
+        """get(), then the SQLite tier (read on a worker thread). Counts the miss when both miss."""
+        value = self.get(key)
+        if value is None and self.db:
+            row = await asyncio.to_thread(self._read, key)
+            if row and row[1] > time.time():
+                value = json.loads(row[0])
+                self._remember(key, value, row[1])
+                self._count("hits")
+                self._count("disk_hits")
+        if value is None:
+            self._count("misses")
+        return value
+
+    async def put(self, key: str, value):
+        expires_at = time.time() + self.ttl
+        self._remember(key, value, expires_at)
+        if self.db:
+            await asyncio.to_thread(self._write, key, json.dumps(value), expires_at)
+
+    def _read(self, key: str):
+        with self.db_lock:
+            return self.db.execute("SELECT value, expires_at FROM search_cache WHERE key = ?", (key,)).fetchone()
+
+    def _write(self, key: str, value: str, expires_at: float):
+        """Stores one row and prunes the table: expired rows first, then the oldest beyond the cap."""
+        with self.db_lock:
+            self.db.execute("INSERT OR REPLACE INTO search_cache VALUES (?, ?, ?)", (key, value, expires_at))
+            expired = self.db.execute("DELETE FROM search_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+            excess = self.db.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0] - self.disk_max_entries
+            evicted = 0
+            if excess > 0:
+                evicted = self.db.execute(
+                    "DELETE FROM search_cache WHERE key IN (SELECT key FROM search_cache ORDER BY expires_at LIMIT ?)",
+                    (excess,)).rowcount
+            self.db.commit()
+        if expired:
+            self._count("disk_expired", expired)
+        if evicted:
+            self._count("disk_evictions", evicted)
+
+    def _remember(self, key, value, expires_at):
+        size = len(json.dumps(value))
+        if size > self.max_bytes:
+            return
+        self._drop(key)
+        self.entries[key] = (expires_at, value, size)
+        self.bytes += size
+        while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self._drop(oldest)
+            self._count("evictions")
+
+    def _drop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry:
+            self.bytes -= entry[2]
+
+    async def get_or_fetch(self, query: str, engine: str, fetch, should_cache=lambda value: True):
+        """Returns a cached result, or awaits fetch() once for all concurrent callers of the same key."""
+        if not self.enabled:
+            return await fetch()
+        key = self.make_key(query, engine)
+        value = self.get(key)
+        if value is not None:
+            return value
+        if key in self.inflight:
+            self._count("coalesced")
+            shared = self.inflight[key]
+            try:
+                return await asyncio.shield(shared)
+            except asyncio.CancelledError:
+                if not _leader_cancelled(shared):
+                    raise
+            return await self.get_or_fetch(query, engine, fetch, should_cache)
+
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            value = await self.load(key)
+            if value is None:
+                value = await fetch()
+                if should_cache(value):
+                    await self.put(key, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure doesn't log "exception was never retrieved".
+            future.exception()
+            raise
+        finally:
+            del self.inflight[key]
+
+    def clear(self):
+        """Drops every cached result, in memory and on disk."""
+        self.entries.clear()
+        self.bytes = 0
+        if self.db:
+            with self.db_lock:
+                self.db.execute("DELETE FROM search_cache")
+                self.db.commit()
+
+    def snapshot(self) -> dict:
+        """Hit/miss/eviction counters plus the current memory footprint."""
+        return {**self.stats, "entries": len(self.entries), "bytes": self.bytes}
+
+
+# --- A request-scoped search memo ---
+# The shared cache above only keeps results worth keeping for everyone, for as
+# long as SEARCH_CACHE_TTL allows. The memo is narrower: within one invocation
+# (one /run request, including its parallel branches and nested tool agents)
+# each distinct search runs once, whatever its result, and later identical
+# searches get the same answer. It is dropped when the invocation ends.
+
+
+class RequestMemo:
+    """Per-invocation results of searches, keyed like the shared cache."""
+
+    def __init__(self, max_invocations: int = 1024):
+        self.invocations = OrderedDict()  # invocation id -> {key: asyncio.Future}
+        self.max_invocations = max_invocations
+        self.stats = Counter()
+
+    async def get_or_fetch(self, invocation_id: str, key: str, fetch):
+        """Returns this invocation's result for key, awaiting fetch() only the first time."""
+        if not SEARCH_MEMO_ENABLED or not invocation_id:
+            return await fetch()
+        memo = self.invocations.setdefault(invocation_id, {})
+        self.invocations.move_to_end(invocation_id)
+        while len(self.invocations) > self.max_invocations:
+            self.invocations.popitem(last=False)
+        if key in memo:
+            self.stats["hits"] += 1
+            shared = memo[key]
+            try:
+                return await asyncio.shield(shared)
+            except asyncio.CancelledError:
+                if not _leader_cancelled(shared):
+                    raise
+            return await self.get_or_fetch(invocation_id, key, fetch)
+
+        self.stats["misses"] += 1
+        future = memo[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await fetch()
+        except asyncio.CancelledError:
+            memo.pop(key, None)
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        future.set_result(value)
+        return value
+
+    def forget(self, invocation_id: str):
+        self.invocations.pop(invocation_id, None)
+
+
+class SearchMemoPlugin(BasePlugin):
+    """Drops an invocation's memo when its run ends."""
+
+    def __init__(self, memo: RequestMemo):
+        super().__init__(name="search_memo")
+        self.memo = memo
+
+    async def after_run_callback(self, *, invocation_context):
+        self.memo.forget(invocation_context.invocation_id)
+
+
+# Shared by every search tool in the process.
+search_cache = SearchCache()
+search_memo = RequestMemo()
+
+
+def search_memo_plugins() -> list:
+    """The plugins every Runner should get: none at all when the memo is disabled."""
+    return [SearchMemoPlugin(search_memo)] if SEARCH_MEMO_ENABLED else []
@@ -1,33 +1,88 @@
 import asyncio
-from IPython.display import display, Markdown
 from google.adk.agents import Agent
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService, Session
+from google.adk.sessions import Session
 from google.genai.types import Content, Part
+from app.utils.runner_registry import runner_registry
+from app.utils.sqlite_session_service import create_session_service
+from app.utils.streaming import TOKEN_STREAMING, run_config
+
+def render_markdown(text: str):
+    """Renders Markdown in a notebook; IPython is imported only here, so scripts and servers never load it."""
+    try:
+        from IPython.display import display, Markdown
+    except ImportError:
+        print(text)
+        return
+    display(Markdown(text))
+
+class StreamRenderer:
+    """Shows streamed text as it arrives: one updating Markdown cell in a notebook, plain stdout elsewhere."""
+
+    def __init__(self):
+        self.text = ""
+        self.handle = None
+        try:
+            from IPython import get_ipython
+            from IPython.display import display, Markdown
+            if get_ipython() is not None:
+                self.handle = display(Markdown(""), display_id=True)
+        except ImportError:
+            pass
+
+    def add(self, chunk: str):
+        self.text += chunk
+        if self.handle is not None:
+            from IPython.display import Markdown
+            self.handle.update(Markdown(self.text))
+        else:
+            print(chunk, end="", flush=True)
+
+    def replace(self, text: str):
+        """The final reply differed from its chunks (e.g. a tier escalation rewrote it)."""
+        if text == self.text:
+            return
+        self.text = ""
+        if self.handle is None:
+            print("\n[revised]")
+        self.add(text)
 
 # --- A Helper Function to Run Our Agents ---
 # We'll use this function throughout the notebook to make running queries easy.
-async def run_agent_query(agent: Agent, query: str, session: Session, user_id: str, is_router: bool = False):
-    """Initializes a runner and executes a query for a given agent and session."""
+async def run_agent_query(agent: Agent, query: str, session: Session, user_id: str, is_router: bool = False,
+                          stream: bool = TOKEN_STREAMING):
+    """Executes a query for a given agent and session, reusing the shared runner.
+
+    With stream=True the model replies are streamed and rendered as they arrive.
+    """
     print(f"\n🚀 Running query for agent: '{agent.name}' in session: '{session.id}'...")
 
-    runner = Runner(
-        agent=agent,
-        session_service=session_service,
-        app_name=agent.name
-    )
+    runner = runner_registry.get(agent, session.app_name, session_service)
 
     final_response = ""
+    renderers = {}  # author -> StreamRenderer for the reply being streamed
     try:
         async for event in runner.run_async(
             user_id=user_id,
             session_id=session.id,
-            new_message=Content(parts=[Part(text=query)], role="user")
+            new_message=Content(parts=[Part(text=query)], role="user"),
+            run_config=run_config(stream),
         ):
+            if event.partial:
+                if event.content and event.content.parts and event.content.parts[0].text:
+                    if event.author not in renderers:
+                        print(f"\n💬 {event.author}: ", end="")
+                        renderers[event.author] = StreamRenderer()
+                    renderers[event.author].add(event.content.parts[0].text)
+                continue
+            if event.author in renderers:
+                renderer = renderers.pop(event.author)
+                if event.content and event.content.parts and event.content.parts[0].text:
+                    renderer.replace(event.content.parts[0].text)
+                print()
             if not is_router:
                 # Let's see what the agent is thinking!
                 print(f"EVENT: {event}")
-            if event.is_final_response():
+            if event.is_final_response() and event.content and event.content.parts:
                 final_response = event.content.parts[0].text
     except Exception as e:
         final_response = f"An error occurred: {e}"
@@ -35,12 +90,12 @@ async def run_agent_query(agent: Agent, query: str, session: Session, user_id: s
     if not is_router:
      print("\n" + "-"*50)
      print("✅ Final Response:")
-     display(Markdown(final_response))
+     render_markdown(final_response)
      print("-"*50 + "\n")
 
     return final_response
 
 # --- Initialize our Session Service ---
 # This one service will manage all the different sessions in our notebook.
-session_service = InMemorySessionService()
+session_service = create_session_service()
 my_user_id = "adk_adventurer_001"
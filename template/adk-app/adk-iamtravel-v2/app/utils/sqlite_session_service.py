@@ -0,0 +1,363 @@
+import asyncio
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Optional
+
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, InMemorySessionService, Session, State
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+
+# --- A bounded, persistent session store ---
+# Sessions live in one SQLite file in WAL mode, so several uvicorn/gunicorn
+# workers can share it and a follow-up request may land on any worker. Each
+# worker keeps a small LRU of hot sessions, validated against the stored
+# last_update_time. Events are appended (never rewritten) in batches, each
+# session keeps at most `max_events` events, and a background sweeper expires
+# sessions that have been idle for longer than `idle_ttl`.
+#
+# "app:" and "user:" state keys are shared by every session of the app or of the
+# user, as in ADK's own services. They are stored once per app and per user
+# (user_id '' holds the app scope), merged into every session read, and kept out
+# of the per-session state. "temp:" keys are never stored.
+#
+# Every SQLite call runs on a worker thread (asyncio.to_thread), one at a time
+# under the service's lock, so a database locked by another worker makes that
+# request wait (up to SESSION_DB_BUSY_TIMEOUT) without stalling the event loop.
+
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH")  # e.g. /tmp/sessions.sqlite3; unset keeps sessions in memory
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "256"))
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "3600"))
+SESSION_MAX_EVENTS = int(os.getenv("SESSION_MAX_EVENTS", "200"))
+SESSION_DB_BUSY_TIMEOUT = float(os.getenv("SESSION_DB_BUSY_TIMEOUT", "30"))  # seconds to wait for another worker's lock
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    app_name TEXT, user_id TEXT, id TEXT, state TEXT, last_update_time REAL,
+    PRIMARY KEY (app_name, user_id, id)
+);
+CREATE INDEX IF NOT EXISTS sessions_by_update_time ON sessions (last_update_time);
+CREATE TABLE IF NOT EXISTS events (
+    app_name TEXT, user_id TEXT, session_id TEXT, timestamp REAL, data TEXT
+);
+CREATE INDEX IF NOT EXISTS events_by_session ON events (app_name, user_id, session_id);
+CREATE TABLE IF NOT EXISTS scoped_state (
+    app_name TEXT, user_id TEXT, state TEXT,
+    PRIMARY KEY (app_name, user_id)
+);
+"""
+
+
+class SqliteSessionService(BaseSessionService):
+    """Drop-in replacement for InMemorySessionService backed by SQLite (WAL)."""
+
+    def __init__(self, path: str, cache_size: int = SESSION_CACHE_SIZE, idle_ttl: float = SESSION_IDLE_TTL,
+                 max_events: int = SESSION_MAX_EVENTS, flush_batch: int = 32, sweep_interval: float = 60.0):
+        self.cache_size = cache_size
+        self.idle_ttl = idle_ttl
+        self.max_events = max_events
+        self.flush_batch = flush_batch
+        self.sweep_interval = sweep_interval
+        self._cache = OrderedDict()  # (app_name, user_id, id) -> Session
+        self._pending = []  # buffered (key, event json, timestamp) rows
+        self._dirty = {}  # key -> (state json, last_update_time) to write with the next flush
+        self._scoped = {}  # (app_name, user_id or '' for app:) -> {key: value} to merge with the next flush
+        self._lock = threading.RLock()  # held by the worker thread doing the service's SQLite work
+        self._sweeper = None
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=SESSION_DB_BUSY_TIMEOUT)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    # --- app: and user: state ---
+
+    @staticmethod
+    def _session_state(state: dict) -> dict:
+        """The part of a state dict stored with the session itself."""
+        return {key: value for key, value in state.items()
+                if not key.startswith((State.APP_PREFIX, State.USER_PREFIX, State.TEMP_PREFIX))}
+
+    def _buffer_scoped(self, app_name: str, user_id: str, delta: dict):
+        for key, value in delta.items():
+            if key.startswith(State.APP_PREFIX):
+                self._scoped.setdefault((app_name, ""), {})[key.removeprefix(State.APP_PREFIX)] = value
+            elif key.startswith(State.USER_PREFIX):
+                self._scoped.setdefault((app_name, user_id), {})[key.removeprefix(State.USER_PREFIX)] = value
+
+    def _merge_scoped(self, app_name: str, user_id: str, state: dict) -> dict:
+        """state plus the stored app: and user: keys."""
+        for scope, prefix in (("", State.APP_PREFIX), (user_id, State.USER_PREFIX)):
+            row = self._db.execute(
+                "SELECT state FROM scoped_state WHERE app_name = ? AND user_id = ?", (app_name, scope)).fetchone()
+            if row:
+                state.update({prefix + key: value for key, value in json.loads(row[0]).items()})
+        return state
+
+    # --- hot cache ---
+
+    def _cache_put(self, key, session: Session):
+        self._cache[key] = session
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _ensure_sweeper(self):
+        if self._sweeper is None or self._sweeper.done():
+            try:
+                self._sweeper = asyncio.get_running_loop().create_task(self._sweep_forever())
+            except RuntimeError:
+                pass  # No running loop (sync use); sweep_expired() can still be called directly.
+
+    # --- BaseSessionService ---
+
+    async def create_session(self, *, app_name: str, user_id: str, state: Optional[dict[str, Any]] = None,
+                             session_id: Optional[str] = None) -> Session:
+        """Creates a session, or returns the existing one when session_id is already taken."""
+        self._ensure_sweeper()
+        session_id = session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4())
+        await asyncio.to_thread(self._create, app_name, user_id, state, session_id)
+        return await self.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+
+    def _create(self, app_name: str, user_id: str, state: Optional[dict], session_id: str):
+        now = time.time()
+        with self._lock:
+            inserted = self._db.execute(
+                "INSERT OR IGNORE INTO sessions VALUES (?, ?, ?, ?, ?)",
+                (app_name, user_id, session_id, json.dumps(self._session_state(state or {})), now),
+            ).rowcount
+            if inserted and state:
+                self._buffer_scoped(app_name, user_id, state)
+                self._flush()
+
+    async def get_session(self, *, app_name: str, user_id: str, session_id: str,
+                          config: Optional[GetSessionConfig] = None) -> Optional[Session]:
+        self._ensure_sweeper()
+        session = await asyncio.to_thread(self._get, (app_name, user_id, session_id))
+        if session and config:
+            if config.num_recent_events:
+                session.events = session.events[-config.num_recent_events:]
+            if config.after_timestamp:
+                session.events = [e for e in session.events if e.timestamp >= config.after_timestamp]
+        return session
+
+    def _get(self, key) -> Optional[Session]:
+        app_name, user_id, session_id = key
+        with self._lock:
+            self._flush()
+            row = self._db.execute(
+                "SELECT state, last_update_time FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?", key
+            ).fetchone()
+            if row is None:
+                self._cache.pop(key, None)
+                return None
+            cached = self._cache.get(key)
+            if cached is None or cached.last_update_time != row[1]:
+                # Missing here, or another worker wrote to it since we cached it.
+                events = [
+                    Event.model_validate_json(data) for (data,) in self._db.execute(
+                        "SELECT data FROM events WHERE app_name = ? AND user_id = ? AND session_id = ? ORDER BY rowid", key
+                    )
+                ]
+                cached = Session(id=session_id, app_name=app_name, user_id=user_id,
+                                 state=json.loads(row[0]), events=events, last_update_time=row[1])
+            self._cache_put(key, cached)
+            session = copy.deepcopy(cached)
+            self._merge_scoped(app_name, user_id, session.state)
+        return session
+
+    async def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        return await asyncio.to_thread(self._list, app_name, user_id)
+
+    def _list(self, app_name: str, user_id: str) -> ListSessionsResponse:
+        with self._lock:
+            self._flush()
+            rows = self._db.execute(
+                "SELECT id, state, last_update_time FROM sessions WHERE app_name = ? AND user_id = ?", (app_name, user_id)
+            ).fetchall()
+            return ListSessionsResponse(sessions=[
+                Session(id=sid, app_name=app_name, user_id=user_id,
+                        state=self._merge_scoped(app_name, user_id, json.loads(state)), last_update_time=updated)
+                for sid, state, updated in rows
+            ])
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        await asyncio.to_thread(self._delete_now, [(app_name, user_id, session_id)])
+
+    def _delete_now(self, keys):
+        with self._lock:
+            self._flush()
+            self._delete(keys)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        """Applies the event, then buffers it as one appended row (flushed in batches)."""
+        if event.partial:
+            return event
+        await super().append_event(session=session, event=event)
+        if len(session.events) > self.max_events:
+            del session.events[:-self.max_events]
+        session.last_update_time = event.timestamp
+        await asyncio.to_thread(self._buffer_event, session, event)
+        return event
+
+    def _buffer_event(self, session: Session, event: Event):
+        key = (session.app_name, session.user_id, session.id)
+        with self._lock:
+            self._pending.append((key, event.model_dump_json(exclude_none=True), event.timestamp))
+            self._dirty[key] = (json.dumps(self._session_state(session.state)), session.last_update_time)
+            if event.actions and event.actions.state_delta:
+                self._buffer_scoped(session.app_name, session.user_id, event.actions.state_delta)
+            cached = self._cache.get(key)
+            if cached is not None and cached is not session:
+                # Mirror the append on the cached copy instead of deep-copying the whole session.
+                cached.events.append(event)
+                del cached.events[:-self.max_events]
+                cached.state = self._session_state(session.state)
+            # Flush at the end of each agent's turn so other workers see it; otherwise batch.
+            if event.is_final_response() or len(self._pending) >= self.flush_batch:
+                self._flush()
+
+    # --- persistence ---
+
+    def _flush(self):
+        """Writes buffered events and state in one transaction, then trims long sessions.
+
+        The buffers are cleared only once the transaction commits; after a failed
+        commit they are kept and written by the next flush.
+        """
+        if not self._pending and not self._dirty and not self._scoped:
+            return
+        pending, dirty, scoped = self._pending, self._dirty, self._scoped
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            self._db.executemany(
+                "INSERT INTO events VALUES (?, ?, ?, ?, ?)",
+                [(*key, timestamp, data) for key, data, timestamp in pending],
+            )
+            self._db.executemany(
+                "UPDATE sessions SET state = ?, last_update_time = ? WHERE app_name = ? AND user_id = ? AND id = ?",
+                [(state, updated, *key) for key, (state, updated) in dirty.items()],
+            )
+            for key in dirty:
+                self._db.execute(
+                    "DELETE FROM events WHERE app_name = ? AND user_id = ? AND session_id = ? AND rowid NOT IN "
+                    "(SELECT rowid FROM events WHERE app_name = ? AND user_id = ? AND session_id = ? ORDER BY rowid DESC LIMIT ?)",
+                    (*key, *key, self.max_events),
+                )
+            for scope, delta in scoped.items():
+                row = self._db.execute(
+                    "SELECT state FROM scoped_state WHERE app_name = ? AND user_id = ?", scope).fetchone()
+                state = {**(json.loads(row[0]) if row else {}), **delta}
+                self._db.execute("INSERT OR REPLACE INTO scoped_state VALUES (?, ?, ?)", (*scope, json.dumps(state)))
+            self._db.execute("COMMIT")
+        except Exception:
+            if self._db.in_transaction:
+                self._db.execute("ROLLBACK")
+            raise
+        self._pending, self._dirty, self._scoped = [], {}, {}
+        for key, (_, updated) in dirty.items():
+            if key in self._cache:
+                self._cache[key].last_update_time = updated
+
+    def _delete(self, keys):
+        self._db.execute("BEGIN IMMEDIATE")
+        for key in keys:
+            self._db.execute("DELETE FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?", key)
+            self._db.execute("DELETE FROM events WHERE app_name = ? AND user_id = ? AND session_id = ?", key)
+            self._cache.pop(key, None)
+        self._db.execute("COMMIT")
+
+    def sweep_expired(self) -> int:
+        """Deletes sessions idle for longer than idle_ttl. Returns how many were removed."""
+        with self._lock:
+            self._flush()
+            keys = self._db.execute(
+                "SELECT app_name, user_id, id FROM sessions WHERE last_update_time < ?", (time.time() - self.idle_ttl,)
+            ).fetchall()
+            if keys:
+                self._delete(keys)
+        return len(keys)
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            await asyncio.to_thread(self.sweep_expired)
+
+
+def create_session_service() -> BaseSessionService:
+    """SqliteSessionService when SESSION_DB_PATH is set, otherwise the in-memory service."""
+    if SESSION_DB_PATH:
+        return SqliteSessionService(SESSION_DB_PATH)
+    return InMemorySessionService()
+
+
+def load_test_worker(path: str, worker_id: int, workers: int, sessions: int, events: int, results):
+    """One worker of the multi-process load test: writes `sessions` sessions of `events` + 5 events (so each is
+    trimmed), then reads the next worker's sessions. Puts (worker_id, write seconds, sessions seen, errors) on
+    `results`."""
+    from google.genai.types import Content, Part
+
+    async def run():
+        service = SqliteSessionService(path, max_events=events)
+        errors, seen = [], 0
+        start = time.perf_counter()
+        for i in range(sessions):
+            try:
+                session = await service.create_session(app_name="load", user_id="u", session_id=f"w{worker_id}-{i}")
+                for n in range(events + 5):
+                    await service.append_event(session, Event(
+                        author="user", invocation_id=f"inv-{n}",
+                        content=Content(role="user", parts=[Part(text=f"message {n}")]),
+                    ))
+            except Exception as e:
+                errors.append(repr(e))
+        writes = time.perf_counter() - start
+        other = (worker_id + 1) % workers
+        for i in range(sessions):
+            for _ in range(500):  # The other worker may still be writing.
+                try:
+                    session = await service.get_session(app_name="load", user_id="u", session_id=f"w{other}-{i}")
+                except Exception as e:
+                    errors.append(repr(e))
+                    break
+                if session and len(session.events) == events:
+                    seen += 1
+                    break
+                await asyncio.sleep(0.01)
+        results.put((worker_id, writes, seen, errors))
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    # python -m app.utils.sqlite_session_service
+    # Load test: 4 worker processes share one store, and each reads sessions written by the others.
+    # tests/test_sqlite_session_service.py runs a smaller one.
+    import multiprocessing
+    import tempfile
+
+    from app.utils.sqlite_session_service import load_test_worker  # importable by the worker processes
+
+    workers, sessions_per_worker, events_per_session = 4, 50, 20
+
+    path = os.path.join(tempfile.mkdtemp(), "sessions.sqlite3")
+    SqliteSessionService(path)  # Create the schema once.
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=load_test_worker, args=(
+        path, w, workers, sessions_per_worker, events_per_session, results)) for w in range(workers)]
+    start = time.perf_counter()
+    for p in processes:
+        p.start()
+    reports = sorted(results.get() for _ in processes)
+    for p in processes:
+        p.join()
+    elapsed = time.perf_counter() - start
+    total_events = workers * sessions_per_worker * (events_per_session + 5)
+    for worker_id, writes, seen, errors in reports:
+        print(f"worker {worker_id}: wrote {sessions_per_worker} sessions in {writes:.2f}s, "
+              f"saw {seen}/{sessions_per_worker} sessions from worker {(worker_id + 1) % workers}, errors {len(errors)}")
+    print(f"{total_events} events from {workers} workers in {elapsed:.2f}s ({total_events / elapsed:.0f} events/s)")
@@ -0,0 +1,153 @@
+import os
+import sys
+import time
+
+# --- Cold start: slim imports, pre-warm and measurement ---
+# Most of a cold start is imports. ADK's tools and memory packages import the
+# Vertex AI SDK (vertexai, google.cloud.aiplatform) for optional features this
+# app does not use (Vertex RAG memory, example stores); the Gemini calls go
+# through google.genai. SLIM_IMPORTS=True blocks those two packages so ADK skips
+# them. It must run before anything imports google.adk, so fastapi_server.py
+# calls install_slim_imports() before its app imports. This module imports
+# nothing heavy itself.
+#
+#   SLIM_IMPORTS=True       skip the Vertex AI SDK
+#   LAZY_AGENT_GRAPH=True   build each router sub-agent on first use (app/agents/router_agent.py)
+#   PREWARM=True            build the whole graph during server startup, before it accepts traffic
+#
+#   python -m app.utils.startup     # import-time report and time to first request per mode
+
+SLIM_IMPORTS = os.getenv("SLIM_IMPORTS", "False").lower() == "true"
+PREWARM = os.getenv("PREWARM", "False").lower() == "true"
+BLOCKED_PACKAGES = ("vertexai", "google.cloud.aiplatform")
+
+
+class _SlimImportBlocker:
+    """A meta path finder that refuses the packages in BLOCKED_PACKAGES."""
+
+    def find_spec(self, name, path=None, target=None):
+        if any(name == package or name.startswith(package + ".") for package in BLOCKED_PACKAGES):
+            raise ModuleNotFoundError(f"{name} is not imported with SLIM_IMPORTS=True", name=name)
+        return None
+
+
+def install_slim_imports(enabled: bool = SLIM_IMPORTS) -> bool:
+    """Blocks the Vertex AI SDK for the rest of the process. Returns whether it is active."""
+    if not enabled:
+        return False
+    if not any(isinstance(finder, _SlimImportBlocker) for finder in sys.meta_path):
+        sys.meta_path.insert(0, _SlimImportBlocker())
+    return True
+
+
+def prewarm(root_agent, session_service, app_name: str = None) -> dict:
+    """Builds every lazily defined agent and the Runner for app_name, so the first request pays for neither."""
+    from app.agents.lazy_agent import resolve_all
+    from app.utils.runner_registry import runner_registry
+
+    started = time.perf_counter()
+    built = resolve_all(root_agent)
+    runner_registry.get(root_agent, app_name or root_agent.name, session_service)
+    return {"agents_built": built, "seconds": round(time.perf_counter() - started, 3)}
+
+
+def importtime_report(module: str = "fastapi_server", top: int = 15, env=None) -> list:
+    """Runs `python -X importtime -c "import <module>"` and returns (package, cumulative seconds), largest first.
+
+    Modules are grouped by top-level package, or by the first two name components
+    under the google and app namespaces (google.adk, google.genai, app.agents, ...).
+    """
+    import subprocess
+
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, env=env)
+    # Lines come out innermost first: "import time: self | cumulative |   nested.name".
+    # Reversed, each import follows its parent, so a stack of (indent, group) says
+    # whether an enclosing import of the same group has already been counted.
+    totals, stack = {}, []
+    for line in reversed(result.stderr.splitlines()):
+        fields = line.removeprefix("import time:").split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        indent = len(name) - len(name.lstrip())
+        parts = name.strip().split(".")
+        group = ".".join(parts[:2] if parts[0] in ("google", "app") else parts[:1])
+        while stack and stack[-1][0] >= indent:
+            stack.pop()
+        if not any(enclosing == group for _, enclosing in stack):
+            totals[group] = totals.get(group, 0) + int(fields[1]) / 1e6
+        stack.append((indent, group))
+    return sorted(totals.items(), key=lambda item: -item[1])[:top]
+
+
+def _child():
+    """Serves one /run request from a fresh process and prints the phases as JSON."""
+    import asyncio
+    import json
+
+    started = time.perf_counter()
+    install_slim_imports()
+    os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "startup-bench")
+    os.environ.setdefault("GOOGLE_CLOUD_LOCATION", "us-central1")
+    from app.utils.fake_llm import install_fake_llm
+
+    install_fake_llm(latency=0.0)
+    import httpx
+
+    import fastapi_server
+    imported = time.perf_counter()
+
+    async def main():
+        app = fastapi_server.app
+        async with app.router.lifespan_context(app):
+            ready = time.perf_counter()
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://startup") as client:
+                await client.post("/apps/startup/users/u/sessions/s1")
+                response = await client.post("/run", json={
+                    "app_name": "startup", "user_id": "u", "session_id": "s1",
+                    "new_message": {"role": "user", "parts": [{"text": "Plan a trip to San Francisco. I want to visit a museum, see a concert, and eat at a nice restaurant."}]}})
+                response.raise_for_status()
+            return ready
+
+    ready = asyncio.run(main())
+    served = time.perf_counter()
+    print(json.dumps({"import_s": imported - started, "ready_s": ready - started, "first_request_s": served - ready}))
+
+
+if __name__ == "__main__":
+    # python -m app.utils.startup
+    import json
+    import subprocess
+
+    if "--child" in sys.argv:
+        _child()
+        sys.exit(0)
+
+    base_env = {**os.environ, "GOOGLE_CLOUD_PROJECT": "startup-bench", "GOOGLE_CLOUD_LOCATION": "us-central1"}
+    print("Import time of fastapi_server by package (cumulative, python -X importtime):")
+    for name, seconds in importtime_report(env=base_env):
+        print(f"  {name:<32}{seconds * 1e3:8.0f} ms")
+    print("\nWith SLIM_IMPORTS=True LAZY_AGENT_GRAPH=True:")
+    for name, seconds in importtime_report(env={**base_env, "SLIM_IMPORTS": "True", "LAZY_AGENT_GRAPH": "True"}):
+        print(f"  {name:<32}{seconds * 1e3:8.0f} ms")
+
+    modes = {
+        "default": {},
+        "slim imports": {"SLIM_IMPORTS": "True"},
+        "slim + lazy graph": {"SLIM_IMPORTS": "True", "LAZY_AGENT_GRAPH": "True"},
+        "slim + lazy + prewarm": {"SLIM_IMPORTS": "True", "LAZY_AGENT_GRAPH": "True", "PREWARM": "True"},
+    }
+    runs = 3
+    print(f"\nTime to first request served (fresh process, fake model, median of {runs}):")
+    print(f"  {'mode':<24}{'process':>10}{'ready':>10}{'1st request':>13}")
+    for label, flags in modes.items():
+        samples = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            output = subprocess.run([sys.executable, "-m", "app.utils.startup", "--child"], capture_output=True,
+                                    text=True, env={**base_env, **flags}, check=True).stdout
+            total = time.perf_counter() - started
+            samples.append((total, json.loads(output.strip().splitlines()[-1])))
+        total, phases = sorted(samples, key=lambda sample: sample[0])[runs // 2]
+        print(f"  {label:<24}{total * 1e3:8.0f}ms{phases['ready_s'] * 1e3:8.0f}ms{phases['first_request_s'] * 1e3:11.0f}ms")
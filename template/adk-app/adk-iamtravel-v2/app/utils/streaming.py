@@ -0,0 +1,119 @@
+import os
+
+from google.adk.agents.run_config import RunConfig, StreamingMode
+
+# --- Token streaming ---
+# With StreamingMode.SSE the model streams its reply and ADK yields every chunk
+# as a partial event (event.partial=True) before the aggregated final event.
+# Partial events are not stored in the session. The plugins act on the final
+# event only, except metrics, which times the first chunk (app/utils/metrics.py).
+#
+#   /run?stream=true&format=sse-delta     chunks go out as `delta` frames as they arrive
+#   /run?stream=true                      partial events are included in the JSON lines
+#   run_agent_query(..., stream=True)     prints chunks as they arrive (app/utils/session_manager.py)
+#
+# TOKEN_STREAMING=True makes streaming the default for /run and app/main.py.
+
+TOKEN_STREAMING = os.getenv("TOKEN_STREAMING", "False").lower() == "true"
+
+STREAMING_RUN_CONFIG = RunConfig(streaming_mode=StreamingMode.SSE)
+DEFAULT_RUN_CONFIG = RunConfig()
+
+
+def run_config(stream: bool = TOKEN_STREAMING) -> RunConfig:
+    """The RunConfig for a streamed or a whole-reply run."""
+    return STREAMING_RUN_CONFIG if stream else DEFAULT_RUN_CONFIG
+
+
+if __name__ == "__main__":
+    # python -m app.utils.streaming
+    # A chunked fake model behind /run?format=sse-delta, with and without streaming:
+    # when the first text of the answer reaches the client, when the answer is
+    # complete, and whether the streamed chunks add up to the final answer.
+    import asyncio
+    import json
+    import time
+
+    os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "streaming")
+    os.environ.setdefault("GOOGLE_CLOUD_LOCATION", "us-central1")
+    import httpx
+    import uvicorn
+
+    from app.utils.fake_llm import FakeLlm, default_script, install_fake_llm, text_part
+
+    LONG_ANSWER = " ".join(f"Stop {i}: a short walk, a view and somewhere to eat." for i in range(1, 13))
+
+    def script(agent, llm_request, config):
+        part = default_script(agent, llm_request, config)
+        if part.text and agent in ("day_trip_agent", "synthesis_agent"):
+            return text_part(LONG_ANSWER)
+        return part
+
+    # 0.3s to the first chunk, then 24 characters every 40ms: ~1.2s for the long answers.
+    install_fake_llm(latency=0.3, chunk_chars=24, chunk_latency=0.04, search_latency=0.2, script=script)
+    import fastapi_server
+    from app.agents.workflow_agents import synthesis_stage
+    from app.utils import metrics
+    from app.utils.search_cache import search_cache
+
+    synthesis_stage.fast_path = False  # this demo measures synthesis_agent's streamed reply
+    queries = {
+        "day_trip_agent": "Plan a day trip to a beach near Los Angeles.",
+        "parallel_planner_agent": "Plan a trip to San Francisco. I want to visit a museum, see a concert, and eat at a nice restaurant.",
+    }
+
+    async def run(client, route, query, stream):
+        FakeLlm.config["route"] = route
+        search_cache.entries.clear()  # both modes pay for their searches
+        session_id = f"{route}-{stream}-{time.monotonic_ns()}"
+        await client.post(f"/apps/streaming/users/u/sessions/{session_id}")
+        payload = {"app_name": "streaming", "user_id": "u", "session_id": session_id,
+                   "new_message": {"role": "user", "parts": [{"text": query}]}}
+        started, firsts, deltas, final, event_type = time.perf_counter(), {}, {}, None, None
+        async with client.stream("POST", f"/run?format=sse-delta&stream={str(stream).lower()}", json=payload) as response:
+            async for line in response.aiter_lines():
+                if line.startswith("event: "):
+                    event_type = line[len("event: "):]
+                elif line.startswith("data: "):
+                    data = json.loads(line[len("data: "):])
+                    if event_type == "delta":
+                        firsts.setdefault(data["author"], time.perf_counter())
+                        text = deltas.get(data["author"], "")
+                        deltas[data["author"]] = data["text"] if data.get("replace") else text + data["text"]
+                    elif event_type == "final":
+                        final = data
+        done = time.perf_counter()
+        assert deltas.get(final["author"]) == final["text"], "streamed chunks do not add up to the final answer"
+        return (firsts[final["author"]] - started) * 1e3, (done - started) * 1e3
+
+    def agent_means(name):
+        means = []
+        for histogram in (metrics.FIRST_TOKEN_SECONDS, metrics.LAST_TOKEN_SECONDS):
+            series = [s for labels, s in histogram.series.items() if labels[1] == name]
+            means.append(sum(s[-2] for s in series) / max(1, sum(s[-1] for s in series)) * 1e3)
+        return means
+
+    async def main():
+        # A real server on a local port: httpx's in-process ASGI transport buffers whole responses.
+        # Port 0 lets the OS pick a free port.
+        server = uvicorn.Server(uvicorn.Config(fastapi_server.app, host="127.0.0.1", port=0, log_level="warning"))
+        serving = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.01)
+        port = server.servers[0].sockets[0].getsockname()[1]
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+            for stream in (False, True):
+                metrics.FIRST_TOKEN_SECONDS.series.clear()
+                metrics.LAST_TOKEN_SECONDS.series.clear()
+                print(f"\n{'stream=true' if stream else 'stream=false'}")
+                print(f"  {'workflow':<26}{'answer starts':>15}{'complete':>12}")
+                for route, query in queries.items():
+                    first, done = await run(client, route, query, stream)
+                    print(f"  {route:<26}{first:>13.0f}ms{done:>10.0f}ms")
+                for name in ("day_trip_agent", "synthesis_agent"):
+                    first, last = agent_means(name)
+                    print(f"  {name:<26}time to first token {first:5.0f}ms, to last token {last:5.0f}ms")
+        server.should_exit = True
+        await serving
+
+    asyncio.run(main())
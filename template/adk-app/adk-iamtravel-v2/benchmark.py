@@ -0,0 +1,229 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+# --- Offline load/latency benchmark ---
+# Runs every workflow against the local fake Gemini backend (app/utils/fake_llm.py),
+# either in-process through the shared Runner or over HTTP through fastapi_server.py,
+# and reports throughput, latency percentiles, event-loop lag and memory per session.
+#
+#   python benchmark.py                                  # in-process, all scenarios
+#   python benchmark.py --mode http --concurrency 16
+#   python benchmark.py --output baseline.json           # write a baseline
+#   python benchmark.py --compare baseline.json          # exit 1 on regression (for CI)
+#   SEARCH_MODE=direct python benchmark.py --search-latency 0.3   # direct search vs nested agent
+#
+# Each scenario repeats one query, so the shared search cache and the response
+# cache would answer almost every request after the first. Both are off unless
+# --caches is given; each scenario starts with them empty either way, and the
+# report records which were on. --compare refuses a baseline taken with other
+# cache settings.
+
+os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "benchmark")
+os.environ.setdefault("GOOGLE_CLOUD_LOCATION", "us-central1")
+
+from google.genai import types
+
+from app.utils.fake_llm import FakeLlm, install_fake_llm, lognormal_latency
+
+install_fake_llm()
+
+from app.agents.router_agent import root_agent
+from app.agents.workflow_agents import find_and_navigate_agent, iterative_planner_agent, parallel_planner_agent
+from app.utils.response_cache import response_cache
+from app.utils.runner_registry import runner_registry
+from app.utils.search_cache import search_cache
+from app.utils.sqlite_session_service import create_session_service
+
+# name -> (agent, query, route the fake router_agent picks if the pre-router defers)
+SCENARIOS = {
+    "root:greeting": (root_agent, "Hello!", "greeting_agent"),
+    "root:foodie": (root_agent, "Find me a good Italian restaurant in New York City.", "foodie_agent"),
+    "root:find_and_navigate": (root_agent, "Find me a good Italian restaurant in New York City and give me directions from Times Square.", "find_and_navigate_agent"),
+    "root:iterative_planner": (root_agent, "Plan a trip to London. I want to visit the British Museum and eat at a restaurant nearby. The total travel time between the two should be short.", "iterative_planner_agent"),
+    "root:parallel_planner": (root_agent, "Plan a trip to San Francisco. I want to visit a museum, see a concert, and eat at a nice restaurant.", "parallel_planner_agent"),
+    "root:day_trip": (root_agent, "Plan a day trip to a beach near Los Angeles.", "day_trip_agent"),
+    "root:llm_routed": (root_agent, "Something fun to do in Rome this weekend?", "day_trip_agent"),
+    "find_and_navigate_agent": (find_and_navigate_agent, "Where can I find good Char Kuey Teow in Penang and how do I get there from Komtar?", None),
+    "iterative_planner_agent": (iterative_planner_agent, "Plan a trip to Kuala Lumpur. I want to visit the Petronas Twin Towers and eat nearby. Travel time should be short.", None),
+    "parallel_planner_agent": (parallel_planner_agent, "Plan a weekend in Kuala Lumpur: the National Museum, a show at Istana Budaya and a nice restaurant.", None),
+}
+
+APP_NAME = "benchmark"
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+class LoopLagMonitor:
+    """Samples how late a periodic 10 ms timer fires; a blocked event loop shows up as lag."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags = []
+        self.task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(time.perf_counter() - start - self.interval)
+
+    def __enter__(self):
+        self.task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self.task.cancel()
+
+
+def in_process_client(session_service):
+    async def run(agent, query, user_id, session_id):
+        runner = runner_registry.get(agent, APP_NAME, session_service)
+        message = types.Content(role="user", parts=[types.Part(text=query)])
+        async for _ in runner.run_async(user_id=user_id, session_id=session_id, new_message=message):
+            pass
+    return run
+
+
+def http_client():
+    import httpx
+
+    import fastapi_server
+
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fastapi_server.app), base_url="http://bench", timeout=None)
+
+    async def run(agent, query, user_id, session_id):
+        await client.post(f"/apps/{APP_NAME}/users/{user_id}/sessions/{session_id}")
+        payload = {"app_name": APP_NAME, "user_id": user_id, "session_id": session_id,
+                   "new_message": {"role": "user", "parts": [{"text": query}]}}
+        async with client.stream("POST", "/run", json=payload) as response:
+            async for _ in response.aiter_bytes():
+                pass
+    return run, fastapi_server.session_service
+
+
+async def run_scenario(name, run, session_service, requests, concurrency):
+    agent, query, route = SCENARIOS[name]
+    FakeLlm.config["route"] = route
+    FakeLlm.calls.clear()
+    search_cache.clear()
+    response_cache.indexes.clear()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            user_id, session_id = "bench-user", f"{name}-{i}-{time.monotonic_ns()}"
+            await session_service.create_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+            start = time.perf_counter()
+            await run(agent, query, user_id, session_id)
+            latencies.append(time.perf_counter() - start)
+
+    with LoopLagMonitor() as monitor:
+        start = time.perf_counter()
+        await asyncio.gather(*[one(i) for i in range(requests)])
+        elapsed = time.perf_counter() - start
+
+    # Memory per session: a short second pass under tracemalloc (it slows everything down).
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sample = min(requests, 10)
+    await asyncio.gather(*[one(requests + i) for i in range(sample)])
+    memory = (tracemalloc.get_traced_memory()[0] - before) / sample
+    tracemalloc.stop()
+
+    return {
+        "requests": requests,
+        "throughput_rps": requests / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1e3,
+        "p95_ms": percentile(latencies, 95) * 1e3,
+        "p99_ms": percentile(latencies, 99) * 1e3,
+        "loop_lag_p99_ms": percentile(monitor.lags, 99) * 1e3,
+        "loop_lag_max_ms": max(monitor.lags, default=0.0) * 1e3,
+        "memory_per_session_kb": memory / 1024,
+        "model_calls_per_request": sum(FakeLlm.calls.values()) / (requests + sample),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Returns the list of regressions beyond `tolerance` (a fraction) against a baseline."""
+    regressions = []
+    if baseline.get("caches") != caches():
+        return [f"cache settings differ: baseline {baseline.get('caches')}, this run {caches()}"]
+    for name, current in results.items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']:.1f} -> {current['p95_ms']:.1f} ms")
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {previous['throughput_rps']:.1f} -> {current['throughput_rps']:.1f} rps")
+    return regressions
+
+
+def caches() -> dict:
+    """Which shared caches the run had on."""
+    return {"search_cache": search_cache.enabled, "response_cache": response_cache.enabled}
+
+
+async def main(args):
+    search_cache.enabled = response_cache.enabled = args.caches
+    install_fake_llm(latency=lognormal_latency(args.latency, args.sigma),
+                     search_latency=lognormal_latency(args.search_latency, args.sigma) if args.search_latency else 0.0)
+    if args.mode == "http":
+        run, session_service = http_client()
+        names = [n for n in SCENARIOS if n.startswith("root:")]  # /run always serves root_agent
+    else:
+        session_service = create_session_service()
+        run = in_process_client(session_service)
+        names = list(SCENARIOS)
+    if args.scenario:
+        names = [n for n in names if n in args.scenario]
+
+    results = {}
+    print(f"{'scenario':<26}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'lag p99':>9}{'KB/sess':>9}{'calls':>7}")
+    for name in names:
+        r = results[name] = await run_scenario(name, run, session_service, args.requests, args.concurrency)
+        print(f"{name:<26}{r['throughput_rps']:>8.1f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}"
+              f"{r['loop_lag_p99_ms']:>9.2f}{r['memory_per_session_kb']:>9.1f}{r['model_calls_per_request']:>7.1f}")
+
+    report = {"settings": vars(args), "caches": caches(), "scenarios": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark with a fake Gemini backend.")
+    parser.add_argument("--mode", choices=["inprocess", "http"], default="inprocess")
+    parser.add_argument("--scenario", action="append", help="Run only these scenarios (repeatable).")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05, help="Median fake model latency in seconds.")
+    parser.add_argument("--sigma", type=float, default=0.3, help="Lognormal spread of the fake latency.")
+    parser.add_argument("--search-latency", type=float, default=0.0, help="Median fake search latency in seconds.")
+    parser.add_argument("--caches", action="store_true",
+                        help="Keep the shared search and response caches on (each scenario still starts empty).")
+    parser.add_argument("--output", help="Write results as a JSON baseline.")
+    parser.add_argument("--compare", help="Compare against a JSON baseline and exit 1 on regression.")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    sys.exit(asyncio.run(main(parser.parse_args())))
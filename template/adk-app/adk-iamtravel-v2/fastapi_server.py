@@ -1,12 +1,10 @@
 import asyncio
 import os
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from fastapi import FastAPI, Request, Response, status
-from fastapi.responses import StreamingResponse
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from google.genai import types
-import json
 
 # Load environment variables from .env file
 load_dotenv()
@@ -19,12 +17,67 @@ use_vertex_ai = os.getenv("GOOGLE_GENAI_USE_VERTEXAI", "False").lower() == "true
 if not project_id or not location:
     raise ValueError("GOOGLE_CLOUD_PROJECT and GOOGLE_CLOUD_LOCATION must be set in .env or environment variables.")
 
+# SLIM_IMPORTS=True keeps ADK from importing the Vertex AI SDK; it has to run before
+# the first google.adk import (see app/utils/startup.py).
+from app.utils.startup import PREWARM, install_slim_imports, prewarm
+install_slim_imports()
+
 # Import the main agent (e.g., router_agent)
-from app.agents.router_agent import router_agent
+from app.agents.router_agent import root_agent
+from app.utils.runner_registry import runner_registry
+from app.utils.sqlite_session_service import create_session_service
+from app.utils.event_stream import dumps, encode_full, sse_delta_stream
+from app.utils.metrics import render_metrics
+from app.utils.admission import PRIORITIES, request_priority, scheduler
+from app.utils.budgets import Budget, current_budget
+from app.utils.batch_runner import BATCH_CONCURRENCY, normalize_items, run_batch
+from app.utils.streaming import TOKEN_STREAMING, run_config
+from app.utils.model_client import MODEL_WARMUP, install_shared_model_client, shared_model_client
+from app.utils.model_transport import MODEL_TRANSPORT, install_model_transport
+from app.utils.hedging import install_model_hedging
+
+# MODEL_CLIENT_SHARED=True gives every agent one pooled keep-alive model client (see app/utils/model_client.py).
+# It goes first: the transport and hedging wrappers below wrap whatever serves gemini-* at the time.
+shared_client = install_shared_model_client()
+# MODEL_TRANSPORT=record|replay records model calls to, or serves them from, MODEL_REPLAY_PATH.
+install_model_transport()
+# MODEL_HEDGING=True duplicates model calls that run past their usual latency, and AGENT_DEADLINES
+# cuts off the named agents' model calls at their deadline (see app/utils/hedging.py).
+install_model_hedging()
+
+# The app_name clients send in /run; its Runner is built at startup.
+APP_NAME = os.getenv("APP_NAME", root_agent.name)
+
+# Set SESSION_DB_PATH to share sessions across workers (see app/utils/sqlite_session_service.py).
+session_service = create_session_service()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """With PREWARM=True, builds the lazily defined agents before the server accepts traffic.
+
+    With the shared model client, also opens its first connection (MODEL_WARMUP) and keeps
+    the pool alive with pings while idle. Neither runs under MODEL_TRANSPORT=replay, which
+    makes no model calls.
+    """
+    if PREWARM:
+        print(f"Pre-warmed agent graph: {prewarm(root_agent, session_service, APP_NAME)}")
+    pings = None
+    if shared_client and MODEL_TRANSPORT != "replay":
+        if MODEL_WARMUP:
+            seconds = await shared_model_client.warm_up()
+            if seconds is not None:
+                print(f"Warmed up model client in {seconds * 1e3:.0f}ms")
+        pings = asyncio.create_task(shared_model_client.keepalive_pings())
+    yield
+    if pings is not None:
+        pings.cancel()
+        await shared_model_client.close()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
-session_service = InMemorySessionService()
+# Build the Runner for the default app once at startup; /run reuses it for every request.
+runner_registry.register(root_agent)
+runner_registry.get(root_agent, APP_NAME, session_service)
 
 @app.post("/apps/{app_name}/users/{user_id}/sessions/{session_id}")
 async def create_or_get_session(
@@ -37,13 +90,24 @@ async def create_or_get_session(
         session = await session_service.create_session(
             app_name=app_name, user_id=user_id, session_id=session_id
         )
-        return {"message": "Session created or retrieved successfully", "session_id": session.session_id}
+        return {"message": "Session created or retrieved successfully", "session_id": session.id}
     except Exception as e:
         return Response(content=str(e), status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @app.post("/run")
-async def run_agent(request: Request):
-    """Runs the agent with a new message and streams events."""
+async def run_agent(request: Request, format: str = "json", stream: bool = TOKEN_STREAMING):
+    """Runs the agent with a new message and streams events.
+
+    ?format=json (default) streams full events; ?format=sse-delta streams only text,
+    transfers and the final answer as Server-Sent Events (see app/utils/event_stream.py).
+    ?stream=true streams model replies token by token: partial text chunks are
+    forwarded as they arrive (see app/utils/streaming.py).
+    An optional "priority" field ("interactive" or "batch") sets the request's
+    scheduling class; when the model-call queue is full the answer is 429.
+    An optional "budget" field ({"max_tokens", "max_model_calls", "deadline_seconds"})
+    bounds the request; usage is reported on the final event (see app/utils/budgets.py).
+    A malformed budget is answered with 400 before the request is admitted.
+    """
     try:
         body = await request.json()
         app_name = body.get("app_name")
@@ -59,23 +123,86 @@ async def run_agent(request: Request):
             parts=[types.Part(text=p.get("text")) for p in new_message_data.get("parts", [])]
         )
 
-        runner = Runner(
-            agent=router_agent, # Use the main router agent
-            app_name=app_name,
-            session_service=session_service
+        try:
+            budget = Budget.from_request(body.get("budget"))
+        except ValueError as e:
+            return Response(content=str(e), status_code=status.HTTP_400_BAD_REQUEST)
+
+        runner = runner_registry.get(root_agent, app_name, session_service) # Use the main router agent
+        run = runner.run_async(
+            user_id=user_id, session_id=session_id, new_message=new_message, run_config=run_config(stream)
         )
 
+        priority = body.get("priority")
+        if not isinstance(priority, str) or priority not in PRIORITIES:
+            priority = "interactive"
+        request_priority.set(priority)  # read by the scheduler in app/utils/admission.py
+        current_budget.set(budget)  # enforced by app/utils/budgets.py
+        if not scheduler.admit(priority):
+            return Response(content="Server is busy, retry later", status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                            headers={"Retry-After": str(scheduler.retry_after())})
+        events = scheduler.track(run)  # from here on the request is counted out however it ends
+
+        if format == "sse-delta":
+            return StreamingResponse(sse_delta_stream(events), media_type="text/event-stream")
+
         async def event_generator():
-            async for event in runner.run_async(
-                user_id=user_id, session_id=session_id, new_message=new_message
-            ):
-                yield json.dumps(event.model_dump(mode='json')) + "\n"
+            async for event in events:
+                yield encode_full(event)
 
         return StreamingResponse(event_generator(), media_type="application/json")
 
     except Exception as e:
         return Response(content=str(e), status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@app.post("/run_batch")
+async def run_agent_batch(request: Request):
+    """Runs many queries concurrently and streams one NDJSON result per item as each finishes.
+
+    Body: {"items": [{"id": ..., "query": ...} or "query", ...], "skip_ids": [...], "concurrency": 8}.
+    Identical queries run once; ids in skip_ids (e.g. ones already received before
+    a dropped connection) are reported as "skipped" and not run again. Malformed
+    items, or one id given for two different queries, are answered with 400.
+    """
+    try:
+        body = await request.json()
+        if not body.get("items"):
+            return Response(content="Missing required fields", status_code=status.HTTP_400_BAD_REQUEST)
+        try:
+            items = normalize_items(body["items"])
+            concurrency = max(1, min(int(body.get("concurrency", BATCH_CONCURRENCY)), BATCH_CONCURRENCY))
+            skip_ids = body.get("skip_ids", [])
+            if not isinstance(skip_ids, list):
+                raise ValueError("skip_ids must be a list")
+            skip_ids = [str(skip_id) for skip_id in skip_ids]
+        except (TypeError, ValueError) as e:
+            return Response(content=str(e), status_code=status.HTTP_400_BAD_REQUEST)
+
+        batch = run_batch(items, root_agent, session_service, concurrency, skip_ids)
+        if not scheduler.admit("batch"):
+            return Response(content="Server is busy, retry later", status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                            headers={"Retry-After": str(scheduler.retry_after())})
+        results = scheduler.track(batch)
+
+        async def ndjson():
+            async for result in results:
+                yield dumps(result) + "\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    except Exception as e:
+        return Response(content=str(e), status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@app.get("/healthz")
+async def healthz():
+    """Startup/liveness probe: answers once the app (and, with PREWARM=True, the agent graph) is ready."""
+    return {"status": "ok"}
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: per-agent/model/tool latency, token counts and loop iterations."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -21,6 +21,12 @@ if not project_id or not location:
 # Import the agent you want to test
 # Example: Testing the find_and_navigate_agent
 from app.agents.workflow_agents import find_and_navigate_agent
+from app.utils.model_client import install_shared_model_client
+from app.utils.model_transport import install_model_transport
+
+# MODEL_TRANSPORT=record once, then MODEL_TRANSPORT=replay for deterministic offline runs.
+install_shared_model_client()
+install_model_transport()
 
 async def run_test_agent():
     app_name = "test_app"
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The tests import the app package from the project root, like `python -m app.main` does.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "test-project")
+os.environ.setdefault("GOOGLE_CLOUD_LOCATION", "us-central1")
@@ -0,0 +1,52 @@
+import asyncio
+
+from google.adk.agents import Agent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from app.utils.admission import AdmissionPlugin, Scheduler
+from app.utils.fake_llm import FakeLlm, install_fake_llm
+
+
+def test_cancelled_run_frees_its_slot():
+    saved = dict(FakeLlm.config)
+    install_fake_llm(latency=30.0, use_search=False)
+    scheduler = Scheduler(max_concurrency=1)
+    plugin = AdmissionPlugin(scheduler)
+    runner = Runner(agent=Agent(name="museum_finder_agent", model="gemini-2.5-flash"), app_name="admission",
+                    session_service=InMemorySessionService(), plugins=[plugin])
+
+    async def main():
+        session = await runner.session_service.create_session(app_name="admission", user_id="u")
+        message = types.Content(role="user", parts=[types.Part(text="A museum in Oslo")])
+        assert scheduler.admit("interactive")
+
+        async def consume():
+            async for _ in scheduler.track(runner.run_async(user_id="u", session_id=session.id, new_message=message)):
+                pass
+
+        request = asyncio.create_task(consume())
+        while scheduler.active == 0:  # the model call has its slot
+            await asyncio.sleep(0.01)
+        request.cancel()  # e.g. the client went away
+        await asyncio.gather(request, return_exceptions=True)
+        assert (scheduler.active, scheduler.requests, plugin.held) == (0, 0, {})
+
+    try:
+        asyncio.run(main())
+    finally:
+        FakeLlm.config = saved
+
+
+def test_request_dropped_before_streaming_is_counted_out():
+    scheduler = Scheduler()
+
+    async def events():
+        yield "never read"
+
+    assert scheduler.admit("interactive")
+    tracked = scheduler.track(events())
+    assert scheduler.requests == 1
+    del tracked  # e.g. the client went away before the response started
+    assert scheduler.requests == 0
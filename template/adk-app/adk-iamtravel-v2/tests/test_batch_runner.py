@@ -0,0 +1,21 @@
+import pytest
+
+from app.utils.batch_runner import item_id, normalize_items
+
+
+def test_normalize_items():
+    assert normalize_items(["Museums in Oslo", {"id": "b", "query": " Concerts in Lisbon "}]) == [
+        {"id": item_id("Museums in Oslo"), "query": "Museums in Oslo"}, {"id": "b", "query": "Concerts in Lisbon"}]
+    # The same id with the same query (up to case and spacing) is one item, run once.
+    assert len(normalize_items([{"id": "a", "query": "Oslo"}, {"id": "a", "query": " oslo"}])) == 2
+
+
+@pytest.mark.parametrize("items, error", [
+    ("Museums in Oslo", "items must be a list"),
+    (["Oslo", 5], "item 1: expected"),
+    ([{"id": "a", "query": ["Oslo"]}], "item 0: expected"),
+    ([{"id": "a", "query": "Oslo"}, {"id": "a", "query": "Lisbon"}], "item 1: duplicate id 'a'"),
+])
+def test_normalize_items_rejects(items, error):
+    with pytest.raises(ValueError, match=error):
+        normalize_items(items)
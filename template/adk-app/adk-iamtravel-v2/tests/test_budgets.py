@@ -0,0 +1,61 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from google.adk.agents import Agent, LoopAgent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from app.utils.budgets import Budget, BudgetPlugin, budget_scope
+from app.utils.fake_llm import FakeLlm, install_fake_llm
+
+
+def test_from_request():
+    budget = Budget.from_request({"max_tokens": 8000, "max_model_calls": "6", "deadline_seconds": 2.5})
+    assert (budget.max_tokens, budget.max_model_calls, budget.deadline_seconds) == (8000, 6, 2.5)
+    assert Budget.from_request(None).max_tokens == Budget().max_tokens
+
+
+@pytest.mark.parametrize("spec", [5, "big", [], {"max_tokens": "abc"}, {"max_tokens": True},
+                                  {"max_model_calls": -1}, {"deadline_seconds": "nan"}, {"max_tokens": None}])
+def test_from_request_rejects(spec):
+    with pytest.raises(ValueError, match="budget"):
+        Budget.from_request(spec)
+
+
+def test_spent_budget_ends_the_loop():
+    saved = dict(FakeLlm.config)
+    install_fake_llm(latency=0.0, use_search=False)
+    loop = LoopAgent(name="budget_loop", max_iterations=10, sub_agents=[
+        Agent(name="writer_agent", model="gemini-2.5-flash", output_key="draft"),
+        Agent(name="reviewer_agent", model="gemini-2.5-flash")])
+    runner = Runner(agent=loop, app_name="budgets", session_service=InMemorySessionService(), plugins=[BudgetPlugin()])
+
+    async def main():
+        session = await runner.session_service.create_session(app_name="budgets", user_id="u")
+        message = types.Content(role="user", parts=[types.Part(text="Plan an afternoon in Paris.")])
+        with budget_scope(Budget(max_model_calls=3)) as budget:
+            return budget, [event async for event in runner.run_async(
+                user_id="u", session_id=session.id, new_message=message)]
+
+    try:
+        budget, events = asyncio.run(main())
+    finally:
+        FakeLlm.config = saved
+    # The second pass would not fit, so its first agent answers with the best state and the loop ends there.
+    assert budget.model_calls == 2 and budget.exhausted == "loop_forecast"
+    assert [event.author for event in events] == ["writer_agent", "reviewer_agent", "writer_agent"]
+    assert events[-1].actions.escalate
+
+
+def test_skipped_model_call_answers_with_the_agents_output_key():
+    writer = Agent(name="writer_agent", model="gemini-2.5-flash", output_key="draft")
+    plugin = BudgetPlugin()
+    plugin.roots["inv"] = LoopAgent(name="budget_loop", sub_agents=[writer])
+    context = SimpleNamespace(invocation_id="inv", agent_name="writer_agent", state={"draft": "Louvre, then Le Comptoir"})
+    budget = Budget(max_model_calls=1)
+    budget.charge(None)
+    with budget_scope(budget):
+        response = asyncio.run(plugin.before_model_callback(callback_context=context, llm_request=None))
+    assert response.content.parts[0].text == "Louvre, then Le Comptoir"
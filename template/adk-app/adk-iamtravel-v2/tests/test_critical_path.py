@@ -0,0 +1,88 @@
+import pytest
+from google.adk.agents import Agent, LoopAgent, ParallelAgent, SequentialAgent
+from google.adk.tools import google_search
+from google.adk.tools.agent_tool import AgentTool
+
+from app.agents.deadline_agent import DeadlineParallelAgent
+from app.agents.template_agent import TemplateAgent
+from app.utils.critical_path import (CRITICAL_PATH_MODEL_SECONDS as M, CRITICAL_PATH_TOOL_SECONDS as T, Timings,
+                                     build, folded, routes)
+
+
+def lookup(city: str) -> str:
+    """A function tool."""
+    return city
+
+
+def agent(name, tools=()):
+    return Agent(name=name, model="gemini-2.5-flash", tools=list(tools))
+
+
+@pytest.fixture
+def root():
+    """A router over a sequential route (parallel step + template stage), a loop and an AgentTool user."""
+    search = Agent(name="search_agent", model="gemini-2.5-flash", tools=[google_search])
+    return Agent(name="router", model="gemini-2.5-flash", sub_agents=[
+        SequentialAgent(name="plan", sub_agents=[
+            ParallelAgent(name="research", sub_agents=[agent("quick"), agent("slow", [lookup])]),
+            TemplateAgent(name="stage", template="{quick}", sub_agents=[agent("synthesis")]),
+        ]),
+        LoopAgent(name="refine", max_iterations=2, sub_agents=[agent("critic")]),
+        agent("searcher", [AgentTool(agent=search)]),
+    ])
+
+
+@pytest.fixture
+def timings():
+    """One run in four of `stage` falls back to its LLM."""
+    timings = Timings()
+    for path, runs in (("fallback", 1), ("fast_path", 3)):
+        timings.add("adk_template_stage_total", {"stage": "stage", "path": path}, runs, 1)
+    return timings
+
+
+def test_route_totals(root, timings):
+    trees = routes(root, timings)
+    # router call + the slowest branch (two model calls and a tool call) + the template's fallback share
+    assert trees["plan"].total == pytest.approx(M + (2 * M + T) + 0.25 * M)
+    assert trees["refine"].total == pytest.approx(M + 2 * M)  # two passes
+    # the searcher's two model calls, and the AgentTool run of search_agent (google_search is not a tool call)
+    assert trees["searcher"].total == pytest.approx(M + 2 * M + M)
+
+
+def test_critical_branch_is_the_slowest(root, timings):
+    research = routes(root, timings)["plan"].children[1]
+    assert [child.name for child in research.critical()] == ["slow"]
+    assert research.seconds == max(child.total for child in research.children)
+
+
+def test_template_stage_costs_nothing_on_the_fast_path_without_measurements(root):
+    stage = build(root.sub_agents[0].sub_agents[1], Timings())
+    assert stage.total == 0.0 and stage.children[0].repeat == 0.0
+
+
+def test_deadline_caps_a_branch():
+    research = DeadlineParallelAgent(name="research", deadline=2 * M, sub_agents=[agent("quick"), agent("slow", [lookup])])
+    node = build(research, Timings())
+    slow = node.children[1]
+    assert slow.total == pytest.approx(2 * M) and slow.note
+    assert node.total == pytest.approx(2 * M)
+
+
+def test_folded_lines_are_the_self_time_of_each_critical_step(root, timings):
+    lines = folded(root, timings).splitlines()
+    ms = lambda seconds: round(seconds * 1e3)
+    assert [line for line in lines if line.startswith("plan;")] == [
+        f"plan;router;model {ms(M)}",
+        f"plan;research;slow;model {ms(2 * M)}",
+        f"plan;research;slow;lookup {ms(T)}",
+        f"plan;stage;synthesis;model {ms(0.25 * M)}",
+    ]
+    assert [line for line in lines if line.startswith("searcher;")] == [
+        f"searcher;router;model {ms(M)}",
+        f"searcher;model {ms(2 * M)}",
+        f"searcher;search_agent;search_agent;model {ms(M)}",
+    ]
+    for name, tree in routes(root, timings).items():  # the widths add up to the route's critical path
+        widths = [int(line.rsplit(" ", 1)[1]) for line in lines if line.split(";", 1)[0] == name]
+        assert sum(widths) == pytest.approx(tree.total * 1e3, abs=len(widths))
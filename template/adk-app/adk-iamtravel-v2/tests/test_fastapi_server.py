@@ -0,0 +1,44 @@
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def server():
+    import fastapi_server
+    return fastapi_server
+
+
+@pytest.mark.parametrize("body", [
+    {"items": ["Museums in Oslo", 5]},
+    {"items": [{"id": "a", "query": "Oslo"}, {"id": "a", "query": "Lisbon"}]},
+    {"items": ["Museums in Oslo"], "skip_ids": 5},
+    {"items": ["Museums in Oslo"], "concurrency": "many"},
+])
+def test_run_batch_rejects_bad_items_before_admission(server, body):
+    response = TestClient(server.app).post("/run_batch", json=body)
+    assert response.status_code == 400
+    assert server.scheduler.requests == 0
+
+
+@pytest.mark.parametrize("budget", [5, {"max_tokens": "abc"}, {"max_model_calls": -1}, {"deadline_seconds": [1]}])
+def test_run_rejects_bad_budget_before_admission(server, budget):
+    body = {"app_name": "router_agent", "user_id": "u", "session_id": "s", "budget": budget,
+            "new_message": {"role": "user", "parts": [{"text": "Hi"}]}}
+    response = TestClient(server.app).post("/run", json=body)
+    assert response.status_code == 400 and "budget" in response.text
+    assert server.scheduler.requests == 0
+
+
+def test_replay_skips_model_warm_up_and_pings(server, monkeypatch):
+    calls = []
+
+    async def record(*args, **kwargs):
+        calls.append(args)
+
+    monkeypatch.setattr(server, "shared_client", True)
+    monkeypatch.setattr(server, "MODEL_TRANSPORT", "replay")
+    monkeypatch.setattr(server.shared_model_client, "warm_up", record)
+    monkeypatch.setattr(server.shared_model_client, "keepalive_pings", record)
+    with TestClient(server.app):
+        pass
+    assert calls == []
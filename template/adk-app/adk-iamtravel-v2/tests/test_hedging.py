@@ -0,0 +1,133 @@
+import asyncio
+from collections import Counter
+from typing import ClassVar
+
+import pytest
+from google.adk.agents import Agent, SequentialAgent
+from google.adk.models import LlmResponse
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.registry import LLMRegistry
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from app.agents.deadline_agent import DEADLINE_PLACEHOLDER, DeadlineParallelAgent
+from app.utils import metrics
+from app.utils.budgets import Budget, BudgetPlugin, budget_scope
+from app.utils.hedging import MODEL_CALL_DEADLINES, HedgedLlm, HedgePolicy, agent_name, install_model_hedging
+
+
+class TailLlm(BaseLlm):
+    """A heavy-tailed model: each agent's calls take the next of its scripted delays (0 when none are left)."""
+
+    delays: ClassVar[dict] = {}      # agent name -> [seconds, ...]
+    cancelled: ClassVar[Counter] = Counter()
+
+    @classmethod
+    def supported_models(cls) -> list:
+        return [r"gemini-.*"]
+
+    async def generate_content_async(self, llm_request, stream: bool = False):
+        agent = agent_name(llm_request)
+        delays = TailLlm.delays.get(agent) or [0.0]
+        try:
+            await asyncio.sleep(delays.pop(0) if len(delays) > 1 else delays[0])
+        except asyncio.CancelledError:
+            TailLlm.cancelled[agent] += 1
+            raise
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=f"{agent} answer")]),
+                          usage_metadata=types.GenerateContentResponseUsageMetadata(
+                              prompt_token_count=10, candidates_token_count=5, total_token_count=15))
+
+
+@pytest.fixture
+def tail_llm():
+    served = LLMRegistry.resolve("gemini-2.5-flash")
+    saved = HedgedLlm.backend, HedgedLlm.policy, HedgedLlm.hedging, HedgedLlm.deadlines
+    TailLlm.delays, TailLlm.cancelled = {}, Counter()
+    LLMRegistry.register(TailLlm)
+    LLMRegistry.resolve.cache_clear()
+    yield TailLlm
+    HedgedLlm.backend, HedgedLlm.policy, HedgedLlm.hedging, HedgedLlm.deadlines = saved
+    LLMRegistry.register(served)
+    LLMRegistry.resolve.cache_clear()
+
+
+def run(agent, budget=None):
+    runner = Runner(agent=agent, app_name="hedging", session_service=InMemorySessionService(),
+                    plugins=[BudgetPlugin(), metrics.MetricsPlugin()])
+
+    async def main():
+        session = await runner.session_service.create_session(app_name="hedging", user_id="u")
+        message = types.Content(role="user", parts=[types.Part(text="A museum in Oslo")])
+        with budget_scope(budget or Budget()):
+            async for _ in runner.run_async(user_id="u", session_id=session.id, new_message=message):
+                pass
+        return (await runner.session_service.get_session(app_name="hedging", user_id="u", session_id=session.id)).state
+
+    return asyncio.run(main())
+
+
+def test_slow_call_is_hedged_and_the_loser_cancelled(tail_llm):
+    policy = HedgePolicy(percentile=0.5, min_samples=1, min_delay=0.01, agents=[])
+    policy.record("museum_finder_agent", "gemini-2.5-flash", 0.02)  # usually answers in 20ms
+    install_model_hedging(True, policy)
+    tail_llm.delays["museum_finder_agent"] = [30.0, 0.0]  # the primary hits the tail, the hedge does not
+    calls = lambda: metrics.MODEL_SECONDS.series.get(("museum_finder_agent", "museum_finder_agent"), [0])[-1]
+    before, budget = calls(), Budget()
+
+    state = run(Agent(name="museum_finder_agent", model="gemini-2.5-flash", output_key="museum_result"), budget)
+
+    assert state["museum_result"] == "museum_finder_agent answer"
+    assert policy.stats["hedge_won"] == 1
+    assert tail_llm.cancelled["museum_finder_agent"] == 1  # the slow primary did not keep running
+    assert budget.model_calls == 2  # the hedge is charged
+    assert calls() == before + 2  # and recorded, next to the call that answered
+
+
+def test_spent_budget_is_not_hedged(tail_llm):
+    policy = HedgePolicy(percentile=0.5, min_samples=1, min_delay=0.01, agents=[])
+    policy.record("museum_finder_agent", "gemini-2.5-flash", 0.02)
+    install_model_hedging(True, policy)
+    tail_llm.delays["museum_finder_agent"] = [0.2]
+
+    run(Agent(name="museum_finder_agent", model="gemini-2.5-flash"), Budget(max_model_calls=1))
+
+    assert policy.stats["over_budget"] == 1 and not policy.stats["hedge_won"]
+
+
+def test_branch_past_its_deadline_is_cancelled_and_gets_the_placeholder(tail_llm):
+    tail_llm.delays["concert_finder_agent"] = [30.0]  # the tail
+    parallel = DeadlineParallelAgent(name="research", deadline=0.2, sub_agents=[
+        Agent(name="museum_finder_agent", model="gemini-2.5-flash", output_key="museum_result"),
+        Agent(name="concert_finder_agent", model="gemini-2.5-flash", output_key="concert_result"),
+    ])
+
+    state = run(parallel)
+
+    assert state["museum_result"] == "museum_finder_agent answer"
+    assert state["concert_result"] == DEADLINE_PLACEHOLDER
+    assert tail_llm.cancelled["concert_finder_agent"] == 1
+
+
+def test_agent_deadline_cuts_off_a_model_call_outside_any_parallel_agent(tail_llm):
+    assert install_model_hedging(False, deadlines={"day_trip_agent": 0.2})  # deadlines alone install HedgedLlm
+    tail_llm.delays["day_trip_agent"] = [30.0]
+    tail_llm.delays["synthesis_agent"] = [0.0]
+    cut = MODEL_CALL_DEADLINES.series.get(("day_trip_agent",), 0)
+    sequence = SequentialAgent(name="plan", sub_agents=[
+        Agent(name="day_trip_agent", model="gemini-2.5-flash", output_key="day_trip"),
+        Agent(name="synthesis_agent", model="gemini-2.5-flash", output_key="plan"),
+    ])
+
+    state = run(sequence)
+
+    assert state["day_trip"] == DEADLINE_PLACEHOLDER
+    assert state["plan"] == "synthesis_agent answer"  # the next step still ran
+    assert tail_llm.cancelled["day_trip_agent"] == 1
+    assert MODEL_CALL_DEADLINES.series[("day_trip_agent",)] == cut + 1
+    assert not HedgedLlm.policy.stats["hedge_won"]
+
+
+def test_branch_deadlines_are_off_by_default():
+    assert DeadlineParallelAgent(name="research").deadline == 0
@@ -0,0 +1,37 @@
+import asyncio
+
+from google.adk.agents import Agent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from app.utils.fake_llm import FakeLlm, default_script, install_fake_llm
+from app.utils.history_compaction import HistoryCompactionPlugin, HistoryCompactor
+
+
+def test_foodie_agent_keeps_earlier_turns_for_follow_ups():
+    seen = []
+
+    def script(agent, llm_request, config):
+        seen.append([part.text for content in llm_request.contents for part in content.parts if part.text])
+        return default_script(agent, llm_request, config)
+
+    saved = dict(FakeLlm.config)
+    install_fake_llm(latency=0.0, use_search=False, script=script)
+    compactor = HistoryCompactor()
+    runner = Runner(agent=Agent(name="foodie_agent", model="gemini-2.5-flash"), app_name="compaction",
+                    session_service=InMemorySessionService(), plugins=[HistoryCompactionPlugin(compactor)])
+
+    async def main():
+        session = await runner.session_service.create_session(app_name="compaction", user_id="u")
+        for text in ["Find me a good Italian restaurant in New York City.", "Something cheaper?"]:
+            message = types.Content(role="user", parts=[types.Part(text=text)])
+            async for _ in runner.run_async(user_id="u", session_id=session.id, new_message=message):
+                pass
+
+    try:
+        asyncio.run(main())
+    finally:
+        FakeLlm.config = saved
+    assert seen[-1] == ["Find me a good Italian restaurant in New York City.", "Carbone", "Something cheaper?"]
+    assert not compactor.sessions  # forgotten once each run ended
@@ -0,0 +1,60 @@
+import asyncio
+import sys
+
+import pytest
+from google.adk.agents import Agent
+from google.adk.runners import Runner
+from google.genai import types
+
+from app.agents.lazy_agent import LazyAgent, lazy_agent_plugins
+from app.utils.fake_llm import FakeLlm, install_fake_llm
+from app.utils.sqlite_session_service import SqliteSessionService
+
+
+def lazy_router():
+    """A fresh lazy graph, as a new process builds it: the real foodie_agent is created on first use."""
+    sys.modules[__name__].foodie_agent = Agent(name="foodie_agent", model="gemini-2.5-flash")
+    return Agent(name="router_agent", model="gemini-2.5-flash", sub_agents=[
+        LazyAgent(name="foodie_agent", target=f"{__name__}:foodie_agent"),
+        Agent(name="greeting_agent", model="gemini-2.5-flash"),
+    ])
+
+
+@pytest.fixture
+def turn(tmp_path):
+    """Runs one user turn in a new "process" (a new lazy graph and session store) on the same session file."""
+    saved = dict(FakeLlm.config)
+    install_fake_llm(latency=0.0, use_search=False, route="foodie_agent")
+    path = str(tmp_path / "sessions.sqlite3")
+
+    def turn(text, plugins):
+        FakeLlm.calls.clear()
+        runner = Runner(agent=lazy_router(), app_name="lazy", session_service=SqliteSessionService(path),
+                        plugins=plugins)
+
+        async def main():
+            service = runner.session_service
+            if await service.get_session(app_name="lazy", user_id="u", session_id="s") is None:
+                await service.create_session(app_name="lazy", user_id="u", session_id="s")
+            message = types.Content(role="user", parts=[types.Part(text=text)])
+            return [event.author async for event in runner.run_async(user_id="u", session_id="s", new_message=message)]
+
+        authors = asyncio.run(main())
+        return authors, dict(FakeLlm.calls)
+
+    yield turn
+    FakeLlm.config = saved
+
+
+def test_follow_up_in_a_fresh_process_resumes_on_the_lazy_agent(turn):
+    authors, calls = turn("Find me a good ramen place in Tokyo.", lazy_agent_plugins())
+    assert authors[-1] == "foodie_agent" and calls == {"router_agent": 1, "foodie_agent": 1}
+
+    authors, calls = turn("Something cheaper?", lazy_agent_plugins())
+    assert authors == ["foodie_agent"] and calls == {"foodie_agent": 1}  # no router hop, as with an eager graph
+
+
+def test_without_the_plugin_the_follow_up_goes_back_through_the_router(turn):
+    turn("Find me a good ramen place in Tokyo.", [])
+    authors, calls = turn("Something cheaper?", [])
+    assert authors[0] == "router_agent" and calls == {"router_agent": 1, "foodie_agent": 1}
@@ -0,0 +1,35 @@
+import asyncio
+
+from google.adk.agents import Agent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from app.tools.my_google_search_tool import CachedAgentTool, googlesearch_agent
+from app.utils import metrics
+from app.utils.fake_llm import install_fake_llm
+
+
+def test_nested_search_agent_calls_are_recorded():
+    install_fake_llm(latency=0.0, search_latency=0.0, use_search=True)
+    agent = Agent(name="museum_finder_agent", model="gemini-2.5-flash",
+                  tools=[CachedAgentTool(agent=googlesearch_agent)])
+    runner = Runner(agent=agent, app_name="metrics", session_service=InMemorySessionService(),
+                    plugins=metrics.metrics_plugins())
+
+    def calls(agent_name):
+        return metrics.MODEL_SECONDS.series.get(("museum_finder_agent", agent_name), [0])[-1]
+
+    before = calls("google_search"), calls("museum_finder_agent")
+
+    async def main():
+        session = await runner.session_service.create_session(app_name="metrics", user_id="u")
+        message = types.Content(role="user", parts=[types.Part(text="Museums open late in Oslo for metrics")])
+        async for _ in runner.run_async(user_id="u", session_id=session.id, new_message=message):
+            pass
+
+    asyncio.run(main())
+    # The nested agent's call is recorded under the workflow of the agent that called the tool.
+    assert calls("google_search") == before[0] + 1
+    assert calls("museum_finder_agent") == before[1] + 2  # the tool call, then the answer
+    assert not metrics.agent_tool_metrics.spans
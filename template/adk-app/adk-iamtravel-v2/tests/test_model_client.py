@@ -0,0 +1,46 @@
+import asyncio
+import time
+
+import pytest
+
+from app.utils.fake_gemini_server import start_fake_gemini
+from app.utils.model_client import SharedModelClient
+
+
+@pytest.fixture
+def api_key(monkeypatch):
+    monkeypatch.setenv("GOOGLE_GENAI_USE_VERTEXAI", "False")
+    monkeypatch.setenv("GOOGLE_API_KEY", "fake-key")
+
+
+def test_client_per_loop_is_closed_with_its_loop(api_key):
+    server, url = start_fake_gemini(delay=0.0, connect_delay=0.0)
+    shared = SharedModelClient(base_url=url, http2=False)
+
+    async def ping():
+        assert await shared.ping() is not None
+        assert shared.get() is shared.client  # one client for the whole loop
+        return shared.http
+
+    first = asyncio.run(ping())
+    second = asyncio.run(ping())
+    assert first is not second
+    assert first.is_closed and second.is_closed
+    assert shared.stats["clients"] == 2
+    server.shutdown()
+
+
+def test_warm_up_gives_up_after_its_timeout(api_key):
+    server, url = start_fake_gemini(delay=0.0, connect_delay=2.0)
+    shared = SharedModelClient(base_url=url, http2=False)
+
+    async def warm_up():
+        started = time.perf_counter()
+        result = await shared.warm_up(timeout=0.2)
+        await shared.close()
+        return result, time.perf_counter() - started
+
+    result, seconds = asyncio.run(warm_up())
+    assert result is None and seconds < 1.0
+    assert shared.stats["warm_up_timeouts"] == 1
+    server.shutdown()
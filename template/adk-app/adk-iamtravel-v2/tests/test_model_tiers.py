@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+from google.adk.agents import Agent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from app.utils import metrics, model_tiers
+from app.utils.budgets import Budget, BudgetPlugin, budget_scope
+from app.utils.fake_llm import FakeLlm, install_fake_llm
+from app.utils.model_tiers import TIER_MODELS, ModelTierPlugin, TierPolicy
+
+
+def test_tiering_is_off_by_default():
+    assert not model_tiers.MODEL_TIERING_ENABLED
+    assert model_tiers.tier_plugins() == []
+
+
+@pytest.fixture
+def sloppy_lite():
+    saved = dict(FakeLlm.config)
+    install_fake_llm(latency=0.0, use_search=False, quality={TIER_MODELS["lite"]: 0.0})
+    yield
+    FakeLlm.config = saved
+
+
+def run(policy, budget):
+    agent = Agent(name="museum_finder_agent", model="gemini-2.5-flash")
+    runner = Runner(agent=agent, app_name="tiers", session_service=InMemorySessionService(),
+                    plugins=[BudgetPlugin(), ModelTierPlugin(policy), metrics.MetricsPlugin()])
+
+    async def main():
+        session = await runner.session_service.create_session(app_name="tiers", user_id="u")
+        message = types.Content(role="user", parts=[types.Part(text="A museum in San Francisco")])
+        with budget_scope(budget):
+            return [event async for event in runner.run_async(user_id="u", session_id=session.id, new_message=message)]
+
+    return asyncio.run(main())
+
+
+def model_calls():
+    return metrics.MODEL_SECONDS.series.get(("museum_finder_agent", "museum_finder_agent"), [0])[-1]
+
+
+def test_escalation_is_charged_and_recorded(sloppy_lite):
+    policy, budget, before = TierPolicy(), Budget(), model_calls()
+    events = run(policy, budget)
+    assert events[-1].content.parts[0].text == "Exploratorium"  # the standard tier's answer
+    assert policy.stats["escalations"] == 1
+    assert budget.model_calls == 2 and budget.tokens > 0
+    assert model_calls() == before + 2
+    assert not metrics._extra_calls
+
+
+def test_no_escalation_once_the_budget_is_spent(sloppy_lite):
+    policy, budget = TierPolicy(), Budget(max_model_calls=1)
+    events = run(policy, budget)
+    assert events[-1].content.parts[0].text.startswith("Sure!")
+    assert policy.stats["escalations_over_budget"] == 1 and budget.model_calls == 1
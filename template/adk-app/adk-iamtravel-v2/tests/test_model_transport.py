@@ -0,0 +1,111 @@
+import asyncio
+import json
+
+import pytest
+from google.adk.models import LlmRequest
+from google.adk.models.registry import LLMRegistry
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from app.utils.fake_llm import FakeLlm, install_fake_llm
+from app.utils.model_transport import ReplayLlm, ReplayMissError, ReplayStore, install_model_transport, request_key
+
+# Left to the LLM router (no pre-router rule or confident match), then a refinement loop that ends with exit_loop.
+QUERY = "Something fun to do in Rome this weekend?"
+
+
+@pytest.fixture
+def transport():
+    served = LLMRegistry.resolve("gemini-2.5-flash")
+    saved = dict(FakeLlm.config), (ReplayLlm.backend, ReplayLlm.store, ReplayLlm.mode, ReplayLlm.match)
+    install_fake_llm(latency=0.0, use_search=False, route="iterative_planner_agent", loop_passes=2)
+    yield
+    if ReplayLlm.store is not None and ReplayLlm.store.file is not None:
+        ReplayLlm.store.file.close()
+    FakeLlm.config, (ReplayLlm.backend, ReplayLlm.store, ReplayLlm.mode, ReplayLlm.match) = saved
+    LLMRegistry.register(served)
+    LLMRegistry.resolve.cache_clear()
+
+
+def run(query):
+    """The run's events without per-run ids and timestamps."""
+    from app.agents.router_agent import root_agent
+
+    runner = Runner(agent=root_agent, app_name="replay", session_service=InMemorySessionService())
+
+    async def main():
+        session = await runner.session_service.create_session(app_name="replay", user_id="u")
+        message = types.Content(role="user", parts=[types.Part(text=query)])
+        return [(event.author,
+                 [part.text for part in event.content.parts if part.text] if event.content else [],
+                 [(call.name, call.args) for call in event.get_function_calls()],
+                 bool(event.actions.escalate), event.actions.transfer_to_agent)
+                async for event in runner.run_async(user_id="u", session_id=session.id, new_message=message)]
+
+    return asyncio.run(main())
+
+
+def request(call_id):
+    return LlmRequest(model="gemini-2.5-flash", contents=[
+        types.Content(role="user", parts=[types.Part(text="Plan a day trip.")]),
+        types.Content(role="model", parts=[types.Part(function_call=types.FunctionCall(
+            id=call_id, name="google_search", args={"request": "day trips"}))]),
+    ])
+
+
+def test_request_key_ignores_function_call_ids():
+    assert request_key(request("adk-1")) == request_key(request("adk-2"))
+
+
+def test_replay_serves_a_recorded_run_without_the_model(transport, tmp_path):
+    path = str(tmp_path / "replay.ndjson")
+    install_model_transport("record", path)
+    recorded = run(QUERY)
+    assert any(transfer == "iterative_planner_agent" for *_, transfer in recorded)
+    assert any(escalate for _, _, _, escalate, _ in recorded)
+    assert any(calls == [("exit_loop", {})] for _, _, calls, _, _ in recorded)
+
+    install_model_transport("replay", path, "strict")
+    FakeLlm.calls.clear()
+    assert run(QUERY) == recorded
+    assert sum(FakeLlm.calls.values()) == 0
+
+    with pytest.raises(ReplayMissError):
+        run("Something quiet to do in Oslo tonight?")
+
+
+def test_loose_miss_calls_the_model_and_appends(transport, tmp_path):
+    path = str(tmp_path / "replay.ndjson")
+    install_model_transport("replay", path, "loose")
+    FakeLlm.calls.clear()
+    run(QUERY)
+    calls = sum(FakeLlm.calls.values())
+    assert calls > 0
+    with open(path) as f:
+        assert len(f.readlines()) == calls
+    assert len(ReplayStore(path).records) == calls
+
+
+def test_store_skips_a_torn_last_line(tmp_path):
+    path = tmp_path / "replay.ndjson"
+    line = json.dumps({"k": "a", "m": "gemini-2.5-flash", "r": [{"content": {"parts": [{"text": "hi"}]}}]})
+    path.write_text(line + "\n" + line.replace('"a"', '"b"')[:25])
+    assert list(ReplayStore(str(path)).records) == ["a"]
+
+
+def test_partial_chunks_are_replayed_only_when_streaming(transport, tmp_path):
+    store = ReplayStore(str(tmp_path / "replay.ndjson"))
+    llm_request = request("adk-1")
+    store.records[request_key(llm_request)] = [
+        {"content": {"role": "model", "parts": [{"text": "Port "}]}, "partial": True},
+        {"content": {"role": "model", "parts": [{"text": "Port Dickson"}]}},
+    ]
+    ReplayLlm.store, ReplayLlm.mode, ReplayLlm.match = store, "replay", "strict"
+
+    async def replay(stream):
+        return [response.content.parts[0].text async for response in
+                ReplayLlm(model="gemini-2.5-flash").generate_content_async(llm_request, stream=stream)]
+
+    assert asyncio.run(replay(False)) == ["Port Dickson"]
+    assert asyncio.run(replay(True)) == ["Port ", "Port Dickson"]
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+from google.adk.agents import Agent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from app.agents.pre_router import (HELD_OUT_SET, PRE_ROUTER_DECISIONS, TRAINING_EXAMPLES, PreRouter,
+                                   normalize_query)
+from app.utils.fake_llm import FakeLlm, install_fake_llm
+
+
+@pytest.fixture
+def route():
+    """Runs one query through a router whose LLM transfers to day_trip_agent; returns (model calls, pre-router)."""
+    saved = dict(FakeLlm.config)
+    install_fake_llm(latency=0.0, use_search=False, route="day_trip_agent")
+    pre_router = PreRouter(targets=["foodie_agent", "day_trip_agent"])
+    router = Agent(name="router_agent", model="gemini-2.5-flash", before_model_callback=pre_router.before_model_callback,
+                   sub_agents=[Agent(name=name, model="gemini-2.5-flash") for name in ("foodie_agent", "day_trip_agent")])
+    runner = Runner(agent=router, app_name="pre_router", session_service=InMemorySessionService())
+
+    def route(query):
+        FakeLlm.calls.clear()
+
+        async def main():
+            session = await runner.session_service.create_session(app_name="pre_router", user_id="u")
+            message = types.Content(role="user", parts=[types.Part(text=query)])
+            async for _ in runner.run_async(user_id="u", session_id=session.id, new_message=message):
+                pass
+
+        asyncio.run(main())
+        return dict(FakeLlm.calls), pre_router
+
+    yield route
+    FakeLlm.config = saved
+
+
+def test_held_out_set_is_not_matched_by_the_rules():
+    router = PreRouter(targets={label for _, label in TRAINING_EXAMPLES})
+    assert not [query for query, _ in HELD_OUT_SET
+                if any(pattern.search(normalize_query(query)) for _, pattern in router.rules)]
+    assert router.evaluate(HELD_OUT_SET)["classifier_routed"] >= 1
+
+
+def test_confident_query_skips_the_router_hop(route):
+    skipped = PRE_ROUTER_DECISIONS.series.get(("classifier", "day_trip_agent"), 0)
+    calls, pre_router = route("Plan a day at the beach near San Diego.")  # the classifier, not a rule
+    assert calls == {"day_trip_agent": 1}
+    assert pre_router.stats["classifier_hits"] == 1
+    assert PRE_ROUTER_DECISIONS.series[("classifier", "day_trip_agent")] == skipped + 1
+
+
+def test_low_confidence_query_goes_to_the_llm_router(route):
+    calls, pre_router = route("Something fun to do in Rome this weekend?")
+    assert calls == {"router_agent": 1, "day_trip_agent": 1}
+    assert pre_router.stats["llm_fallback"] == 1
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+from google.adk.agents import Agent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from app.utils.fake_llm import FakeLlm, install_fake_llm
+from app.utils.response_cache import RESPONSE_CACHE_EVENTS, ResponseCache, embed
+
+NICE = "Plan a trip to San Francisco. I want to visit a museum, see a concert, and eat at a nice restaurant."
+VEGAN = "Plan a trip to San Francisco. I want to visit a museum, see a concert, and eat at a vegan restaurant."
+
+
+@pytest.fixture
+def ask():
+    """Runs conversations (lists of turns) against a cached agent; returns the model calls they made."""
+    saved = dict(FakeLlm.config)
+    install_fake_llm(latency=0.0, use_search=False)
+    cache = ResponseCache(enabled=True)
+    agent = Agent(name="cached_foodie_agent", model="gemini-2.5-flash",
+                  before_model_callback=cache.before_model_callback, after_model_callback=cache.after_model_callback)
+    runner = Runner(agent=agent, app_name="cache", session_service=InMemorySessionService())
+
+    def ask(*turns) -> int:
+        before = FakeLlm.calls[agent.name]
+
+        async def main():
+            session = await runner.session_service.create_session(app_name="cache", user_id="u")
+            for text in turns:
+                message = types.Content(role="user", parts=[types.Part(text=text)])
+                async for _ in runner.run_async(user_id="u", session_id=session.id, new_message=message):
+                    pass
+
+        asyncio.run(main())
+        return FakeLlm.calls[agent.name] - before
+
+    ask.cache = cache
+    yield ask
+    FakeLlm.config = saved
+
+
+def test_reworded_query_is_a_hit(ask):
+    hits = RESPONSE_CACHE_EVENTS.series.get(("cached_foodie_agent", "hits"), 0)
+    assert ask("Find me a good Italian restaurant in New York City.") == 1
+    assert ask("find me a nice italian restaurant in new york city!") == 0
+    assert ask.cache.stats["hits"] == 1
+    assert RESPONSE_CACHE_EVENTS.series[("cached_foodie_agent", "hits")] == hits + 1
+
+
+def test_similar_query_with_other_words_is_a_miss(ask):
+    assert float(embed(NICE) @ embed(VEGAN)) >= ask.cache.threshold  # close enough for the vectors alone
+    assert ask(NICE) == 1
+    assert ask(VEGAN) == 1
+    assert ask.cache.stats["hits"] == 0
+
+
+def test_follow_up_only_hits_after_the_same_turns(ask):
+    assert ask("Find me a good Italian restaurant in New York City.", "Something cheaper?") == 2
+    assert ask("Find me sushi in Palo Alto.", "Something cheaper?") == 2
+    assert ask("Find me a good Italian restaurant in New York City.", "Something cheaper?") == 0
@@ -0,0 +1,23 @@
+from google.adk.agents import Agent
+from google.adk.sessions import InMemorySessionService
+
+from app.utils.runner_registry import RunnerRegistry
+
+
+def test_runners_are_shared_and_bounded():
+    agent = Agent(name="museum_finder_agent", model="gemini-2.5-flash")
+    session_service = InMemorySessionService()
+    registry = RunnerRegistry(max_runners=2)
+
+    first = registry.get(agent, "router_agent", session_service)
+    assert registry.get(agent, "router_agent", session_service) is first
+
+    # Client-chosen app names can't grow the registry past its bound.
+    for n in range(100):
+        registry.get(agent, f"app-{n}", session_service)
+    assert len(registry._runners) == 2
+
+    # The least recently used runner is dropped and rebuilt on its next request.
+    rebuilt = registry.get(agent, "router_agent", session_service)
+    assert rebuilt is not first and rebuilt.app_name == "router_agent"
+    assert registry.get(agent, "app-99", session_service) is registry.get(agent, "app-99", session_service)
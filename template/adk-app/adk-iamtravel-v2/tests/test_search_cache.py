@@ -0,0 +1,56 @@
+import asyncio
+import threading
+
+from app.utils.search_cache import SEARCH_CACHE_EVENTS, SearchCache
+
+
+def fetch_for(query):
+    async def fetch():
+        return [{"title": f"Result for {query}"}]
+    return fetch
+
+
+def rows(cache):
+    return [key for (key,) in cache.db.execute("SELECT key FROM search_cache ORDER BY expires_at")]
+
+
+def test_disk_tier_keeps_at_most_disk_max_entries(tmp_path):
+    cache = SearchCache(path=str(tmp_path / "cache.sqlite3"), disk_max_entries=3)
+    evictions = SEARCH_CACHE_EVENTS.series.get(("disk_evictions",), 0)
+
+    async def main():
+        for i in range(5):
+            await cache.get_or_fetch(f"museums in city {i}", "web", fetch_for(i))
+
+    asyncio.run(main())
+    assert rows(cache) == [f"web:museums in city {i}" for i in (2, 3, 4)]
+    assert cache.stats["disk_evictions"] == 2
+    assert SEARCH_CACHE_EVENTS.series[("disk_evictions",)] == evictions + 2
+
+
+def test_disk_tier_drops_expired_rows(tmp_path):
+    cache = SearchCache(ttl=0, path=str(tmp_path / "cache.sqlite3"))
+
+    async def main():
+        for i in range(2):
+            await cache.get_or_fetch(f"museums in city {i}", "web", fetch_for(i))
+
+    asyncio.run(main())
+    assert rows(cache) == [] and cache.stats["disk_expired"] == 2
+
+
+def test_disk_hit_after_restart_reads_off_the_event_loop(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    asyncio.run(SearchCache(path=path).get_or_fetch("Museums in Oslo", "web", fetch_for("Oslo")))
+    restarted = SearchCache(path=path)
+    threads = []
+    read = restarted._read
+    restarted._read = lambda key: threads.append(threading.get_ident()) or read(key)
+
+    async def fail():
+        raise AssertionError("served from disk, should not fetch")
+
+    value = asyncio.run(restarted.get_or_fetch("museums in oslo!", "web", fail))
+    assert value == [{"title": "Result for Oslo"}]
+    assert restarted.stats["disk_hits"] == 1
+    assert threads and threading.get_ident() not in threads
@@ -0,0 +1,119 @@
+import asyncio
+import multiprocessing
+import sqlite3
+
+import pytest
+from google.adk.events import Event, EventActions
+from google.genai.types import Content, Part
+
+from app.utils.sqlite_session_service import SqliteSessionService, load_test_worker
+
+
+def event(text, **state_delta):
+    return Event(author="user", invocation_id="inv", content=Content(role="user", parts=[Part(text=text)]),
+                 actions=EventActions(state_delta=state_delta))
+
+
+def test_failed_flush_keeps_buffered_events(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+
+    async def main():
+        service = SqliteSessionService(path)
+        session = await service.create_session(app_name="app", user_id="u", session_id="s")
+
+        # Every write to the events table fails until the trigger is dropped.
+        blocker = sqlite3.connect(path, isolation_level=None)
+        blocker.execute("CREATE TRIGGER fail BEFORE INSERT ON events BEGIN SELECT RAISE(ABORT, 'disk full'); END")
+        with pytest.raises(sqlite3.IntegrityError):
+            await service.append_event(session, event("first", city="Paris"))  # flushed at once: a final response
+        blocker.execute("DROP TRIGGER fail")
+
+        stored = await SqliteSessionService(path).get_session(app_name="app", user_id="u", session_id="s")
+        assert stored.events == [] and stored.state == {}
+        await service.get_session(app_name="app", user_id="u", session_id="s")  # retries the flush
+        stored = await SqliteSessionService(path).get_session(app_name="app", user_id="u", session_id="s")
+        assert [e.content.parts[0].text for e in stored.events] == ["first"]
+        assert stored.state == {"city": "Paris"}
+
+    asyncio.run(main())
+
+
+def test_app_and_user_state_are_shared_across_sessions(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+
+    async def main():
+        service = SqliteSessionService(path)
+        first = await service.create_session(app_name="app", user_id="u", session_id="s1")
+        await service.append_event(first, event("hi", **{"app:currency": "EUR", "user:home": "Lyon",
+                                                         "temp:scratch": 1, "city": "Paris"}))
+        await service.create_session(app_name="app", user_id="v", session_id="s3")
+
+        other_worker = SqliteSessionService(path)
+        same_user = await other_worker.create_session(app_name="app", user_id="u", session_id="s2")
+        assert same_user.state == {"app:currency": "EUR", "user:home": "Lyon"}
+        other_user = await other_worker.get_session(app_name="app", user_id="v", session_id="s3")
+        assert other_user.state == {"app:currency": "EUR"}
+        reread = await other_worker.get_session(app_name="app", user_id="u", session_id="s1")
+        assert reread.state == {"app:currency": "EUR", "user:home": "Lyon", "city": "Paris"}
+
+        await other_worker.append_event(same_user, event("moved", **{"user:home": "Nice"}))
+        listed = await service.list_sessions(app_name="app", user_id="u")
+        assert {s.id: s.state["user:home"] for s in listed.sessions} == {"s1": "Nice", "s2": "Nice"}
+
+    asyncio.run(main())
+
+
+def test_locked_database_does_not_block_the_event_loop(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+
+    async def main():
+        service = SqliteSessionService(path)
+        session = await service.create_session(app_name="app", user_id="u", session_id="s")
+        other_worker = sqlite3.connect(path, isolation_level=None)
+        other_worker.execute("BEGIN IMMEDIATE")  # holds the write lock
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        append = asyncio.create_task(service.append_event(session, event("hi")))  # flushed at once
+        await asyncio.sleep(0.3)
+        assert not append.done() and ticks >= 10  # waiting for the lock, while the loop keeps running
+        other_worker.execute("COMMIT")
+        await append
+        ticker.cancel()
+        stored = await SqliteSessionService(path).get_session(app_name="app", user_id="u", session_id="s")
+        assert [e.content.parts[0].text for e in stored.events] == ["hi"]
+
+    asyncio.run(main())
+
+
+@pytest.mark.slow
+def test_four_workers_lose_no_events(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    workers, sessions, events = 4, 20, 10
+    SqliteSessionService(path)  # creates the schema once
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=load_test_worker, args=(path, w, workers, sessions, events, results))
+                 for w in range(workers)]
+    for p in processes:
+        p.start()
+    reports = [results.get(timeout=120) for _ in processes]
+    for p in processes:
+        p.join()
+
+    assert [errors for _, _, _, errors in reports] == [[]] * workers  # e.g. no "database is locked"
+    assert [seen for _, _, seen, _ in reports] == [sessions] * workers
+
+    async def stored():
+        service = SqliteSessionService(path)
+        return [await service.get_session(app_name="load", user_id="u", session_id=f"w{w}-{i}")
+                for w in range(workers) for i in range(sessions)]
+
+    expected = [f"message {n}" for n in range(5, events + 5)]  # the last `events` of events + 5
+    for session in asyncio.run(stored()):
+        assert [e.content.parts[0].text for e in session.events] == expected
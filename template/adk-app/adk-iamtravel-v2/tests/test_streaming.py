@@ -0,0 +1,56 @@
+import asyncio
+import json
+
+import httpx
+
+from app.utils import metrics
+from app.utils.fake_llm import FakeLlm, default_script, install_fake_llm, text_part
+
+LONG_ANSWER = " ".join(f"Stop {i}: a short walk, a view and somewhere to eat." for i in range(1, 6))
+
+
+def script(agent, llm_request, config):
+    part = default_script(agent, llm_request, config)
+    return text_part(LONG_ANSWER) if part.text and agent == "day_trip_agent" else part
+
+
+def test_streamed_chunks_add_up_to_the_final_answer():
+    import fastapi_server
+
+    saved = dict(FakeLlm.config)
+    install_fake_llm(latency=0.0, chunk_chars=24, chunk_latency=0.01, use_search=False,
+                     route="day_trip_agent", script=script)
+    metrics.FIRST_TOKEN_SECONDS.series.clear()
+    metrics.LAST_TOKEN_SECONDS.series.clear()
+
+    async def main():
+        transport = httpx.ASGITransport(app=fastapi_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await client.post("/apps/streaming/users/u/sessions/s")
+            payload = {"app_name": "streaming", "user_id": "u", "session_id": "s",
+                       "new_message": {"role": "user", "parts": [{"text": "Plan a day trip to a beach near Los Angeles."}]}}
+            response = await client.post("/run?format=sse-delta&stream=true", json=payload)
+        deltas, final, event_type = [], None, None
+        for line in response.text.splitlines():
+            if line.startswith("event: "):
+                event_type = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                if event_type == "delta" and data["author"] == "day_trip_agent":
+                    deltas.append(data)
+                elif event_type == "final":
+                    final = data
+        return deltas, final
+
+    try:
+        deltas, final = asyncio.run(main())
+    finally:
+        FakeLlm.config = saved
+    assert final["author"] == "day_trip_agent" and final["text"] == LONG_ANSWER
+    assert len(deltas) > 1 and not any(delta.get("replace") for delta in deltas)
+    assert "".join(delta["text"] for delta in deltas) == final["text"]
+
+    (first,) = [s for labels, s in metrics.FIRST_TOKEN_SECONDS.series.items() if labels[1] == "day_trip_agent"]
+    (last,) = [s for labels, s in metrics.LAST_TOKEN_SECONDS.series.items() if labels[1] == "day_trip_agent"]
+    assert first[-1] == last[-1] == 1  # one model call, timed once each
+    assert 0 < first[-2] <= last[-2]  # time to first token <= time to last token
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+from google.adk.agents import Agent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from app.agents.deadline_agent import DEADLINE_PLACEHOLDER, DeadlineParallelAgent
+from app.agents.template_agent import TEMPLATE_RUNS, TemplateAgent, is_short_value, template_stats
+from app.utils.fake_llm import FakeLlm, install_fake_llm
+
+
+@pytest.fixture
+def stage():
+    """Runs a template stage on the given state; returns (its events, the session state, synthesis model calls)."""
+    saved = dict(FakeLlm.config)
+    install_fake_llm(latency=0.0, use_search=False)
+    agent = TemplateAgent(name="plan_stage", template="- Museum: {museum_result}\n- Concert: {concert_result}",
+                          output_key="plan", fast_path=True,
+                          sub_agents=[Agent(name="plan_synthesis_agent", model="gemini-2.5-flash", output_key="plan")])
+    runner = Runner(agent=agent, app_name="template", session_service=InMemorySessionService())
+
+    def stage(state):
+        FakeLlm.calls.clear()
+
+        async def main():
+            session = await runner.session_service.create_session(app_name="template", user_id="u", state=state)
+            message = types.Content(role="user", parts=[types.Part(text="Plan a day in Oslo.")])
+            events = [event async for event in runner.run_async(user_id="u", session_id=session.id, new_message=message)]
+            stored = await runner.session_service.get_session(app_name="template", user_id="u", session_id=session.id)
+            return events, stored.state
+
+        events, state = asyncio.run(main())
+        return events, state, FakeLlm.calls["plan_synthesis_agent"]
+
+    yield stage
+    FakeLlm.config = saved
+
+
+def runs(path):
+    return template_stats[("plan_stage", path)], TEMPLATE_RUNS.series.get(("plan_stage", path), 0)
+
+
+def test_clean_inputs_render_without_a_model_call(stage):
+    before = runs("fast_path")
+    events, state, calls = stage({"museum_result": " Munch Museum ", "concert_result": "a-ha at Spektrum"})
+    text = "- Museum: Munch Museum\n- Concert: a-ha at Spektrum"
+    assert calls == 0
+    assert [(event.author, event.content.parts[0].text) for event in events] == [("plan_stage", text)]
+    assert events[0].actions.state_delta == {"plan": text} and state["plan"] == text
+    assert runs("fast_path") == (before[0] + 1, before[1] + 1)
+
+
+@pytest.mark.parametrize("concert", ["a-ha at Spektrum\nDoors at 19:00", None, DEADLINE_PLACEHOLDER])
+def test_malformed_or_placeholder_inputs_fall_back_to_the_llm(stage, concert):
+    before = runs("fallback")
+    state = {"museum_result": "Munch Museum", **({"concert_result": concert} if concert else {})}
+    events, state, calls = stage(state)
+    assert calls == 1
+    assert [event.author for event in events] == ["plan_synthesis_agent"]
+    assert state["plan"] == events[-1].content.parts[0].text
+    assert runs("fallback") == (before[0] + 1, before[1] + 1)
+
+
+def test_custom_deadline_fallbacks_are_placeholders_too():
+    DeadlineParallelAgent(name="deadline_branches", fallbacks={"concert_finder_agent": "No concert found in time"})
+    assert not is_short_value("No concert found in time")
+    assert is_short_value("a-ha at Spektrum")
@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from google.adk.agents import Agent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from app.tools import direct_search_tool
+from app.tools import third_party_search_tool as search
+from app.tools.fake_serpapi_server import start_fake_serpapi
+from app.utils.fake_llm import install_fake_llm
+from app.utils.search_cache import search_cache
+
+
+@pytest.fixture
+def serpapi(monkeypatch):
+    """Starts a fake SerpApi and points the search tool at it."""
+    servers = []
+
+    def start(**kwargs):
+        server, url = start_fake_serpapi(**kwargs)
+        servers.append(server)
+        monkeypatch.setattr(search, "SERPAPI_URL", url)
+        monkeypatch.setattr(search, "SERPAPI_API_KEY", "fake-key")
+        monkeypatch.setattr(search, "SERPAPI_BACKOFF_SECONDS", 0.01)
+        return server
+
+    search_cache.entries.clear()
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def test_concurrent_sessions_take_about_as_long_as_one(serpapi, monkeypatch):
+    server = serpapi(delay=0.3)
+    install_fake_llm(latency=0.0, search_latency=0.0, use_search=True)
+    monkeypatch.setattr(direct_search_tool, "search_backend", search.fetch_results)
+    agent = Agent(name="museum_finder_agent", model="gemini-2.5-flash", instruction="Find a museum.",
+                  tools=[direct_search_tool.web_search_tool])
+    runner = Runner(agent=agent, app_name="search_test", session_service=InMemorySessionService())
+
+    async def one(i):
+        session = await runner.session_service.create_session(app_name="search_test", user_id="u")
+        results = []
+        async for event in runner.run_async(user_id="u", session_id=session.id, new_message=types.Content(
+                role="user", parts=[types.Part(text=f"Museums in city {i}")])):
+            results += [response.response for response in event.get_function_responses()]
+        return results
+
+    async def main():
+        started = time.perf_counter()
+        single = await one(0)
+        single_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        concurrent = await asyncio.gather(*(one(i) for i in range(1, 9)))
+        return single, single_seconds, concurrent, time.perf_counter() - started
+
+    single, single_seconds, concurrent, concurrent_seconds = asyncio.run(main())
+    assert all(results and results[0]["results"] for results in [single] + concurrent)
+    assert server.requests == 9
+    assert concurrent_seconds < single_seconds * 2
+
+
+def test_retries_5xx_then_succeeds(serpapi):
+    server = serpapi(delay=0.0, failures=2)
+    results = asyncio.run(search.fetch_results("museums"))
+    assert len(results) == search.SERPAPI_NUM_RESULTS
+    assert server.requests == 3
+
+
+def test_gives_up_after_max_retries(serpapi):
+    server = serpapi(delay=0.0, failures=100)
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(search.fetch_results("museums"))
+    assert server.requests == search.SERPAPI_MAX_RETRIES + 1
+    assert asyncio.run(search.third_party_web_search("concerts")).startswith("Error performing web search")
+
+
+def test_read_timeout_is_retried_then_raised(serpapi, monkeypatch):
+    monkeypatch.setattr(search, "SERPAPI_READ_TIMEOUT", 0.05)
+    server = serpapi(delay=0.3)
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(search.fetch_results("slow"))
+    assert server.requests == search.SERPAPI_MAX_RETRIES + 1
+
+
+def test_concurrency_is_capped(serpapi, monkeypatch):
+    monkeypatch.setattr(search, "SERPAPI_MAX_CONCURRENCY", 2)
+    server = serpapi(delay=0.1)
+
+    async def main():
+        return await asyncio.gather(*(search.fetch_results(f"query {i}") for i in range(6)))
+
+    assert all(asyncio.run(main()))
+    assert server.max_in_flight == 2
+
+
+def test_client_is_closed_with_its_event_loop(serpapi):
+    serpapi(delay=0.0)
+    clients = []
+
+    async def one():
+        await search.fetch_results("museums")
+        clients.append(search._get_client()[0])
+
+    asyncio.run(one())
+    asyncio.run(one())
+    assert clients[0] is not clients[1]
+    assert all(client.is_closed for client in clients)
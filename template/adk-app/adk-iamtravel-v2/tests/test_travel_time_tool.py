@@ -0,0 +1,19 @@
+import os
+
+from app.tools.travel_time_tool import PoiIndex
+
+CSV_HEADER = "name,city,kind,lat,lon\n"
+
+
+def test_index_is_rebuilt_when_the_csv_changes(tmp_path):
+    csv_path, index_dir = tmp_path / "poi.csv", str(tmp_path / "index")
+    csv_path.write_text(CSV_HEADER + "British Museum,London,museum,51.5194,-0.1270\n")
+    assert PoiIndex(str(csv_path), index_dir).resolve("British Museum") == 0
+
+    csv_path.write_text(CSV_HEADER + "Tate Modern,London,museum,51.5076,-0.0994\n"
+                                     "British Museum,London,museum,51.5194,-0.1270\n")
+    index = PoiIndex(str(csv_path), index_dir)
+    assert index.resolve("British Museum") == 1 and index.coords.shape == (2, 2)
+    # One directory per CSV version, and no temporary files left behind.
+    assert all(not name.startswith(".tmp-") for d in os.listdir(index_dir)
+               for name in os.listdir(os.path.join(index_dir, d)))